@@ -1,3 +1,5 @@
+import json
+import time
 import streamlit as st
 import requests
 
@@ -8,8 +10,9 @@ creating playlists, and getting song recommendations by making HTTP requests to
 
 Features:
 1. Store Embeddings: Fetches and stores song embeddings from the user's Spotify account.
-2. Create Playlist: Creates a playlist based on a search query.
-3. Get Recommendations: Fetches song recommendations based on a search query.
+2. Search Library: Searches the stored songs, showing each match as soon as the backend streams it.
+3. Create Playlist: Creates a playlist based on a search query.
+4. Get Recommendations: Fetches song recommendations based on a search query.
 
 Dependencies:
 - Streamlit: For building the frontend interface.
@@ -21,12 +24,29 @@ Make sure to adjust the `BASE_URL` to match the actual URL of your FastAPI backe
 # Base URL of your FastAPI backend
 BASE_URL = "http://127.0.0.1:8235"
 
+
+def stream_events(response):
+    """
+    Yields the events of a newline-delimited JSON response from the backend as they arrive.
+    """
+    for line in response.iter_lines():
+        if line:
+            yield json.loads(line)
+
+
+def track_label(name, artists):
+    """
+    Formats a track as "name by artist, artist".
+    """
+    return f"{name or 'Unknown track'} by {', '.join(artists or []) or 'unknown artist'}"
+
+
 # Streamlit app layout
 st.title("Music App")
 
 # Navigation options
 option = st.sidebar.selectbox(
-    "Select Option", ("Get Lyrics", "Store Embeddings", "Create Playlist", "Get Recommendations")
+    "Select Option", ("Get Lyrics", "Store Embeddings", "Search Library", "Create Playlist", "Get Recommendations")
 )
 
 # Store Embeddings
@@ -34,36 +54,116 @@ if option == "Store Embeddings":
     """
     Section for storing music embeddings.
     
-    Allows the user to select the number of songs to fetch from their Spotify account using a slider.
-    Upon clicking the "Store Embeddings" button, a GET request is sent to the `/store_embeddings` endpoint 
-    of the FastAPI backend. The response from the backend is displayed as a success or error message.
+    Allows the user to ingest their entire liked-songs library or select the number of songs to fetch using a slider.
+    Upon clicking the "Store Embeddings" button, a POST request is sent to the `/ingest` endpoint of the FastAPI
+    backend to start a background ingest job, and `/ingest/{job_id}` is polled to display its progress until the
+    job completes or fails.
+    Interrupted ingests resume from the last stored page on the next click, and a delta sync only embeds
+    songs liked since the last ingest and removes un-liked ones.
     """
     st.header("Store Your Music Embeddings")
-    limit = st.slider("Number of songs to fetch:", min_value=1, max_value=100, value=50)
+    params = {}
+    if st.checkbox("Only sync new and un-liked songs", value=False):
+        params["mode"] = "delta"
+    else:
+        entire_library = st.checkbox("Entire library", value=True)
+        if not entire_library:
+            params["limit"] = st.slider("Number of songs to fetch:", min_value=1, max_value=100, value=50)
+        params["restart"] = st.checkbox("Start over from the first liked song", value=False)
     if st.button("Store Embeddings"):
-        response = requests.get(f"{BASE_URL}/store_embeddings", params={"limit": limit})
+        response = requests.post(f"{BASE_URL}/ingest", params=params)
         if response.status_code == 200:
-            st.success(response.json().get("message"))
+            job_id = response.json()["job_id"]
+            progress_bar = st.progress(0.0)
+            status_text = st.empty()
+            while True:
+                response = requests.get(f"{BASE_URL}/ingest/{job_id}")
+                if response.status_code != 200:
+                    # The job is unknown, e.g. it was evicted from the backend's job list
+                    job = None
+                    break
+                job = response.json()
+                if job.get("total"):
+                    progress_bar.progress(min(job["offset"] / job["total"], 1.0))
+                eta = f", about {job['eta']:.0f}s left" if job.get("eta") is not None else ""
+                status_text.text(
+                    f"{job['status'].capitalize()}: {job['offset']}/{job.get('total') or '?'} liked songs, "
+                    f"{job['embedded']} embedded ({job['rate']:.1f} tracks/sec{eta})"
+                )
+                if job["status"] in ("completed", "failed"):
+                    break
+                time.sleep(1)
+
+            if job is None:
+                st.error("Lost track of the ingest job; check the library and click again to resume.")
+            elif job["status"] == "completed":
+                result = job["result"]
+                st.success(result.get("message"))
+                if not result.get("completed", True):
+                    st.info(f"Ingested {result.get('offset')} of {result.get('total')} liked songs. Click again to continue.")
+            else:
+                st.error(f"Failed to store embeddings: {'; '.join(job['errors'])}")
         else:
             st.error("Failed to store embeddings.")
 
+# Search Library
+elif option == "Search Library":
+    """
+    Section for searching the stored songs.
+    
+    Allows the user to input a search query and the number of songs to find. Upon clicking the "Search" button,
+    a GET request is sent to the `/search/stream` endpoint of the FastAPI backend, and each matching song is
+    displayed as soon as it arrives.
+    """
+    st.header("Search Your Library")
+    query = st.text_input("Search Query")
+    k = st.slider("Number of songs to find:", min_value=1, max_value=50, value=10)
+
+    if st.button("Search"):
+        response = requests.get(f"{BASE_URL}/search/stream", params={"query": query, "k": k}, stream=True)
+        if response.status_code == 200:
+            for event in stream_events(response):
+                if event["type"] == "result":
+                    audio = event["result"].get("audio") or {}
+                    st.write(track_label(audio.get("name"), audio.get("artists")), f"({event['result']['score']:.3f})")
+                elif event["type"] == "done" and not event["count"]:
+                    st.info("No matching songs found.")
+                elif event["type"] == "error":
+                    st.error(event["message"])
+        else:
+            st.error("Failed to search your library.")
+
 # Create Playlist
 elif option == "Create Playlist":
     """
     Section for creating a playlist.
     
-    Allows the user to input a search query and specify the number of songs to include in the playlist.
-    Upon clicking the "Create Playlist" button, a POST request is sent to the `/create_playlist` endpoint 
-    of the FastAPI backend. The response from the backend is displayed as a success or error message.
+    Allows the user to input a search query, specify the number of songs to include in the playlist and how much
+    to favour variety over relevance among the songs picked from their library. Upon clicking the "Create Playlist"
+    button, a POST request is sent to the `/create_playlist/stream` endpoint of the FastAPI backend. Songs are
+    listed as the backend finds them, followed by a success or error message.
     """
     st.header("Create a Playlist")
     query = st.text_input("Search Query for Playlist")
     k = st.slider("Number of songs to fetch:", min_value=1, max_value=20, value=5)
+    variety = st.slider("Variety (fewer songs from the same artist or album):", min_value=0.0, max_value=1.0, value=0.0)
     
     if st.button("Create Playlist"):
-        response = requests.post(f"{BASE_URL}/create_playlist", params={"query": query, "k": k})
+        params = {"query": query, "k": k}
+        if variety > 0:
+            params["mmr_lambda"] = 1.0 - variety
+        response = requests.post(f"{BASE_URL}/create_playlist/stream", params=params, stream=True)
         if response.status_code == 200:
-            st.success(response.json().get("message"))
+            for event in stream_events(response):
+                if event["type"] == "playlist":
+                    st.write(f"Created playlist '{event['name']}', adding songs:")
+                elif event["type"] == "track":
+                    source = "from your library" if event["source"] == "search" else "recommended"
+                    st.write(track_label(event["name"], event["artists"]), f"({source})")
+                elif event["type"] == "done":
+                    st.success(event["message"])
+                elif event["type"] == "error":
+                    st.error(event["message"])
         else:
             st.error("Failed to create playlist.")
 
@@ -73,19 +173,22 @@ elif option == "Get Recommendations":
     Section for getting song recommendations.
     
     Allows the user to input a search query and specify the number of recommendations to fetch.
-    Upon clicking the "Get Recommendations" button, a GET request is sent to the `/get_recommendations` endpoint 
-    of the FastAPI backend. The recommended tracks are displayed in the Streamlit app.
+    Upon clicking the "Get Recommendations" button, a GET request is sent to the `/get_recommendations/stream`
+    endpoint of the FastAPI backend. The recommended tracks are displayed in the Streamlit app as they arrive.
     """
     st.header("Get Song Recommendations")
     query = st.text_input("Search Query for Recommendations")
     k = st.slider("Number of recommendations:", min_value=1, max_value=20, value=5)
     
     if st.button("Get Recommendations"):
-        response = requests.get(f"{BASE_URL}/get_recommendations", params={"query": query, "k": k})
+        response = requests.get(f"{BASE_URL}/get_recommendations/stream", params={"query": query, "k": k}, stream=True)
         if response.status_code == 200:
-            recommendations = response.json().get("recommendations", [])
             st.write("Recommendations:")
-            for track in recommendations:
-                st.write(track.get("name"), "by", ", ".join([artist["name"] for artist in track.get("artists", [])]))
+            for event in stream_events(response):
+                if event["type"] == "recommendation":
+                    track = event["track"]
+                    st.write(track_label(track.get("name"), [artist["name"] for artist in track.get("artists", [])]))
+                elif event["type"] == "error":
+                    st.error(event["message"])
         else:
             st.error("Failed to fetch recommendations.")
@@ -0,0 +1,155 @@
+import os
+from dotenv import load_dotenv
+
+# Load environment variables from .env file
+load_dotenv()
+
+# Directory holding the persistent Chroma collections
+CHROMA_PERSIST_DIRECTORY = os.getenv("CHROMA_PERSIST_DIRECTORY", "./chroma_langchain_db")
+
+# Directory holding the per-user ingestion cursors
+INGEST_CHECKPOINT_DIRECTORY = os.getenv("INGEST_CHECKPOINT_DIRECTORY", "./ingest_checkpoints")
+
+# Number of saved tracks requested per Spotify page (Spotify caps this at 50)
+SAVED_TRACKS_PAGE_SIZE = int(os.getenv("SAVED_TRACKS_PAGE_SIZE", "50"))
+
+# SQLite file caching Genius lyrics, including songs Genius has no lyrics for
+LYRICS_CACHE_PATH = os.getenv("LYRICS_CACHE_PATH", "./lyrics_cache.sqlite3")
+
+# Number of concurrent Genius lookups during ingest
+LYRICS_FETCH_WORKERS = int(os.getenv("LYRICS_FETCH_WORKERS", "8"))
+
+# Seconds before a "lyrics not found" entry is retried against Genius (default 30 days)
+LYRICS_NOT_FOUND_TTL = int(os.getenv("LYRICS_NOT_FOUND_TTL", str(30 * 24 * 3600)))
+
+# Number of background ingest jobs that may run at the same time
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", "2"))
+
+# Hugging Face model used to embed songs and queries
+EMBEDDING_MODEL_NAME = os.getenv("EMBEDDING_MODEL_NAME", "BAAI/bge-m3")
+
+# Padded-token budget of a single embedding batch (longest input in the batch times the batch size)
+EMBEDDING_MAX_BATCH_TOKENS = int(os.getenv("EMBEDDING_MAX_BATCH_TOKENS", "16384"))
+
+# Number of CPU threads used for embedding (PyTorch default if unset)
+EMBEDDING_THREADS = int(os.getenv("EMBEDDING_THREADS", "0")) or None
+
+# SQLite file caching document embeddings by content hash across users (disabled if empty)
+EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH", "./embedding_cache.sqlite3")
+
+# Maximum number of cached embeddings before the least recently used ones are evicted
+EMBEDDING_CACHE_MAX_ENTRIES = int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", "100000"))
+
+# "per_user" keeps two Chroma collections per user, "catalog" stores every track once in a shared catalog
+# and keeps each user's library in a compact membership index
+STORAGE_MODE = os.getenv("STORAGE_MODE", "per_user")
+
+# SQLite file holding the per-user membership index of the shared catalog
+MEMBERSHIP_INDEX_PATH = os.getenv("MEMBERSHIP_INDEX_PATH", "./track_membership.sqlite3")
+
+# "torch" runs the full-precision model, "onnx-int8" runs an int8 quantized ONNX export through ONNX Runtime
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "torch")
+
+# Directory holding the ONNX exports of the embedding model
+ONNX_MODEL_DIRECTORY = os.getenv("ONNX_MODEL_DIRECTORY", "./onnx_models")
+
+# Load the embedding model in the background as soon as the server starts instead of on the first search
+PRELOAD_EMBEDDING_MODEL = os.getenv("PRELOAD_EMBEDDING_MODEL", "true").lower() == "true"
+
+# Number of worker processes running the embedding model outside the web process (0 embeds in-process)
+EMBEDDING_WORKERS = int(os.getenv("EMBEDDING_WORKERS", "0"))
+
+# Maximum number of texts coalesced into one micro-batch sent to an embedding worker
+EMBEDDING_MICRO_BATCH_SIZE = int(os.getenv("EMBEDDING_MICRO_BATCH_SIZE", "32"))
+
+# Milliseconds a micro-batch waits for more requests before it is sent to a worker
+EMBEDDING_MICRO_BATCH_WAIT_MS = float(os.getenv("EMBEDDING_MICRO_BATCH_WAIT_MS", "5"))
+
+# Maximum size in characters of a lyric chunk; each chunk of a song's lyrics is embedded as its own document
+LYRIC_CHUNK_MAX_CHARS = int(os.getenv("LYRIC_CHUNK_MAX_CHARS", "500"))
+
+# Maximum number of lyric chunks embedded per song
+MAX_LYRIC_CHUNKS = int(os.getenv("MAX_LYRIC_CHUNKS", "12"))
+
+# Number of chunk hits fetched per requested search result, so enough distinct tracks survive aggregation
+SEARCH_CHUNK_OVERFETCH = int(os.getenv("SEARCH_CHUNK_OVERFETCH", "4"))
+
+# Upper bound on the chunk hits a search fetches at first; searches whose hits cover fewer tracks than requested
+# (songs with many matching chunks) fetch more, up to MAX_LYRIC_CHUNKS chunks per requested track
+SEARCH_MAX_CHUNK_CANDIDATES = int(os.getenv("SEARCH_MAX_CHUNK_CANDIDATES", "200"))
+
+# Maximum number of track IDs in one `where` clause of a restricted search (a user's library in catalog mode, or the
+# tracks within a feature range); larger sets are split over several clauses, staying below SQLite's parameter limit
+SEARCH_FILTER_MAX_IDS = int(os.getenv("SEARCH_FILTER_MAX_IDS", "900"))
+
+# Restricted searches over larger sets covering at least this share of the collection's tracks search it unfiltered,
+# fetching 1 / share times deeper, and drop the hits of other tracks instead of querying clause by clause
+SEARCH_POSTFILTER_MIN_SHARE = float(os.getenv("SEARCH_POSTFILTER_MIN_SHARE", "0.2"))
+
+# Maximum number of open vector-store handles kept for reuse across requests
+STORE_CACHE_MAX_ENTRIES = int(os.getenv("STORE_CACHE_MAX_ENTRIES", "64"))
+
+# Seconds an unused vector-store handle stays open before it is evicted
+STORE_CACHE_IDLE_SECONDS = int(os.getenv("STORE_CACHE_IDLE_SECONDS", "900"))
+
+# Number of query embeddings kept in memory so repeated queries skip the embedding model
+QUERY_EMBEDDING_CACHE_SIZE = int(os.getenv("QUERY_EMBEDDING_CACHE_SIZE", "1024"))
+
+# Number of search results kept in memory across users; a user's entries are invalidated by every ingest
+SEARCH_RESULT_CACHE_SIZE = int(os.getenv("SEARCH_RESULT_CACHE_SIZE", "1024"))
+
+# Maximum number of queries accepted by one batch search request
+SEARCH_BATCH_MAX_QUERIES = int(os.getenv("SEARCH_BATCH_MAX_QUERIES", "100"))
+
+# Library tracks considered per playlist track when a playlist is diversified with maximal marginal relevance,
+# and the most candidates ever considered
+PLAYLIST_MMR_CANDIDATE_FACTOR = int(os.getenv("PLAYLIST_MMR_CANDIDATE_FACTOR", "5"))
+PLAYLIST_MMR_MAX_CANDIDATES = int(os.getenv("PLAYLIST_MMR_MAX_CANDIDATES", "500"))
+
+# Minimum similarity of two tracks sharing an artist in the diversity rerank (tracks sharing an album count as duplicates)
+PLAYLIST_MMR_ARTIST_SIMILARITY = float(os.getenv("PLAYLIST_MMR_ARTIST_SIMILARITY", "0.8"))
+
+# Seconds a Spotify user profile (and client) is reused for requests made with the same access token
+USER_PROFILE_TTL = int(os.getenv("USER_PROFILE_TTL", "300"))
+
+# SQLite FTS5 file holding the BM25 index of lyric chunks used by hybrid search
+SPARSE_INDEX_PATH = os.getenv("SPARSE_INDEX_PATH", "./sparse_index.sqlite3")
+
+# Query words found in more than this share of indexed chunks are ignored by the BM25 side of hybrid search
+SPARSE_MAX_DOCUMENT_FREQUENCY = float(os.getenv("SPARSE_MAX_DOCUMENT_FREQUENCY", "0.1"))
+
+# Damping constant of reciprocal rank fusion when merging dense and BM25 rankings
+RRF_K = int(os.getenv("RRF_K", "60"))
+
+# Directory holding the per-user audio feature matrices used by mood search
+FEATURE_MATRIX_DIRECTORY = os.getenv("FEATURE_MATRIX_DIRECTORY", "./feature_matrices")
+
+# Vector store holding the text collections' embeddings: "chroma" or "faiss" (audio collections always use Chroma)
+VECTOR_STORE_BACKEND = os.getenv("VECTOR_STORE_BACKEND", "chroma")
+
+# Directory holding the FAISS indexes and their document stores
+FAISS_INDEX_DIRECTORY = os.getenv("FAISS_INDEX_DIRECTORY", "./faiss_indexes")
+
+# FAISS index type: "flat" (exact), "ivf" (inverted lists) or "hnsw" (graph)
+FAISS_INDEX_TYPE = os.getenv("FAISS_INDEX_TYPE", "hnsw")
+
+# Number of IVF lists, and how many of them a search visits
+FAISS_NLIST = int(os.getenv("FAISS_NLIST", "1024"))
+FAISS_NPROBE = int(os.getenv("FAISS_NPROBE", "16"))
+
+# Links per node of the HNSW graph, and the size of its search candidate list
+FAISS_HNSW_M = int(os.getenv("FAISS_HNSW_M", "32"))
+FAISS_HNSW_EF_SEARCH = int(os.getenv("FAISS_HNSW_EF_SEARCH", "64"))
+
+# Compression of the vectors in FAISS indexes: "none", "sq8" (one byte per dimension) or "pq" (product quantization).
+# Compressed indexes rerank their best candidates with the uncompressed (float16) vectors kept in the document store
+FAISS_COMPRESSION = os.getenv("FAISS_COMPRESSION", "none")
+
+# Dimension compressed FAISS vectors are reduced to with PCA first, or 0 to keep every dimension
+FAISS_PCA_DIMENSION = int(os.getenv("FAISS_PCA_DIMENSION", "0"))
+
+# Bytes per vector of "pq" compression; must divide the (reduced) vector dimension
+FAISS_PQ_M = int(os.getenv("FAISS_PQ_M", "64"))
+
+# Candidates per requested result that a compressed FAISS index reranks with the uncompressed vectors
+FAISS_RERANK_FACTOR = int(os.getenv("FAISS_RERANK_FACTOR", "4"))
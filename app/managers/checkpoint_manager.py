@@ -0,0 +1,61 @@
+import json
+import os
+import time
+
+
+class CheckpointManager():
+    """
+    Persists a per-user ingestion cursor on disk so that an interrupted or rate-limited ingest
+    can resume from the last committed page instead of starting over.
+    """
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(self.directory, exist_ok=True)
+
+    def _path(self, user_id):
+        return os.path.join(self.directory, f"{user_id}.json")
+
+    def load(self, user_id):
+        """
+        Loads the stored cursor for a user.
+
+        Args:
+            user_id (str): The unique identifier for the user.
+
+        Returns:
+            dict: The stored cursor, or an empty dict if the user has never been ingested.
+        """
+        try:
+            with open(self._path(user_id)) as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+
+    def save(self, user_id, **fields):
+        """
+        Merges the given fields into the user's cursor and writes it atomically, so a crash
+        mid-write never leaves a truncated checkpoint behind.
+
+        Args:
+            user_id (str): The unique identifier for the user.
+            **fields: Cursor fields to update (e.g. offset, total, completed).
+
+        Returns:
+            dict: The updated cursor.
+        """
+        checkpoint = {**self.load(user_id), **fields, "updated_at": time.time()}
+        path = self._path(user_id)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(checkpoint, f)
+        os.replace(tmp_path, path)
+        return checkpoint
+
+    def clear(self, user_id):
+        """
+        Removes the stored cursor for a user so the next ingest starts from the beginning.
+        """
+        try:
+            os.remove(self._path(user_id))
+        except FileNotFoundError:
+            pass
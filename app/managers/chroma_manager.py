@@ -1,39 +1,132 @@
+from abc import ABC, abstractmethod
+
 from app.managers.spotify_manager import SpotifyManager
 from langchain_core.documents import Document
-from langchain_chroma import Chroma
 
-from models.embedding import embedding_function
+from app import config
+from app.managers.store_registry import get_vector_store
+
+
+class VectorStore(ABC):
+    """
+    Interface of the vector stores holding the collections: the subset of LangChain's Chroma API the backend
+    relies on, so the dense index behind the text collections can be swapped per deployment
+    (see `VECTOR_STORE_BACKEND`). Filters are Chroma `where` clauses.
+    """
+    @abstractmethod
+    def add_documents(self, documents, ids=None):
+        """
+        Embeds and stores documents, replacing any stored under the same IDs.
+        """
+
+    @abstractmethod
+    def delete(self, ids=None, where=None):
+        """
+        Deletes the documents with the given IDs or matching a `where` clause.
+        """
+
+    @abstractmethod
+    def get(self, ids=None, where=None, include=("documents", "metadatas")):
+        """
+        Returns stored documents as a dict of parallel "ids", "documents" and "metadatas" lists.
+        """
+
+    @abstractmethod
+    def similarity_search_by_vector_with_relevance_scores(self, embedding, k=4, filter=None):
+        """
+        Returns the k (document, distance) pairs closest to an embedding, where the distance is the squared L2
+        distance between normalized vectors.
+        """
+
+    @abstractmethod
+    def count(self):
+        """
+        Returns the number of stored documents.
+        """
+
+    def similarity_search_by_vectors_with_relevance_scores(self, embeddings, k=4, filter=None):
+        """
+        Runs one search per embedding and returns a list of (document, distance) pairs for each. Stores able to
+        search many vectors in a single call override this.
+        """
+        return [
+            self.similarity_search_by_vector_with_relevance_scores(embedding, k=k, filter=filter)
+            for embedding in embeddings
+        ]
+
+    def persist(self):
+        """
+        Writes pending changes to disk. Stores that persist every write need not override this.
+        """
+
+
+class ChromaVectorStore(VectorStore):
+    """
+    VectorStore backed by a LangChain Chroma collection on a shared chromadb client. Anything beyond the
+    VectorStore interface is forwarded to the underlying LangChain store.
+    """
+    def __init__(self, collection_name, embedding_function, client):
+        from langchain_chroma import Chroma
+
+        self.store = Chroma(collection_name=collection_name, embedding_function=embedding_function, client=client)
+
+    def add_documents(self, documents, ids=None):
+        return self.store.add_documents(documents=documents, ids=ids)
+
+    def delete(self, ids=None, where=None):
+        if where is not None:
+            return self.store.delete(ids=ids, where=where)
+        return self.store.delete(ids=ids)
+
+    def get(self, ids=None, where=None, include=("documents", "metadatas")):
+        return self.store.get(ids=ids, where=where, include=list(include))
+
+    def similarity_search_by_vector_with_relevance_scores(self, embedding, k=4, filter=None):
+        return self.store.similarity_search_by_vector_with_relevance_scores(embedding, k=k, filter=filter)
+
+    def count(self):
+        return self.store._collection.count()
+
+    def similarity_search_by_vectors_with_relevance_scores(self, embeddings, k=4, filter=None):
+        if not embeddings:
+            return []
+        # One collection query for every embedding; LangChain's Chroma only takes a single query vector
+        results = self.store._collection.query(
+            query_embeddings=embeddings, n_results=k, where=filter, include=["documents", "metadatas", "distances"]
+        )
+        return [
+            [
+                (Document(page_content=content, metadata=metadata or {}), distance)
+                for content, metadata, distance in zip(documents, metadatas, distances)
+            ]
+            for documents, metadatas, distances in zip(results["documents"], results["metadatas"], results["distances"])
+        ]
+
+    def __getattr__(self, name):
+        return getattr(self.store, name)
+
 
 class ChromaManager():
     def __init__(self):
         self.spotify_manager = SpotifyManager()
-        self.username = self.spotify_manager.username
+
+    @property
+    def username(self):
+        return self.spotify_manager.username
 
     def get_text_collection(self):
     # Create a unique collection name for textual data based on user ID
         collection_name = f"{self.username}_text_collection"
         
-        # Initialize Chroma vector store for text data with the embedding function
-        vector_store = Chroma(
-            collection_name=collection_name,
-            embedding_function=embedding_function,
-            persist_directory="./chroma_langchain_db"
-        )
-        
-        return vector_store
+        # Reuse the open vector store for text data if there is one
+        return get_vector_store(collection_name, config.VECTOR_STORE_BACKEND)
     
     def get_audio_collection(self):
         # Create a unique collection name for audio data based on user ID
         collection_name = f"{self.username}_audio_collection"
         
-        # Initialize Chroma vector store for audio data with the embedding function
-        vector_store = Chroma(
-            collection_name=collection_name,
-            embedding_function=embedding_function,
-            persist_directory="./chroma_langchain_db"
-        )
-        
-        return vector_store
+        # Reuse the open Chroma vector store for audio data if there is one
+        return get_vector_store(collection_name)
     
     def filter_non_metadata(self ,metadata):
        if isinstance(metadata, dict):
@@ -0,0 +1,525 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+
+import numpy as np
+
+from app.managers.chroma_manager import VectorStore
+
+logger = logging.getLogger(__name__)
+
+# Number of vectors per IVF list needed to train the coarse quantizer; below that the index stays flat
+IVF_TRAINING_POINTS_PER_LIST = 39
+
+# HNSW graphs cannot delete vectors, so deleted ones are masked until they make up this share of the index
+HNSW_COMPACTION_RATIO = 0.2
+
+# Filtered searches over at most this many chunks are answered exactly instead of through the index
+EXACT_SEARCH_LIMIT = 4096
+
+# Vectors needed to train scalar quantization or PCA; below that a compressed index stays uncompressed
+COMPRESSION_TRAINING_POINTS = 1000
+
+# Vectors needed to train product quantization: 39 per centroid of its 256-centroid sub-quantizers
+PQ_TRAINING_POINTS = 256 * 39
+
+
+class FaissVectorStore(VectorStore):
+    """
+    VectorStore keeping a collection's embeddings in a FAISS index and its documents in an SQLite file, both under
+    `directory`. `index_type` selects the index:
+
+    - "flat": exact inner-product search, the reference for recall.
+    - "ivf": inverted lists searched `nprobe` of `nlist` at a time; stays flat until there are enough vectors to
+      train the coarse quantizer.
+    - "hnsw": a graph with `hnsw_m` links per node, searched with `ef_search` candidates.
+
+    `compression` shrinks the vectors held in the index: "sq8" stores one byte per dimension and "pq" stores `pq_m`
+    bytes per vector, optionally after reducing them to `pca_dimension` dimensions with PCA. Compressed indexes are
+    trained on the stored vectors once there are enough of them, fetch `rerank_factor` times the requested number of
+    candidates and rerank those with uncompressed copies of the vectors. Their document store keeps those copies
+    as float16, which halves its size and, at about three significant digits, is far more precise than the codes.
+
+    Vectors are normalized, so inner products are cosine similarities; distances are reported as squared L2
+    distances like Chroma's. The index is written to disk by `persist()` and memory-mapped when opened, so large
+    indexes load instantly and are paged in on demand. The SQLite file is written on every change and also holds
+    each vector, so the index can be rebuilt (or caught up after a crash) without re-embedding anything.
+    """
+    def __init__(self, collection_name, embedding_function, directory, index_type="flat", nlist=1024, nprobe=16,
+                 hnsw_m=32, ef_search=64, compression="none", pca_dimension=0, pq_m=64, rerank_factor=4):
+        try:
+            import faiss
+        except ImportError as e:
+            raise ImportError("The FAISS vector store requires faiss: pip install faiss-cpu") from e
+        if index_type not in ("flat", "ivf", "hnsw"):
+            raise ValueError(f"Unknown FAISS index type '{index_type}', expected 'flat', 'ivf' or 'hnsw'")
+        if compression not in ("none", "sq8", "pq"):
+            raise ValueError(f"Unknown FAISS compression '{compression}', expected 'none', 'sq8' or 'pq'")
+
+        self.faiss = faiss
+        self.collection_name = collection_name
+        self.embedding_function = embedding_function
+        self.index_type = index_type
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.hnsw_m = hnsw_m
+        self.ef_search = ef_search
+        self.compression = compression
+        self.pca_dimension = pca_dimension
+        self.pq_m = pq_m
+        self.rerank_factor = rerank_factor
+        self.lock = threading.RLock()
+        self.dirty = False
+
+        os.makedirs(directory, exist_ok=True)
+        self.index_path = os.path.join(directory, f"{collection_name}.faiss")
+        self.connection = sqlite3.connect(os.path.join(directory, f"{collection_name}.sqlite3"), check_same_thread=False)
+        with self.connection:
+            if compression != "none":
+                # Rows with a float16 vector take just over 2 KB, so a default 4 KB page holds only one of them;
+                # larger pages pack them densely. Only takes effect when the file is created
+                self.connection.execute("PRAGMA page_size=16384")
+            self.connection.execute("PRAGMA journal_mode=WAL")
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS documents ("
+                "id INTEGER PRIMARY KEY, doc_id TEXT UNIQUE, track_id TEXT, content TEXT, metadata TEXT, vector BLOB)"
+            )
+            self.connection.execute("CREATE INDEX IF NOT EXISTS documents_track_id ON documents (track_id)")
+            # IDs deleted from the documents but possibly still in the saved index
+            self.connection.execute("CREATE TABLE IF NOT EXISTS deleted (id INTEGER PRIMARY KEY)")
+            self.connection.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+
+        self.dimension = self._meta("dimension", int)
+        # Collections created before compression existed store float32 vectors
+        self.vector_dtype = np.dtype(self._meta("vector_dtype") or "float32")
+        self.index = None
+        # index_factory description of the current index
+        self.layout = None
+        self.mmapped = False
+        self.masked = set()
+        self._open()
+
+    # Index lifecycle
+
+    def _meta(self, key, cast=str):
+        row = self.connection.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return cast(row[0]) if row else None
+
+    def _set_meta(self, key, value):
+        self.connection.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, str(value)))
+
+    def _open(self):
+        if self.dimension is None:
+            return
+        if not os.path.exists(self.index_path):
+            # The index was never saved: build it from the stored vectors
+            self.rebuild()
+            return
+        # Memory-map the saved index; it is read fully into memory on the first write
+        self.index = self.faiss.read_index(self.index_path, self.faiss.IO_FLAG_MMAP | self.faiss.IO_FLAG_READ_ONLY)
+        self.mmapped = True
+        self.layout = self._meta("layout")
+        if self.layout != self._target_layout():
+            # The index was saved with other settings, e.g. before compression was enabled
+            self.rebuild()
+            return
+
+        # Catch up with documents written after the index was last saved
+        indexed_until = self._meta("indexed_until", int) or 0
+        deleted = [row[0] for row in self.connection.execute("SELECT id FROM deleted")]
+        missing = self.connection.execute("SELECT COUNT(*) FROM documents WHERE id > ?", (indexed_until,)).fetchone()[0]
+        if deleted and self._kind() == "hnsw":
+            self.masked = set(deleted)
+        elif deleted:
+            self._writable()
+            self.index.remove_ids(np.asarray(deleted, dtype=np.int64))
+            self.dirty = True
+        if missing:
+            self._writable()
+            for ids, vectors in self._iter_vectors("id > ?", (indexed_until,)):
+                self.index.add_with_ids(vectors, ids)
+            self.dirty = True
+        logger.info(f"Opened FAISS index of {self.collection_name} with {self.index.ntotal} vectors ({self.layout})")
+
+    def _training_points(self):
+        points = 0
+        if self.index_type == "ivf":
+            points = self.nlist * IVF_TRAINING_POINTS_PER_LIST
+        if self.compression == "pq":
+            points = max(points, PQ_TRAINING_POINTS)
+        elif self.compression == "sq8":
+            points = max(points, COMPRESSION_TRAINING_POINTS)
+        return points
+
+    def _layout(self, trained):
+        codec = "Flat"
+        prefix = ""
+        if trained and self.compression != "none":
+            codec = "SQ8" if self.compression == "sq8" else f"PQ{self.pq_m}"
+            if self.pca_dimension:
+                prefix = f"PCA{self.pca_dimension},"
+        if self.index_type == "ivf" and trained:
+            return f"{prefix}IVF{self.nlist},{codec}"
+        if self.index_type == "hnsw":
+            return f"IDMap2,{prefix}HNSW{self.hnsw_m}" + ("" if codec == "Flat" else f"_{codec}")
+        if codec.startswith("PQ"):
+            # IndexPQ accepts no search parameters and so cannot filter; a single inverted list scans the same
+            # codes and can
+            return f"{prefix}IVF1,{codec}"
+        return f"IDMap2,{prefix}{codec}"
+
+    def _target_layout(self):
+        count = self.connection.execute("SELECT COUNT(*) FROM documents").fetchone()[0]
+        return self._layout(trained=count >= self._training_points())
+
+    @property
+    def compressed(self):
+        return self.compression != "none" and self.layout == self._layout(trained=True)
+
+    def _kind(self):
+        index = self.faiss.downcast_index(self.index)
+        if isinstance(index, self.faiss.IndexIDMap2):
+            index = self.faiss.downcast_index(index.index)
+        if isinstance(index, self.faiss.IndexPreTransform):
+            index = self.faiss.downcast_index(index.index)
+        if isinstance(index, self.faiss.IndexIVF):
+            return "ivf"
+        if isinstance(index, self.faiss.IndexHNSW):
+            return "hnsw"
+        return "flat"
+
+    def _new_index(self, layout):
+        index = self.faiss.index_factory(self.dimension, layout, self.faiss.METRIC_INNER_PRODUCT)
+        if "IVF" in layout:
+            # IVF stores IDs itself; the hashtable direct map lets it remove and reconstruct vectors by ID
+            self.faiss.extract_index_ivf(index).set_direct_map_type(self.faiss.DirectMap.Hashtable)
+        return index
+
+    def _writable(self):
+        if self.mmapped:
+            self.index = self.faiss.read_index(self.index_path)
+            self.mmapped = False
+
+    def _iter_vectors(self, condition="1", parameters=(), batch_size=10000):
+        cursor = self.connection.execute(f"SELECT id, vector FROM documents WHERE {condition} ORDER BY id", parameters)
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                return
+            ids = np.fromiter((row[0] for row in rows), dtype=np.int64, count=len(rows))
+            vectors = np.vstack([np.frombuffer(row[1], dtype=self.vector_dtype) for row in rows])
+            yield ids, vectors.astype(np.float32)
+
+    def rebuild(self):
+        """
+        Rebuilds the index from the stored vectors: trains IVF and compression once there are enough vectors, applies
+        changed index settings and drops the vectors masked in an HNSW graph.
+        """
+        with self.lock:
+            if self.dimension is None:
+                return
+            layout = self._target_layout()
+            index = self._new_index(layout)
+            if not index.is_trained:
+                # Train the coarse quantizer and the vector codec on a sample of the stored vectors
+                sample_size = max(self.nlist * 256, PQ_TRAINING_POINTS * 4)
+                sample = np.vstack([np.frombuffer(row[0], dtype=self.vector_dtype) for row in self.connection.execute(
+                    "SELECT vector FROM documents ORDER BY RANDOM() LIMIT ?", (sample_size,)
+                )])
+                index.train(sample.astype(np.float32))
+            for ids, vectors in self._iter_vectors():
+                index.add_with_ids(vectors, ids)
+            self.index = index
+            self.layout = layout
+            self.mmapped = False
+            self.masked = set()
+            with self.connection:
+                self.connection.execute("DELETE FROM deleted")
+            self.dirty = True
+            logger.info(f"Rebuilt FAISS index of {self.collection_name} as {layout} with {index.ntotal} vectors")
+
+    def persist(self):
+        with self.lock:
+            if not self.dirty or self.index is None:
+                return
+            self.faiss.write_index(self.index, f"{self.index_path}.tmp")
+            os.replace(f"{self.index_path}.tmp", self.index_path)
+            with self.connection:
+                max_id = self.connection.execute("SELECT MAX(id) FROM documents").fetchone()[0] or 0
+                self._set_meta("indexed_until", max_id)
+                self._set_meta("layout", self.layout)
+                if self._kind() != "hnsw":
+                    # Removed vectors are gone from the saved index
+                    self.connection.execute("DELETE FROM deleted")
+            self.dirty = False
+
+    # VectorStore interface
+
+    def add_documents(self, documents, ids=None):
+        if not documents:
+            return []
+        embeddings = self.embedding_function.embed_documents([document.page_content for document in documents])
+        return self.add_embeddings(documents, embeddings, ids=ids)
+
+    def add_embeddings(self, documents, embeddings, ids=None):
+        """
+        Adds documents whose embeddings are already computed, e.g. when moving a Chroma collection to FAISS.
+
+        Args:
+            documents (list): Documents with `track_id` (and optionally `chunk`) in their metadata.
+            embeddings (list): One embedding per document.
+            ids (list): Document IDs; defaults to `<track_id>:<chunk>`.
+
+        Returns:
+            list: The document IDs.
+        """
+        if not documents:
+            return []
+        ids = list(ids) if ids is not None else [f"{document.metadata['track_id']}:{document.metadata.get('chunk', 0)}" for document in documents]
+        vectors = np.asarray(embeddings, dtype=np.float32)
+        vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+
+        with self.lock:
+            if self.dimension is None:
+                self.dimension = vectors.shape[1]
+                self.vector_dtype = np.dtype("float16" if self.compression != "none" else "float32")
+                with self.connection:
+                    self._set_meta("dimension", self.dimension)
+                    self._set_meta("vector_dtype", self.vector_dtype.name)
+                self.layout = self._target_layout()
+                self.index = self._new_index(self.layout)
+            self._delete_rows("doc_id", ids)
+            with self.connection:
+                rowids = []
+                for doc_id, document, vector in zip(ids, documents, vectors):
+                    cursor = self.connection.execute(
+                        "INSERT INTO documents (doc_id, track_id, content, metadata, vector) VALUES (?, ?, ?, ?, ?)",
+                        (doc_id, document.metadata.get('track_id'), document.page_content,
+                         json.dumps(document.metadata), vector.astype(self.vector_dtype).tobytes())
+                    )
+                    rowids.append(cursor.lastrowid)
+            self._writable()
+            self.index.add_with_ids(vectors, np.asarray(rowids, dtype=np.int64))
+            self.dirty = True
+            if self.layout != self._target_layout():
+                # Enough vectors arrived to train the IVF index or the compression
+                self.rebuild()
+        return ids
+
+    def delete(self, ids=None, where=None):
+        with self.lock:
+            if ids is not None:
+                self._delete_rows("doc_id", list(ids))
+            if where is not None:
+                self._delete_rows("track_id", self._where_track_ids(where))
+
+    def get(self, ids=None, where=None, include=("documents", "metadatas")):
+        track_ids = self._where_track_ids(where) if where is not None else None
+        if (ids is not None and not ids) or (track_ids is not None and not track_ids):
+            return {"ids": [], "documents": [], "metadatas": [], "embeddings": []}
+
+        # Look the rows up by ID, or else by track, 500 values at a time to stay within SQLite's parameter limit
+        column, values = ("doc_id", list(ids)) if ids is not None else ("track_id", track_ids)
+        query = "SELECT doc_id, track_id, content, metadata, vector FROM documents"
+        with self.lock:
+            if values is None:
+                rows = self.connection.execute(query).fetchall()
+            else:
+                rows = []
+                for start in range(0, len(values), 500):
+                    batch = values[start:start + 500]
+                    rows += self.connection.execute(
+                        f"{query} WHERE {column} IN ({','.join('?' * len(batch))})", batch
+                    ).fetchall()
+        if ids is not None and track_ids is not None:
+            allowed = set(track_ids)
+            rows = [row for row in rows if row[1] in allowed]
+        return {
+            "ids": [row[0] for row in rows],
+            "documents": [row[2] for row in rows] if "documents" in include else None,
+            "metadatas": [json.loads(row[3]) for row in rows] if "metadatas" in include else None,
+            # The stored (normalized) vectors, not the embedding function's raw output
+            "embeddings": [np.frombuffer(row[4], dtype=self.vector_dtype).astype(np.float32) for row in rows]
+            if "embeddings" in include else None,
+        }
+
+    def count(self):
+        with self.lock:
+            return self.connection.execute("SELECT COUNT(*) FROM documents").fetchone()[0]
+
+    def similarity_search_by_vector_with_relevance_scores(self, embedding, k=4, filter=None):
+        return self.similarity_search_by_vectors_with_relevance_scores([embedding], k=k, filter=filter)[0]
+
+    def similarity_search_by_vectors_with_relevance_scores(self, embeddings, k=4, filter=None):
+        from langchain_core.documents import Document
+
+        if not embeddings:
+            return []
+        queries = np.asarray(embeddings, dtype=np.float32)
+        queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+
+        with self.lock:
+            if self.index is None or self.index.ntotal == 0:
+                return [[] for _ in embeddings]
+            allowed = None
+            if filter is not None:
+                track_ids = self._where_track_ids(filter)
+                allowed = self._rowids_of_tracks(track_ids)
+                if not allowed:
+                    return [[] for _ in embeddings]
+
+            if allowed is not None and len(allowed) <= EXACT_SEARCH_LIMIT:
+                # A narrow filter is answered exactly from the stored vectors
+                hits = self._exact_hits(queries, allowed, k)
+            elif self.compressed:
+                candidates = self._search_index(queries, k * self.rerank_factor, allowed)
+                hits = [
+                    self._exact_hits(query[None, :], [rowid for _, rowid in query_candidates], k)[0]
+                    for query, query_candidates in zip(queries, candidates)
+                ]
+            else:
+                hits = self._search_index(queries, k, allowed)
+
+            rows = {}
+            rowids = list({rowid for query_hits in hits for _, rowid in query_hits})
+            for start in range(0, len(rowids), 500):
+                batch = rowids[start:start + 500]
+                for rowid, content, metadata in self.connection.execute(
+                    f"SELECT id, content, metadata FROM documents WHERE id IN ({','.join('?' * len(batch))})", batch
+                ):
+                    rows[rowid] = (content, json.loads(metadata))
+
+        return [
+            [
+                (Document(page_content=rows[rowid][0], metadata=rows[rowid][1]), max(0.0, 2.0 - 2.0 * score))
+                for score, rowid in query_hits if rowid in rows
+            ]
+            for query_hits in hits
+        ]
+
+    # Helpers
+
+    def _exact_hits(self, queries, rowids, k):
+        if self.compressed:
+            # Compressed codes only approximate the vectors; score with the uncompressed float16 copies instead
+            rowids, vectors = self._stored_vectors(rowids)
+        else:
+            rowids = np.asarray(rowids, dtype=np.int64)
+            vectors = self.index.reconstruct_batch(rowids)
+        hits = []
+        for scores in queries @ vectors.T:
+            top = np.argsort(-scores)[:k]
+            hits.append(list(zip(scores[top].tolist(), rowids[top].tolist())))
+        return hits
+
+    def _stored_vectors(self, rowids):
+        found = []
+        vectors = []
+        for start in range(0, len(rowids), 500):
+            batch = rowids[start:start + 500]
+            for rowid, vector in self.connection.execute(
+                f"SELECT id, vector FROM documents WHERE id IN ({','.join('?' * len(batch))})", batch
+            ):
+                found.append(rowid)
+                vectors.append(np.frombuffer(vector, dtype=self.vector_dtype))
+        if not vectors:
+            return np.empty(0, dtype=np.int64), np.empty((0, self.dimension), dtype=np.float32)
+        return np.asarray(found, dtype=np.int64), np.vstack(vectors).astype(np.float32)
+
+    def _search_index(self, queries, k, allowed):
+        faiss = self.faiss
+        selector = None
+        if allowed is not None:
+            selector = faiss.IDSelectorBatch(np.asarray(allowed, dtype=np.int64))
+        elif self.masked:
+            selector = faiss.IDSelectorNot(faiss.IDSelectorBatch(np.asarray(sorted(self.masked), dtype=np.int64)))
+
+        kind = self._kind()
+        if kind == "hnsw":
+            parameters = faiss.SearchParametersHNSW(efSearch=max(self.ef_search, k))
+        elif kind == "ivf":
+            parameters = faiss.SearchParametersIVF(nprobe=self.nprobe)
+        else:
+            parameters = faiss.SearchParameters()
+        if selector is not None:
+            parameters.sel = selector
+
+        scores, rowids = self.index.search(queries, k, params=parameters)
+        return [
+            [(score, rowid) for score, rowid in zip(query_scores, query_rowids) if rowid != -1]
+            for query_scores, query_rowids in zip(scores.tolist(), rowids.tolist())
+        ]
+
+    def _where_track_ids(self, where):
+        # The backend only filters the text collections by track, as {"track_id": {"$in": [...]}} or {"track_id": id}
+        condition = where.get("track_id") if len(where) == 1 else None
+        if isinstance(condition, dict) and set(condition) == {"$in"}:
+            return list(condition["$in"])
+        if isinstance(condition, str):
+            return [condition]
+        raise ValueError(f"The FAISS vector store only supports track_id filters, got {where}")
+
+    def _rowids_of_tracks(self, track_ids):
+        rowids = []
+        for start in range(0, len(track_ids), 500):
+            batch = track_ids[start:start + 500]
+            rowids += [row[0] for row in self.connection.execute(
+                f"SELECT id FROM documents WHERE track_id IN ({','.join('?' * len(batch))})", batch
+            )]
+        return rowids
+
+    def _delete_rows(self, column, values):
+        rowids = []
+        with self.connection:
+            for start in range(0, len(values), 500):
+                batch = values[start:start + 500]
+                placeholders = ",".join("?" * len(batch))
+                rowids += [row[0] for row in self.connection.execute(
+                    f"SELECT id FROM documents WHERE {column} IN ({placeholders})", batch
+                )]
+                self.connection.execute(f"DELETE FROM documents WHERE {column} IN ({placeholders})", batch)
+            self.connection.executemany("INSERT OR IGNORE INTO deleted (id) VALUES (?)", [(rowid,) for rowid in rowids])
+        if not rowids or self.index is None:
+            return
+
+        if self._kind() == "hnsw":
+            self.masked.update(rowids)
+            if len(self.masked) > HNSW_COMPACTION_RATIO * self.index.ntotal:
+                self.rebuild()
+        else:
+            self._writable()
+            self.index.remove_ids(np.asarray(rowids, dtype=np.int64))
+            self.dirty = True
+
+
+def import_chroma_collection(collection, store, batch_size=1000):
+    """
+    Copies the documents, metadata and embeddings of a Chroma collection into a FAISS store without re-embedding
+    anything, e.g. to move an existing text collection to a compressed index.
+
+    Args:
+        collection: The chromadb collection to copy.
+        store (FaissVectorStore): The store receiving the documents.
+        batch_size (int): Number of documents read from Chroma at a time.
+
+    Returns:
+        int: Number of documents copied.
+    """
+    from langchain_core.documents import Document
+
+    copied = 0
+    while True:
+        batch = collection.get(include=["documents", "metadatas", "embeddings"], limit=batch_size, offset=copied)
+        if not batch["ids"]:
+            break
+        documents = [
+            Document(page_content=content or "", metadata=metadata or {})
+            for content, metadata in zip(batch["documents"], batch["metadatas"])
+        ]
+        store.add_embeddings(documents, batch["embeddings"], ids=batch["ids"])
+        copied += len(batch["ids"])
+    store.persist()
+    logger.info(f"Copied {copied} documents from Chroma collection {collection.name} to FAISS")
+    return copied
@@ -0,0 +1,238 @@
+import json
+import logging
+import os
+import threading
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Spotify audio features used for mood similarity, with the range each one is scaled from to [0, 1]
+FEATURE_RANGES = {
+    "danceability": (0.0, 1.0),
+    "energy": (0.0, 1.0),
+    "valence": (0.0, 1.0),
+    "acousticness": (0.0, 1.0),
+    "instrumentalness": (0.0, 1.0),
+    "speechiness": (0.0, 1.0),
+    "liveness": (0.0, 1.0),
+    "tempo": (50.0, 200.0),
+    "loudness": (-60.0, 0.0),
+}
+FEATURES = list(FEATURE_RANGES)
+
+# Target profiles of common moods, on the normalized [0, 1] scale; only the listed features are compared
+MOOD_PROFILES = {
+    "calm": {"energy": 0.2, "tempo": 0.3, "loudness": 0.6},
+    "acoustic": {"acousticness": 0.9},
+    "instrumental": {"instrumentalness": 0.9, "speechiness": 0.05},
+    "energetic": {"energy": 0.9, "tempo": 0.6, "loudness": 0.85},
+    "high-energy": {"energy": 0.9, "tempo": 0.6, "loudness": 0.85},
+    "happy": {"valence": 0.85, "energy": 0.7},
+    "sad": {"valence": 0.15, "energy": 0.3},
+    "dance": {"danceability": 0.85, "energy": 0.75},
+    "focus": {"instrumentalness": 0.8, "speechiness": 0.05, "energy": 0.4},
+    "live": {"liveness": 0.8},
+}
+
+
+def normalize_features(features):
+    """
+    Scales raw Spotify audio features to [0, 1].
+
+    Args:
+        features (dict): Raw audio features, e.g. the metadata of an audio document.
+
+    Returns:
+        numpy.ndarray: The normalized float32 feature vector in `FEATURES` order, or None if a feature is missing.
+    """
+    vector = np.empty(len(FEATURES), dtype=np.float32)
+    for i, (feature, (low, high)) in enumerate(FEATURE_RANGES.items()):
+        value = features.get(feature)
+        if not isinstance(value, (int, float)):
+            return None
+        vector[i] = (value - low) / (high - low)
+    return np.clip(vector, 0.0, 1.0)
+
+
+def mood_profile(moods=(), features=None):
+    """
+    Builds a target profile from mood names and explicit feature targets. Features named by several moods are
+    averaged; explicit targets (already on the [0, 1] scale) take precedence.
+
+    Args:
+        moods (list): Names from `MOOD_PROFILES`.
+        features (dict): Explicit targets, e.g. {"energy": 0.8}.
+
+    Returns:
+        dict: Mapping of feature name to its normalized target.
+
+    Raises:
+        ValueError: If a mood or feature is unknown.
+    """
+    targets = {}
+    for mood in moods:
+        if mood not in MOOD_PROFILES:
+            raise ValueError(f"Unknown mood '{mood}', expected one of {', '.join(MOOD_PROFILES)}")
+        for feature, value in MOOD_PROFILES[mood].items():
+            targets.setdefault(feature, []).append(value)
+    profile = {feature: sum(values) / len(values) for feature, values in targets.items()}
+    for feature, value in (features or {}).items():
+        if feature not in FEATURE_RANGES:
+            raise ValueError(f"Unknown audio feature '{feature}', expected one of {', '.join(FEATURES)}")
+        profile[feature] = float(value)
+    return profile
+
+
+class FeatureMatrix():
+    """
+    A user's normalized audio features as a float32 matrix with one row per track, memory-mapped from disk so
+    similarity queries are a single vectorized distance computation over the whole library.
+    """
+    def __init__(self, track_ids, matrix):
+        self.track_ids = track_ids
+        self.matrix = matrix
+        self.rows = {track_id: row for row, track_id in enumerate(track_ids)}
+
+    def nearest(self, target, k, exclude=()):
+        """
+        Finds the tracks whose features are closest (Euclidean distance) to a target profile.
+
+        Args:
+            target (dict): Mapping of feature name to normalized target; unlisted features are ignored.
+            k (int): Number of tracks to return.
+            exclude (iterable): Track IDs to leave out.
+
+        Returns:
+            list: Up to k (track_id, distance) tuples, closest first.
+        """
+        if not target or not self.track_ids or k <= 0:
+            return []
+        columns = [FEATURES.index(feature) for feature in target]
+        values = np.asarray(list(target.values()), dtype=np.float32)
+        distances = np.sqrt(((self.matrix[:, columns] - values) ** 2).sum(axis=1))
+
+        for track_id in exclude:
+            if track_id in self.rows:
+                distances[self.rows[track_id]] = np.inf
+        k = min(k, len(distances))
+        top = np.argpartition(distances, k - 1)[:k]
+        top = top[np.argsort(distances[top], kind="stable")]
+        return [(self.track_ids[i], float(distances[i])) for i in top if np.isfinite(distances[i])]
+
+    def similar(self, track_id, k):
+        """
+        Finds the tracks whose features are closest to those of a seed track, across every feature.
+
+        Returns:
+            list: Up to k (track_id, distance) tuples, closest first, without the seed track itself.
+
+        Raises:
+            KeyError: If the seed track has no row in the matrix.
+        """
+        seed = self.matrix[self.rows[track_id]]
+        return self.nearest(dict(zip(FEATURES, seed.tolist())), k, exclude=[track_id])
+
+
+class FeatureMatrixStore():
+    """
+    Persists one feature matrix per user as `<user_id>.npy` with its track IDs in `<user_id>.json`, and keeps the
+    opened matrices memory-mapped until the files are rewritten.
+    """
+    def __init__(self, directory):
+        self.directory = directory
+        self.lock = threading.Lock()
+        # Serializes rewrites of the files, so concurrent updates do not lose each other's rows
+        self.update_lock = threading.Lock()
+        self.loaded = {}
+        os.makedirs(directory, exist_ok=True)
+
+    def _paths(self, user_id):
+        return os.path.join(self.directory, f"{user_id}.npy"), os.path.join(self.directory, f"{user_id}.json")
+
+    def _save(self, user_id, rows):
+        """
+        Saves a user's matrix from a mapping of track ID to normalized feature vector.
+        """
+        matrix = np.vstack(list(rows.values())) if rows else np.empty((0, len(FEATURES)), dtype=np.float32)
+        matrix_path, ids_path = self._paths(user_id)
+        # Write to temporary files and swap them in so readers never see a half-written matrix
+        with open(f"{matrix_path}.tmp", "wb") as f:
+            np.save(f, matrix)
+        with open(f"{ids_path}.tmp", "w") as f:
+            json.dump(list(rows), f)
+        with self.lock:
+            os.replace(f"{matrix_path}.tmp", matrix_path)
+            os.replace(f"{ids_path}.tmp", ids_path)
+            self.loaded.pop(user_id, None)
+
+    def build(self, user_id, metadatas):
+        """
+        Builds and saves a user's matrix from the metadata of their audio documents. Tracks without a complete
+        set of audio features are left out. Only the feature vectors are kept, so `metadatas` may be a generator
+        reading the documents page by page.
+
+        Args:
+            user_id (str): The unique identifier for the user.
+            metadatas (iterable): (track_id, metadata) tuples.
+
+        Returns:
+            int: Number of tracks in the matrix.
+        """
+        rows = {}
+        for track_id, metadata in metadatas:
+            vector = normalize_features(metadata or {})
+            if vector is not None:
+                rows[track_id] = vector
+        with self.update_lock:
+            self._save(user_id, rows)
+        logger.info(f"Built the audio feature matrix of user {user_id} with {len(rows)} tracks")
+        return len(rows)
+
+    def update(self, user_id, metadatas, removed_ids=()):
+        """
+        Updates the rows of some tracks in a user's saved matrix, e.g. of a page of ingested tracks, without
+        reading every audio document again. Tracks without a complete set of audio features are removed.
+
+        Args:
+            user_id (str): The unique identifier for the user.
+            metadatas (list): (track_id, metadata) tuples of added or changed tracks.
+            removed_ids (iterable): IDs of tracks to remove.
+
+        Returns:
+            int: Number of tracks in the matrix, or None if the user has no matrix to update (see `build`).
+        """
+        matrix_path, ids_path = self._paths(user_id)
+        with self.update_lock:
+            if not os.path.exists(matrix_path):
+                return None
+            with open(ids_path) as f:
+                track_ids = json.load(f)
+            rows = dict(zip(track_ids, np.load(matrix_path)))
+            for track_id in removed_ids:
+                rows.pop(track_id, None)
+            for track_id, metadata in metadatas:
+                vector = normalize_features(metadata or {})
+                if vector is None:
+                    rows.pop(track_id, None)
+                else:
+                    rows[track_id] = vector
+            self._save(user_id, rows)
+        return len(rows)
+
+    def load(self, user_id):
+        """
+        Returns a user's feature matrix, or None if it was never built.
+        """
+        matrix_path, ids_path = self._paths(user_id)
+        with self.lock:
+            if user_id in self.loaded:
+                return self.loaded[user_id]
+            if not os.path.exists(matrix_path):
+                return None
+            with open(ids_path) as f:
+                track_ids = json.load(f)
+            matrix = np.load(matrix_path, mmap_mode="r")
+            feature_matrix = FeatureMatrix(track_ids, matrix)
+            self.loaded[user_id] = feature_matrix
+            return feature_matrix
@@ -0,0 +1,158 @@
+import logging
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+
+# Title suffixes naming a release or guest artists rather than a different song, such as "(Remastered 2011)",
+# "[feat. X]" or " - 2009 Remaster"; other suffixes such as "(Live)" or " - Part 2" tell songs apart
+NOISE_SUFFIX = re.compile(
+    r"[\(\[][^\)\]]*\b(?:remaster(?:ed)?|feat|ft|featuring)\b[^\)\]]*[\)\]]"
+    r"|\s+-\s+(?:(?!\s-\s).)*\b(?:remaster(?:ed)?|feat|ft|featuring)\b(?:(?!\s-\s).)*$"
+)
+
+
+def normalize_key(artist, title):
+    """
+    Builds the cache key for a song so that trivial differences in spelling map to the same entry.
+    Accents, case, punctuation and remaster or featured-artist suffixes (see `NOISE_SUFFIX`) are ignored.
+
+    Args:
+        artist (str): Name of the artist.
+        title (str): Title of the song.
+
+    Returns:
+        str: The normalized "artist|title" key.
+    """
+    def normalize(value):
+        value = unicodedata.normalize("NFKD", value or "")
+        value = "".join(c for c in value if not unicodedata.combining(c)).lower()
+        value = NOISE_SUFFIX.sub(" ", value)
+        value = re.sub(r"[^\w\s]", " ", value)
+        return " ".join(value.split())
+
+    return f"{normalize(artist)}|{normalize(title)}"
+
+
+class LyricsCache():
+    """
+    Local SQLite cache of song lyrics keyed by normalized artist/title. Songs Genius has no lyrics for are stored
+    as negative entries so they are not searched for again until `not_found_ttl` seconds have passed.
+    """
+    def __init__(self, path, not_found_ttl=30 * 24 * 3600):
+        self.not_found_ttl = not_found_ttl
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        with self.lock, self.connection:
+            self.connection.execute("PRAGMA journal_mode=WAL")
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS lyrics ("
+                "key TEXT PRIMARY KEY, artist TEXT, title TEXT, lyrics TEXT, fetched_at REAL)"
+            )
+
+    def get_many(self, keys):
+        """
+        Looks up several cache keys at once.
+
+        Args:
+            keys (list): Keys built with `normalize_key`.
+
+        Returns:
+            dict: Mapping of key to lyrics for every cached key. Negative entries map to None; expired negative
+            entries and unknown keys are omitted.
+        """
+        keys = list(set(keys))
+        found = {}
+        with self.lock:
+            # Stay well below SQLite's bound-parameter limit
+            for start in range(0, len(keys), 500):
+                batch = keys[start:start + 500]
+                placeholders = ",".join("?" * len(batch))
+                rows = self.connection.execute(
+                    f"SELECT key, lyrics, fetched_at FROM lyrics WHERE key IN ({placeholders})", batch
+                ).fetchall()
+                for key, lyrics, fetched_at in rows:
+                    if lyrics is None and time.time() - fetched_at > self.not_found_ttl:
+                        continue
+                    found[key] = lyrics
+        return found
+
+    def put(self, artist, title, lyrics):
+        """
+        Stores the lyrics of a song, or a negative entry if `lyrics` is None.
+        """
+        with self.lock, self.connection:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO lyrics (key, artist, title, lyrics, fetched_at) VALUES (?, ?, ?, ?, ?)",
+                (normalize_key(artist, title), artist, title, lyrics, time.time())
+            )
+
+
+class GeniusManager():
+    """
+    Serves song lyrics from the local cache first and fetches misses from Genius with a bounded worker pool.
+    """
+    def __init__(self, genius, cache, max_workers=8):
+        self.genius = genius
+        self.cache = cache
+        self.max_workers = max_workers
+
+    def _fetch(self, artist, title):
+        """
+        Fetches lyrics from Genius and caches the result. Lookup failures (timeouts, HTTP errors) are not cached,
+        so the song is retried on the next request.
+        """
+        try:
+            song = self.genius.search_song(title, artist)
+        except Exception as e:
+            logger.warning(f"Failed to fetch lyrics for '{title}' by {artist}: {e}")
+            return None
+
+        lyrics = song.lyrics if song and song.lyrics else None
+        self.cache.put(artist, title, lyrics)
+        return lyrics
+
+    def get_lyrics(self, artist, title):
+        """
+        Retrieves the lyrics of a single song.
+
+        Args:
+            artist (str): Name of the artist.
+            title (str): Title of the song.
+
+        Returns:
+            str: The song lyrics, or None if Genius has no lyrics for the song.
+        """
+        return self.get_lyrics_many([(artist, title)])[0]
+
+    def get_lyrics_many(self, songs):
+        """
+        Retrieves the lyrics of many songs, answering from the cache where possible and fetching the remaining
+        songs from Genius concurrently. Duplicate songs are only fetched once.
+
+        Args:
+            songs (list): (artist, title) tuples.
+
+        Returns:
+            list: Lyrics for each song in the same order, with None where no lyrics were found.
+        """
+        keys = [normalize_key(artist, title) for artist, title in songs]
+        lyrics = self.cache.get_many(keys)
+
+        misses = {}
+        for key, song in zip(keys, songs):
+            if key not in lyrics:
+                misses.setdefault(key, song)
+
+        if misses:
+            logger.info(f"Fetching lyrics for {len(misses)} songs from Genius ({len(songs) - len(misses)} served from cache)")
+            with ThreadPoolExecutor(max_workers=min(self.max_workers, len(misses))) as executor:
+                fetched = executor.map(lambda song: self._fetch(*song), misses.values())
+                lyrics.update(zip(misses.keys(), fetched))
+
+        return [lyrics.get(key) for key in keys]
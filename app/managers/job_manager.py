@@ -0,0 +1,161 @@
+import logging
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+
+class IngestJob():
+    """
+    Progress of a single background ingest. Updated by the worker thread and read by the progress endpoint.
+    """
+    def __init__(self, user_id, mode):
+        self.id = uuid.uuid4().hex
+        self.user_id = user_id
+        self.mode = mode
+        self.status = "queued"
+        self.processed = 0
+        self.embedded = 0
+        self.offset = 0
+        self.total = None
+        self.errors = []
+        self.result = None
+        self.exception = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.lock = threading.Lock()
+        self.finished = threading.Event()
+
+    def update(self, processed, offset, total, embedded):
+        """
+        Records the progress of the job after a committed page.
+
+        Args:
+            processed (int): Number of saved tracks walked by this job so far.
+            offset (int): Position in the user's library reached so far.
+            total (int): Number of saved tracks in the user's library.
+            embedded (int): Number of songs embedded by this job so far.
+        """
+        with self.lock:
+            self.processed = processed
+            self.offset = offset
+            self.total = total
+            self.embedded = embedded
+
+    def wait(self, timeout=None):
+        """
+        Blocks until the job has completed or failed.
+
+        Args:
+            timeout (float): Maximum number of seconds to wait. Defaults to waiting indefinitely.
+
+        Returns:
+            bool: Whether the job has finished.
+        """
+        return self.finished.wait(timeout)
+
+    @property
+    def active(self):
+        return self.status in ("queued", "running")
+
+    def to_dict(self):
+        """
+        Returns a JSON-serializable snapshot of the job, including its processing rate (tracks/sec) and the
+        estimated number of seconds until it finishes.
+        """
+        with self.lock:
+            end = self.finished_at or time.time()
+            elapsed = end - self.started_at if self.started_at else 0.0
+            rate = self.processed / elapsed if elapsed > 0 else 0.0
+            eta = None
+            if self.status == "running" and self.total is not None and rate > 0:
+                eta = max(self.total - self.offset, 0) / rate
+            return {
+                "job_id": self.id,
+                "user_id": self.user_id,
+                "mode": self.mode,
+                "status": self.status,
+                "processed": self.processed,
+                "embedded": self.embedded,
+                "offset": self.offset,
+                "total": self.total,
+                "rate": rate,
+                "eta": eta,
+                "elapsed": elapsed,
+                "errors": list(self.errors),
+                "result": self.result,
+            }
+
+
+class JobManager():
+    """
+    Runs ingests on a small in-process worker pool so they never block the web server's event loop,
+    and keeps the most recent jobs around for progress reporting.
+    """
+    def __init__(self, max_workers=2, max_finished_jobs=100):
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="ingest")
+        self.max_finished_jobs = max_finished_jobs
+        self.jobs = OrderedDict()
+        self.lock = threading.Lock()
+
+    def submit(self, user_id, mode, target, *args, **kwargs):
+        """
+        Queues an ingest for a user. If the user already has a queued or running ingest, that job is returned
+        instead so the same library is never ingested twice concurrently.
+
+        Args:
+            user_id (str): The unique identifier for the user.
+            mode (str): The ingest mode, reported back in the job status.
+            target (callable): Function performing the ingest. It is called as `target(job, *args, **kwargs)`
+                and its return value is stored as the job result.
+
+        Returns:
+            IngestJob: The queued (or already active) job.
+        """
+        with self.lock:
+            for job in self.jobs.values():
+                if job.user_id == user_id and job.active:
+                    return job
+
+            job = IngestJob(user_id, mode)
+            self.jobs[job.id] = job
+            self._evict_finished_jobs()
+
+        self.executor.submit(self._run, job, target, *args, **kwargs)
+        return job
+
+    def get(self, job_id):
+        """
+        Returns the job with the given ID, or None if it is unknown or has been evicted.
+        """
+        with self.lock:
+            return self.jobs.get(job_id)
+
+    def _run(self, job, target, *args, **kwargs):
+        with job.lock:
+            job.status = "running"
+            job.started_at = time.time()
+        try:
+            result = target(job, *args, **kwargs)
+            with job.lock:
+                job.result = result
+                job.status = "completed"
+        except Exception as e:
+            logger.exception(f"Ingest job {job.id} for user {job.user_id} failed")
+            with job.lock:
+                job.errors.append(str(e))
+                job.exception = e
+                job.status = "failed"
+        finally:
+            with job.lock:
+                job.finished_at = time.time()
+            job.finished.set()
+
+    def _evict_finished_jobs(self):
+        finished = [job_id for job_id, job in self.jobs.items() if not job.active]
+        for job_id in finished[:max(len(finished) - self.max_finished_jobs, 0)]:
+            del self.jobs[job_id]
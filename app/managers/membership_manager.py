@@ -0,0 +1,57 @@
+import sqlite3
+import threading
+
+
+class MembershipIndex():
+    """
+    Compact SQLite index of which tracks of the shared track catalog are in which user's library.
+    Each row only holds a user ID, a track ID and the time the user liked the track.
+    """
+    def __init__(self, path):
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        with self.lock, self.connection:
+            self.connection.execute("PRAGMA journal_mode=WAL")
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS membership ("
+                "user_id TEXT, track_id TEXT, added_at TEXT, PRIMARY KEY (user_id, track_id)) WITHOUT ROWID"
+            )
+
+    def add_many(self, user_id, tracks):
+        """
+        Adds tracks to a user's library.
+
+        Args:
+            user_id (str): The unique identifier for the user.
+            tracks (list): (track_id, added_at) tuples.
+        """
+        with self.lock, self.connection:
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO membership (user_id, track_id, added_at) VALUES (?, ?, ?)",
+                [(user_id, track_id, added_at) for track_id, added_at in tracks]
+            )
+
+    def remove_many(self, user_id, track_ids):
+        """
+        Removes tracks from a user's library. The tracks stay in the shared catalog.
+        """
+        with self.lock, self.connection:
+            self.connection.executemany(
+                "DELETE FROM membership WHERE user_id = ? AND track_id = ?",
+                [(user_id, track_id) for track_id in track_ids]
+            )
+
+    def get_track_ids(self, user_id):
+        """
+        Returns the set of track IDs in a user's library.
+        """
+        with self.lock:
+            rows = self.connection.execute("SELECT track_id FROM membership WHERE user_id = ?", (user_id,))
+            return {track_id for track_id, in rows}
+
+    def count(self, user_id):
+        """
+        Returns the number of tracks in a user's library.
+        """
+        with self.lock:
+            return self.connection.execute("SELECT COUNT(*) FROM membership WHERE user_id = ?", (user_id,)).fetchone()[0]
@@ -0,0 +1,159 @@
+import hashlib
+import json
+import re
+import sqlite3
+import threading
+import unicodedata
+
+# Words of a query; everything else (quotes, operators, punctuation) is dropped before it reaches FTS5
+QUERY_TOKEN = re.compile(r"\w+", re.UNICODE)
+
+
+def normalize_term(term):
+    """
+    Folds a query word the way the FTS5 tokenizer folds indexed words: lowercase, without diacritics.
+    """
+    decomposed = unicodedata.normalize("NFKD", term.lower())
+    return "".join(char for char in decomposed if not unicodedata.combining(char))
+
+
+def scope_token(scope):
+    """
+    Turns a scope (a collection name) into a single FTS5 token, so restricting a search to a scope is an exact
+    token match that FTS5 intersects with the query terms instead of a filter applied after matching.
+    """
+    return "s" + hashlib.sha1(scope.encode("utf-8")).hexdigest()[:16]
+
+
+class SparseIndex():
+    """
+    On-disk BM25 index of the lyric chunks stored in the text collections, kept in an SQLite FTS5 table next to
+    the dense Chroma collections. It serves the lexical side of hybrid search: exact titles and rare lyric phrases
+    that dense embeddings rank poorly. Chunks are grouped by scope (the text collection they belong to) and are
+    added and removed per track as ingests change the collections.
+
+    Query words found in more than `max_document_frequency` of all chunks (e.g. "love", or "by" from the track
+    headers) are left out of searches: they carry almost no BM25 weight but make FTS5 score most of the index,
+    which would put large libraries far outside a millisecond budget.
+    """
+    def __init__(self, path, max_document_frequency=0.1):
+        self.max_document_frequency = max_document_frequency
+        # Document frequencies of recently queried words; reading them from FTS5 walks the word's whole posting
+        # list, so they are kept until the next write to the index
+        self.frequencies = {}
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        with self.lock, self.connection:
+            self.connection.execute("PRAGMA journal_mode=WAL")
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS chunks ("
+                "id INTEGER PRIMARY KEY, scope TEXT, track_id TEXT, chunk INTEGER, metadata TEXT)"
+            )
+            self.connection.execute("CREATE INDEX IF NOT EXISTS chunks_scope_track ON chunks (scope, track_id)")
+            self.connection.execute(
+                "CREATE VIRTUAL TABLE IF NOT EXISTS chunks_fts USING fts5("
+                "scope, content, tokenize='unicode61 remove_diacritics 2')"
+            )
+            self.connection.execute(
+                "CREATE VIRTUAL TABLE IF NOT EXISTS chunks_vocab USING fts5vocab(chunks_fts, 'row')"
+            )
+
+    def add_documents(self, scope, documents):
+        """
+        Indexes text documents, replacing any chunks already indexed for their tracks.
+
+        Args:
+            scope (str): The collection the documents belong to.
+            documents (list): Documents with `track_id` (and optionally `chunk`) in their metadata.
+        """
+        if not documents:
+            return
+        track_ids = list({document.metadata['track_id'] for document in documents})
+        with self.lock, self.connection:
+            self.frequencies.clear()
+            self._delete(scope, track_ids)
+            token = scope_token(scope)
+            for document in documents:
+                cursor = self.connection.execute(
+                    "INSERT INTO chunks (scope, track_id, chunk, metadata) VALUES (?, ?, ?, ?)",
+                    (scope, document.metadata['track_id'], document.metadata.get('chunk', 0),
+                     json.dumps(document.metadata))
+                )
+                self.connection.execute(
+                    "INSERT INTO chunks_fts (rowid, scope, content) VALUES (?, ?, ?)",
+                    (cursor.lastrowid, token, document.page_content)
+                )
+
+    def remove_tracks(self, scope, track_ids):
+        """
+        Removes every chunk of the given tracks from a scope.
+        """
+        with self.lock, self.connection:
+            self.frequencies.clear()
+            self._delete(scope, list(track_ids))
+
+    def count(self, scope):
+        """
+        Returns the number of chunks indexed in a scope.
+        """
+        with self.lock:
+            return self.connection.execute("SELECT COUNT(*) FROM chunks WHERE scope = ?", (scope,)).fetchone()[0]
+
+    def search(self, scope, query, limit=100):
+        """
+        Ranks the chunks of a scope against a query with BM25. Any query word may match; chunks matching more
+        and rarer words rank higher. Queries made only of very common words return no results.
+
+        Args:
+            scope (str): The collection to search.
+            query (str): The search query.
+            limit (int): Maximum number of chunks returned.
+
+        Returns:
+            list: Up to `limit` (content, metadata, score) tuples, best first; higher scores are better.
+        """
+        terms = {normalize_term(term) for term in QUERY_TOKEN.findall(query)}
+        if not terms:
+            return []
+        with self.lock:
+            terms = self._selective_terms(sorted(terms))
+            if not terms:
+                return []
+            quoted_terms = " OR ".join(f'"{term}"' for term in terms)
+            match = f'scope : "{scope_token(scope)}" AND content : ({quoted_terms})'
+            rows = self.connection.execute(
+                "SELECT chunks_fts.content, chunks.metadata, bm25(chunks_fts, 0.0, 1.0) AS score "
+                "FROM chunks_fts JOIN chunks ON chunks.id = chunks_fts.rowid "
+                "WHERE chunks_fts MATCH ? ORDER BY score LIMIT ?",
+                (match, limit)
+            ).fetchall()
+        # FTS5 reports BM25 as a negative number, lower being better
+        return [(content, json.loads(metadata), -score) for content, metadata, score in rows]
+
+    def _selective_terms(self, terms):
+        total = self.connection.execute("SELECT MAX(id) FROM chunks").fetchone()[0] or 0
+        if len(self.frequencies) > 100000:
+            self.frequencies.clear()
+        for term in terms:
+            if term not in self.frequencies:
+                # One equality lookup per word: fts5vocab only avoids a vocabulary scan for `term = ?`
+                row = self.connection.execute("SELECT doc FROM chunks_vocab WHERE term = ?", (term,)).fetchone()
+                self.frequencies[term] = row[0] if row else 0
+        # Words missing from the vocabulary match nothing and are dropped as well
+        return [
+            term for term in terms
+            if 0 < self.frequencies[term] <= max(1, total * self.max_document_frequency)
+        ]
+
+    def _delete(self, scope, track_ids):
+        # Stay well below SQLite's bound-parameter limit
+        for start in range(0, len(track_ids), 500):
+            batch = track_ids[start:start + 500]
+            placeholders = ",".join("?" * len(batch))
+            rowids = [
+                (rowid,) for rowid, in self.connection.execute(
+                    f"SELECT id FROM chunks WHERE scope = ? AND track_id IN ({placeholders})", [scope, *batch]
+                )
+            ]
+            self.connection.executemany("DELETE FROM chunks_fts WHERE rowid = ?", rowids)
+            self.connection.executemany("DELETE FROM chunks WHERE id = ?", rowids)
@@ -1,7 +1,7 @@
 import spotipy
 from spotipy.oauth2 import SpotifyOAuth
 import os
-from backend import HTTPException
+from fastapi import HTTPException
 
 
 class SpotifyManager():
@@ -18,11 +18,20 @@ class SpotifyManager():
                         )
 
         self.sp = spotipy.Spotify(auth_manager=self.sp_oauth)
-        self.username = self.sp.me()['id']
-        self.token = self.sp_oauth.get_access_token()
+        self._username = None
+
+    @property
+    def username(self):
+        # Resolved on first use so constructing the manager makes no network calls
+        if self._username is None:
+            self._username = self.sp.me()['id']
+        return self._username
+
+    @property
+    def token(self):
+        return self.sp_oauth.get_access_token()
 
 
-        
     def get_spotify_client(self):
         token_info = self.sp_oauth.get_cached_token()
 
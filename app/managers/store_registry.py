@@ -0,0 +1,259 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from app import config
+from app.utils.lazy import lazy
+
+logger = logging.getLogger(__name__)
+
+
+@lazy
+def get_chroma_client():
+    """
+    Returns the chromadb client shared by every vector-store handle, so the persistent database is opened once
+    per process instead of once per collection.
+    """
+    import chromadb
+
+    return chromadb.PersistentClient(path=config.CHROMA_PERSIST_DIRECTORY)
+
+
+class StoreRegistry():
+    """
+    Keeps open vector-store handles in a bounded LRU so repeated requests for the same collection reuse the same
+    handle instead of setting up a new one. Handles idle for longer than `idle_timeout` seconds are evicted, as are
+    the least recently used ones beyond `max_entries`. Evicting a handle only drops it from the registry; the
+    collection itself stays on disk. `on_evict(key, handle)`, if given, is called for every evicted handle,
+    outside the registry's lock.
+
+    Handles checked out with `pinned` are never evicted until they are released, so a long ingest keeps writing
+    to the handle every request reads from instead of a second one opened from disk.
+    """
+    def __init__(self, factory, max_entries=64, idle_timeout=900, on_evict=None):
+        self.factory = factory
+        self.on_evict = on_evict
+        self.max_entries = max_entries
+        self.idle_timeout = idle_timeout
+        self.handles = OrderedDict()
+        self.lock = threading.Lock()
+        self.key_locks = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, pin=False):
+        """
+        Returns the handle for a key, building it with the factory on first use. Concurrent first requests for the
+        same key build the handle only once.
+
+        Args:
+            key (str): The key of the handle, e.g. a collection name.
+            pin (bool): Whether to pin the handle until a matching `release`. Defaults to False.
+
+        Returns:
+            The cached or newly built handle.
+        """
+        evicted = []
+        with self.lock:
+            evicted += self._evict_idle()
+            handle = self._touch(key, pin)
+            if handle is not None:
+                self.hits += 1
+                self._notify_evicted(evicted)
+                return handle
+            key_lock = self.key_locks.setdefault(key, threading.Lock())
+        self._notify_evicted(evicted)
+
+        with key_lock:
+            with self.lock:
+                # Another thread may have built the handle while this one waited
+                handle = self._touch(key, pin)
+                if handle is not None:
+                    self.hits += 1
+                    return handle
+            handle = self.factory(key)
+            with self.lock:
+                self.misses += 1
+                self.handles[key] = [handle, time.monotonic(), int(pin)]
+                self.key_locks.pop(key, None)
+                # Pinned handles are skipped, so the registry may briefly hold more than `max_entries`
+                overflow = len(self.handles) - self.max_entries
+                for evicted_key, (evicted_handle, _, pins) in list(self.handles.items()):
+                    if overflow <= 0:
+                        break
+                    if pins or evicted_key == key:
+                        continue
+                    del self.handles[evicted_key]
+                    evicted.append((evicted_key, evicted_handle))
+                    overflow -= 1
+                    logger.debug(f"Evicted least recently used store handle {evicted_key}")
+            self._notify_evicted(evicted)
+            return handle
+
+    def release(self, key):
+        """
+        Unpins a handle pinned by `get(key, pin=True)`. Its idle time starts from the release.
+        """
+        with self.lock:
+            entry = self.handles.get(key)
+            if entry is not None and entry[2] > 0:
+                entry[1] = time.monotonic()
+                entry[2] -= 1
+
+    @contextmanager
+    def pinned(self, key):
+        """
+        Checks out the handle for a key for the duration of a `with` block, during which it cannot be evicted.
+
+        Args:
+            key (str): The key of the handle, e.g. a collection name.
+
+        Yields:
+            The cached or newly built handle.
+        """
+        handle = self.get(key, pin=True)
+        try:
+            yield handle
+        finally:
+            self.release(key)
+
+    def discard(self, key):
+        """
+        Drops the handle for a key, e.g. after its collection was deleted.
+        """
+        with self.lock:
+            self.handles.pop(key, None)
+
+    def stats(self):
+        """
+        Returns the number of open handles and of handle hits and misses so far.
+        """
+        with self.lock:
+            return {"size": len(self.handles), "hits": self.hits, "misses": self.misses}
+
+    def _touch(self, key, pin=False):
+        entry = self.handles.get(key)
+        if entry is None:
+            return None
+        entry[1] = time.monotonic()
+        entry[2] += int(pin)
+        self.handles.move_to_end(key)
+        return entry[0]
+
+    def _evict_idle(self):
+        # Entries are kept in order of last use, so idle ones are at the front; pinned ones are passed over
+        deadline = time.monotonic() - self.idle_timeout
+        evicted = []
+        for key, (handle, last_used, pins) in list(self.handles.items()):
+            if last_used > deadline:
+                break
+            if pins:
+                continue
+            del self.handles[key]
+            evicted.append((key, handle))
+            logger.debug(f"Evicted idle store handle {key}")
+        return evicted
+
+    def _notify_evicted(self, evicted):
+        if self.on_evict is None:
+            return
+        for key, handle in evicted:
+            try:
+                self.on_evict(key, handle)
+            except Exception as e:
+                logger.error(f"Failed to close evicted store handle {key}: {e}")
+
+
+def import_existing_chroma_collection(collection_name, store):
+    """
+    Fills an empty FAISS store from the Chroma collection of the same name, if there is one, so switching
+    `VECTOR_STORE_BACKEND` to "faiss" keeps existing libraries searchable without re-embedding them.
+
+    Args:
+        collection_name (str): Name of the collection.
+        store (FaissVectorStore): The empty store.
+
+    Returns:
+        int: Number of documents imported.
+    """
+    from app.managers.faiss_store import import_chroma_collection
+
+    try:
+        collection = get_chroma_client().get_collection(collection_name)
+    except ImportError:
+        return 0
+    except Exception:
+        # The collection does not exist; chromadb raises ValueError or NotFoundError depending on its version
+        return 0
+    if collection.count() == 0:
+        return 0
+    logger.info(f"Importing {collection.count()} documents of Chroma collection {collection_name} into FAISS")
+    return import_chroma_collection(collection, store)
+
+
+def build_vector_store(key):
+    """
+    Builds the vector store for a (backend, collection name) key: a FAISS index for the "faiss" backend,
+    otherwise a Chroma collection on the shared chromadb client. A new, empty FAISS store is filled from the
+    Chroma collection of the same name if there is one.
+    """
+    from app.managers.chroma_manager import ChromaVectorStore
+    from app.models.embedding import get_embedding_function
+
+    backend, collection_name = key
+    if backend == "faiss":
+        from app.managers.faiss_store import FaissVectorStore
+
+        store = FaissVectorStore(
+            collection_name,
+            get_embedding_function(),
+            config.FAISS_INDEX_DIRECTORY,
+            index_type=config.FAISS_INDEX_TYPE,
+            nlist=config.FAISS_NLIST,
+            nprobe=config.FAISS_NPROBE,
+            hnsw_m=config.FAISS_HNSW_M,
+            ef_search=config.FAISS_HNSW_EF_SEARCH,
+            compression=config.FAISS_COMPRESSION,
+            pca_dimension=config.FAISS_PCA_DIMENSION,
+            pq_m=config.FAISS_PQ_M,
+            rerank_factor=config.FAISS_RERANK_FACTOR,
+        )
+        if store.count() == 0:
+            import_existing_chroma_collection(collection_name, store)
+        return store
+    return ChromaVectorStore(collection_name, get_embedding_function(), get_chroma_client())
+
+
+@lazy
+def get_store_registry():
+    """
+    Returns the process-wide registry of vector-store handles, keyed by (backend, collection name).
+    """
+    # Stores that buffer writes (FAISS) are flushed to disk when their handle is evicted
+    return StoreRegistry(build_vector_store, max_entries=config.STORE_CACHE_MAX_ENTRIES,
+                         idle_timeout=config.STORE_CACHE_IDLE_SECONDS,
+                         on_evict=lambda key, store: store.persist())
+
+
+def get_vector_store(collection_name, backend="chroma"):
+    """
+    Returns the open vector store for a collection, opening it on first use.
+
+    Args:
+        collection_name (str): Name of the collection.
+        backend (str): "chroma" or "faiss". Defaults to "chroma".
+
+    Returns:
+        VectorStore: The collection's vector store.
+    """
+    return get_store_registry().get((backend, collection_name))
+
+
+def pinned_vector_store(collection_name, backend="chroma"):
+    """
+    Checks out the vector store for a collection for the duration of a `with` block, e.g. an ingest, so its handle
+    is not evicted while it is in use. See `StoreRegistry.pinned`.
+    """
+    return get_store_registry().pinned((backend, collection_name))
@@ -0,0 +1,159 @@
+import json
+import tempfile
+import unittest
+from unittest import mock
+from unittest.mock import MagicMock
+import numpy as np
+from fastapi.testclient import TestClient
+from langchain_core.documents import Document
+import backend
+from app import config
+from app.managers.faiss_store import FaissVectorStore
+
+
+class FakeAudioStore():
+    """
+    Audio collection holding the metadata of every track, recording the IDs of each lookup.
+    """
+    def __init__(self, track_ids):
+        self.metadatas = {track_id: {"track_id": track_id, "energy": 0.5} for track_id in track_ids}
+        self.lookups = []
+
+    def get(self, ids=None, where=None, include=("documents", "metadatas")):
+        self.lookups.append(list(ids))
+        found = [track_id for track_id in ids if track_id in self.metadatas]
+        return {"ids": found, "metadatas": [self.metadatas[track_id] for track_id in found]}
+
+    def count(self):
+        return len(self.metadatas)
+
+
+class ApiTestCase(unittest.TestCase):
+    """
+    Serves the search endpoints from a FAISS text collection of 12 one-chunk tracks, where the query "tN" embeds
+    to the vector of track tN.
+    """
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        rng = np.random.default_rng(0)
+        vectors = rng.standard_normal((12, 16)).astype(np.float32)
+        vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+        self.vectors = {f"t{i}": vector.tolist() for i, vector in enumerate(vectors)}
+
+        self.text_store = FaissVectorStore("test_text_collection", None, self.directory.name)
+        documents = [Document(page_content=f"{track_id} lyrics", metadata={"track_id": track_id}) for track_id in self.vectors]
+        self.text_store.add_embeddings(documents, vectors, ids=[f"{track_id}:0" for track_id in self.vectors])
+        self.audio_store = FakeAudioStore(self.vectors)
+        self.embed_queries = MagicMock(side_effect=lambda queries: [self.vectors[query] for query in queries])
+
+        backend.search_result_cache.invalidate("api_user")
+        patches = [
+            mock.patch.object(backend, "get_request_context", return_value=MagicMock(user_id="api_user")),
+            mock.patch.object(backend, "get_text_collection", return_value=self.text_store),
+            mock.patch.object(backend, "get_audio_collection", return_value=self.audio_store),
+            mock.patch.object(backend, "embed_queries", self.embed_queries),
+        ]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+        self.client = TestClient(backend.app)
+
+    def tearDown(self):
+        backend.search_result_cache.invalidate("api_user")
+        self.directory.cleanup()
+
+    @staticmethod
+    def track_ids(results):
+        return [result["metadata"]["track_id"] for result in results]
+
+
+class TestSearchBatch(ApiTestCase):
+
+    def test_results_follow_request_order_and_per_query_k(self):
+        response = self.client.post("/search/batch", params={"k": 3}, json=[
+            {"query": "t4"}, {"query": "t1", "k": 5}, {"query": "t9", "k": 1},
+        ])
+        self.assertEqual(response.status_code, 200)
+        batches = response.json()["results"]
+        self.assertEqual([batch["query"] for batch in batches], ["t4", "t1", "t9"])
+        self.assertEqual([len(batch["results"]) for batch in batches], [3, 5, 1])
+        self.assertEqual([self.track_ids(batch["results"])[0] for batch in batches], ["t4", "t1", "t9"])
+        result = batches[0]["results"][0]
+        self.assertEqual(result["text"], "t4 lyrics")
+        self.assertEqual(result["audio"], {"track_id": "t4", "energy": 0.5})
+
+    def test_batch_is_embedded_and_joined_once(self):
+        response = self.client.post("/search/batch", json=[{"query": "t2"}, {"query": "t3"}, {"query": "t2"}])
+        batches = response.json()["results"]
+        self.assertEqual(batches[0], batches[2])
+        # The repeated query is searched once
+        self.embed_queries.assert_called_once_with(["t2", "t3"])
+        self.assertEqual(len(self.audio_store.lookups), 1)
+
+        # A batch of cached queries needs neither the model nor the audio collection
+        self.assertEqual(self.client.post("/search/batch", json=[{"query": "t3"}]).json()["results"][0], batches[1])
+        self.assertEqual(self.embed_queries.call_count, 1)
+        self.assertEqual(len(self.audio_store.lookups), 1)
+
+    def test_batch_results_match_single_searches(self):
+        batch = self.client.post("/search/batch", json=[{"query": "t5", "k": 4}]).json()["results"][0]["results"]
+        backend.search_result_cache.invalidate("api_user")
+        single = self.client.get("/search", params={"query": "t5", "k": 4}).json()["results"]
+        self.assertEqual(batch, single)
+
+    def test_oversized_batch_is_rejected(self):
+        queries = [{"query": "t0"}] * (config.SEARCH_BATCH_MAX_QUERIES + 1)
+        self.assertEqual(self.client.post("/search/batch", json=queries).status_code, 400)
+        self.embed_queries.assert_not_called()
+
+
+class TestSearchStream(ApiTestCase):
+
+    def stream(self, **params):
+        response = self.client.get("/search/stream", params=params)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers["content-type"], "application/x-ndjson")
+        return [json.loads(line) for line in response.text.splitlines()]
+
+    def test_results_then_done(self):
+        events = self.stream(query="t6", k=5)
+        self.assertEqual([event["type"] for event in events], ["result"] * 5 + ["done"])
+        self.assertEqual(events[-1], {"type": "done", "count": 5})
+        results = [event["result"] for event in events[:-1]]
+        self.assertEqual(self.track_ids(results)[0], "t6")
+        self.assertEqual(results[0]["audio"], {"track_id": "t6", "energy": 0.5})
+
+        backend.search_result_cache.invalidate("api_user")
+        self.assertEqual(self.client.get("/search", params={"query": "t6", "k": 5}).json()["results"], results)
+
+    def test_hits_are_joined_in_doubling_batches(self):
+        for k, sizes in ((1, [1]), (4, [1, 2, 1]), (7, [1, 2, 4]), (12, [1, 2, 4, 5])):
+            self.audio_store.lookups = []
+            backend.search_result_cache.invalidate("api_user")
+            self.assertEqual(self.stream(query="t0", k=k)[-1]["count"], k)
+            self.assertEqual([len(lookup) for lookup in self.audio_store.lookups], sizes)
+
+    def test_streamed_results_are_cached(self):
+        events = self.stream(query="t3", k=4)
+        self.audio_store.lookups = []
+        self.assertEqual(self.stream(query="t3", k=4), events)
+        self.assertEqual(self.audio_store.lookups, [])
+        self.embed_queries.assert_called_once()
+
+    def test_empty_scope_streams_only_done(self):
+        with mock.patch.object(backend, "get_feature_filter_ids", return_value=set()):
+            self.assertEqual(self.stream(query="t0", k=3, range="energy:0.9:"), [{"type": "done", "count": 0}])
+
+    def test_spotify_error_ends_the_stream_with_an_error_event(self):
+        def failing_results(*args, **kwargs):
+            yield {"metadata": {"track_id": "t0"}}
+            raise backend.SpotifyException(429, -1, "Rate limited")
+
+        with mock.patch.object(backend, "iter_user_search_results", failing_results):
+            events = self.stream(query="t0", k=3)
+        self.assertEqual([event["type"] for event in events], ["result", "error"])
+        self.assertEqual(events[-1]["status"], 429)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,55 @@
+import time
+import unittest
+from app.utils.cache import LRUCache, TTLCache, UserResultCache
+
+
+class TestLRUCache(unittest.TestCase):
+
+    def test_least_recently_used_item_is_dropped(self):
+        cache = LRUCache(max_entries=2)
+        cache.put("a", 1)
+        cache.put("b", 2)
+        self.assertEqual(cache.get("a"), 1)
+        cache.put("c", 3)
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("a"), 1)
+        self.assertEqual(cache.get("c"), 3)
+        self.assertEqual(cache.stats(), {"size": 2, "hits": 3, "misses": 1})
+
+
+class TestUserResultCache(unittest.TestCase):
+
+    def setUp(self):
+        self.cache = UserResultCache(max_entries=10)
+
+    def test_invalidate_only_affects_that_user(self):
+        self.cache.put("alice", "sad songs", ["a"])
+        self.cache.put("bob", "sad songs", ["b"])
+        self.cache.invalidate("alice")
+        self.assertIsNone(self.cache.get("alice", "sad songs"))
+        self.assertEqual(self.cache.get("bob", "sad songs"), ["b"])
+
+    def test_result_computed_during_ingest_is_not_served(self):
+        generation = self.cache.generation("alice")
+        self.cache.invalidate("alice")
+        self.cache.put("alice", "sad songs", ["stale"], generation=generation)
+        self.assertIsNone(self.cache.get("alice", "sad songs"))
+
+
+class TestTTLCache(unittest.TestCase):
+
+    def test_items_expire(self):
+        cache = TTLCache(ttl=0.01)
+        calls = []
+        factory = lambda: calls.append(1) or {"id": "alice"}
+        self.assertEqual(cache.get_or_create("token", factory), {"id": "alice"})
+        self.assertEqual(cache.get_or_create("token", factory), {"id": "alice"})
+        self.assertEqual(len(calls), 1)
+        time.sleep(0.02)
+        self.assertIsNone(cache.get("token"))
+        cache.get_or_create("token", factory)
+        self.assertEqual(len(calls), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
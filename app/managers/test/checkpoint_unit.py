@@ -0,0 +1,39 @@
+import os
+import tempfile
+import unittest
+from app.managers.checkpoint_manager import CheckpointManager
+
+
+class TestCheckpointManager(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.manager = CheckpointManager(self.directory.name)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_load_missing_checkpoint(self):
+        self.assertEqual(self.manager.load("test_user"), {})
+
+    def test_save_merges_fields(self):
+        self.manager.save("test_user", offset=50, total=120, completed=False)
+        self.manager.save("test_user", offset=100)
+        checkpoint = self.manager.load("test_user")
+        self.assertEqual(checkpoint["offset"], 100)
+        self.assertEqual(checkpoint["total"], 120)
+        self.assertFalse(checkpoint["completed"])
+
+    def test_save_leaves_no_temporary_file(self):
+        self.manager.save("test_user", offset=50)
+        self.assertEqual(os.listdir(self.directory.name), ["test_user.json"])
+
+    def test_clear(self):
+        self.manager.save("test_user", offset=50)
+        self.manager.clear("test_user")
+        self.manager.clear("test_user")
+        self.assertEqual(self.manager.load("test_user"), {})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,37 @@
+import unittest
+from app.utils.chunking import split_lyrics
+
+
+class TestSplitLyrics(unittest.TestCase):
+
+    def test_genius_heading_headers_and_embed_are_stripped(self):
+        lyrics = "Song Lyrics\n[Verse 1]\nFirst line\nSecond line\n\n[Chorus: Artist]\nChorus line 42Embed"
+        self.assertEqual(split_lyrics(lyrics, max_chars=20), ["First line", "Second line", "Chorus line"])
+        self.assertEqual(split_lyrics(lyrics), ["First line\nSecond line\nChorus line"])
+
+    def test_heading_run_together_with_a_section_header_is_stripped(self):
+        for heading in ("Song Lyrics[Verse 1]", "Song Lyrics [Intro: Artist]"):
+            self.assertEqual(split_lyrics(f"{heading}\nFirst line\nSecond line"), ["First line\nSecond line"])
+        # Only the first line can be the heading
+        self.assertEqual(split_lyrics("First line\nThese Lyrics"), ["First line\nThese Lyrics"])
+
+    def test_short_sections_are_merged_until_half_the_chunk_size(self):
+        sections = [f"[Verse {i}]\nline {i}a\nline {i}b" for i in range(6)]
+        chunks = split_lyrics("\n".join(sections), max_chars=40)
+        # Each section is 17 characters; a chunk ends at the first section boundary past 20 characters
+        self.assertEqual(chunks, [f"line {i}a\nline {i}b\nline {i + 1}a\nline {i + 1}b" for i in (0, 2, 4)])
+
+    def test_long_sections_are_split_on_line_breaks(self):
+        lines = [f"this is line number {i:02d}" for i in range(10)]
+        chunks = split_lyrics("\n".join(lines), max_chars=80)
+        self.assertTrue(all(len(chunk) <= 80 for chunk in chunks))
+        self.assertEqual("\n".join(chunks).splitlines(), lines)
+        self.assertEqual(len(split_lyrics("\n".join(lines), max_chars=30, max_chunks=4)), 4)
+
+    def test_empty_lyrics(self):
+        for lyrics in (None, "", "Song Lyrics", "Song Lyrics\n[Instrumental]\n5Embed"):
+            self.assertEqual(split_lyrics(lyrics), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
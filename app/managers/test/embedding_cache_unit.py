@@ -0,0 +1,42 @@
+import os
+import tempfile
+import unittest
+from unittest.mock import MagicMock
+from app.models.embedding_cache import CachedEmbeddings, EmbeddingCache, content_key
+
+
+class TestCachedEmbeddings(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.cache = EmbeddingCache(os.path.join(self.directory.name, "embeddings.sqlite3"), max_entries=2)
+        self.base = MagicMock()
+        self.base.embed_documents.side_effect = lambda texts: [[float(len(text)), 0.5] for text in texts]
+        self.embeddings = CachedEmbeddings(self.base, self.cache, model_name="test-model")
+
+    def tearDown(self):
+        self.cache.connection.close()
+        self.directory.cleanup()
+
+    def test_content_key_normalizes_whitespace(self):
+        self.assertEqual(content_key("m", "a  song\nby me "), content_key("m", "a song by me"))
+        self.assertNotEqual(content_key("m", "a song"), content_key("other", "a song"))
+
+    def test_embeddings_are_served_from_cache(self):
+        self.assertEqual(self.embeddings.embed_documents(["ab", "abc", "ab"]), [[2.0, 0.5], [3.0, 0.5], [2.0, 0.5]])
+        self.assertEqual(self.embeddings.embed_documents(["abc"]), [[3.0, 0.5]])
+        self.base.embed_documents.assert_called_once_with(["ab", "abc"])
+        self.assertEqual(self.embeddings.stats(), {"hits": 2, "misses": 2, "hit_rate": 0.5})
+
+    def test_least_recently_used_entries_are_evicted(self):
+        self.embeddings.embed_documents(["a"])
+        self.embeddings.embed_documents(["bb"])
+        self.embeddings.embed_documents(["a"])
+        self.embeddings.embed_documents(["ccc"])
+        cached = self.cache.get_many([content_key("test-model", text) for text in ["a", "bb", "ccc"]])
+        self.assertEqual(len(cached), 2)
+        self.assertNotIn(content_key("test-model", "bb"), cached)
+
+
+if __name__ == '__main__':
+    unittest.main()
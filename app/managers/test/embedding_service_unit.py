@@ -0,0 +1,61 @@
+import os
+import tempfile
+import unittest
+from app.models.embedding_service import EmbeddingService
+
+
+class FakeEmbeddings():
+    """
+    Embeds a text as its length; a worker asked to embed "crash" exits.
+    """
+    def embed_documents(self, texts):
+        if "crash" in texts:
+            os._exit(1)
+        return [[float(len(text))] for text in texts]
+
+    def embed_queries(self, texts):
+        return self.embed_documents(texts)
+
+
+def build_fake_embeddings(num_threads=None):
+    return FakeEmbeddings()
+
+
+def build_fake_embeddings_failing_once(num_threads=None):
+    # The first worker to create the marker file fails to load, every other one loads
+    try:
+        os.close(os.open(os.environ["EMBEDDING_SERVICE_TEST_MARKER"], os.O_CREAT | os.O_EXCL))
+    except FileExistsError:
+        return FakeEmbeddings()
+    raise RuntimeError("model not found")
+
+
+class TestEmbeddingService(unittest.TestCase):
+
+    def tearDown(self):
+        self.service.close()
+
+    def test_failed_worker_is_taken_out_of_the_pool(self):
+        with tempfile.TemporaryDirectory() as directory:
+            os.environ["EMBEDDING_SERVICE_TEST_MARKER"] = os.path.join(directory, "failed")
+            self.service = EmbeddingService(2, threads_per_worker=1, embedding_factory=build_fake_embeddings_failing_once)
+            self.assertTrue(self.service.wait_ready(timeout=60))
+        self.assertEqual(sum(worker.healthy for worker in self.service.workers), 1)
+        for _ in range(4):
+            self.assertEqual(self.service.submit("documents", ["ab", "abc"]).result(timeout=10), [[2.0], [3.0]])
+
+    def test_crashed_worker_fails_its_requests_right_away(self):
+        self.service = EmbeddingService(2, threads_per_worker=1, embedding_factory=build_fake_embeddings)
+        self.assertTrue(self.service.wait_ready(timeout=60))
+        with self.assertRaises(RuntimeError):
+            self.service.submit("documents", ["crash"]).result(timeout=10)
+        self.assertEqual(self.service.submit("queries", ["abcd"]).result(timeout=10), [[4.0]])
+
+        with self.assertRaises(RuntimeError):
+            self.service.submit("documents", ["crash"]).result(timeout=10)
+        with self.assertRaises(RuntimeError):
+            self.service.submit("documents", ["ab"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,58 @@
+import unittest
+from unittest.mock import MagicMock
+import numpy as np
+from app.models.embedding import BucketedEmbeddings
+
+
+def fake_base():
+    """
+    Embedding function whose tokenizer counts words and whose model embeds a text as [word count, text ID].
+    """
+    base = MagicMock()
+    base.encode_kwargs = {"batch_size": 32, "normalize_embeddings": False}
+    base.query_instruction = "query: "
+    base.client.max_seq_length = 512
+    base.client.tokenizer.side_effect = lambda texts, **kwargs: {"input_ids": [text.split() for text in texts]}
+    base.client.encode.side_effect = lambda texts, **kwargs: np.array(
+        [[len(text.split()), float(text.split()[-1])] for text in texts]
+    )
+    return base
+
+
+class TestBucketedEmbeddings(unittest.TestCase):
+
+    def setUp(self):
+        self.base = fake_base()
+        self.embeddings = BucketedEmbeddings(self.base, max_batch_tokens=40, max_batch_size=4)
+
+    def test_batches_stay_under_the_token_budget(self):
+        lengths = [3, 30, 5, 12, 3, 50, 8, 3, 12, 3]
+        batches = self.embeddings.make_batches(lengths)
+        self.assertEqual(sorted(index for batch in batches for index in batch), list(range(len(lengths))))
+        for batch in batches:
+            longest = max(lengths[index] for index in batch)
+            self.assertTrue(len(batch) <= 4)
+            self.assertTrue(longest * len(batch) <= 40 or len(batch) == 1)
+            # Batches group inputs of similar length, longest first
+            self.assertEqual(longest, lengths[batch[0]])
+        self.assertEqual([[lengths[index] for index in batch] for batch in batches], [[50], [30], [12, 12, 8], [5, 3, 3, 3], [3]])
+
+    def test_embeddings_keep_the_input_order(self):
+        lengths = [3, 30, 5, 12, 3, 50, 8, 3, 12, 3]
+        texts = [" ".join(["word"] * (length - 1) + [str(i)]) for i, length in enumerate(lengths)]
+        embeddings = self.embeddings.embed_documents(texts)
+        self.assertEqual(embeddings, [[float(length), float(i)] for i, length in enumerate(lengths)])
+        # Each batch is encoded at once with its own size, with the other encode options of the wrapped function
+        calls = self.base.client.encode.call_args_list
+        self.assertEqual(len(calls), len(self.embeddings.make_batches(lengths)))
+        for call in calls:
+            self.assertEqual(call.kwargs, {"batch_size": len(call.args[0]), "normalize_embeddings": False})
+
+    def test_queries_get_the_query_instruction(self):
+        self.assertEqual(self.embeddings.embed_queries(["sad 0", "a happy song 1"]), [[3.0, 0.0], [5.0, 1.0]])
+        texts = [text for call in self.base.client.encode.call_args_list for text in call.args[0]]
+        self.assertCountEqual(texts, ["query: sad 0", "query: a happy song 1"])
+
+
+if __name__ == '__main__':
+    unittest.main()
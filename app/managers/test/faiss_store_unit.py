@@ -0,0 +1,150 @@
+import tempfile
+import unittest
+import zlib
+import numpy as np
+from langchain_core.documents import Document
+from app.managers.faiss_store import FaissVectorStore
+
+
+class HashEmbeddings():
+    """
+    Deterministic stand-in for the embedding model: one random unit vector per distinct text.
+    """
+    def embed_documents(self, texts):
+        return [np.random.default_rng(zlib.crc32(text.encode())).standard_normal(16).tolist() for text in texts]
+
+
+class LowRankEmbeddings():
+    """
+    Like HashEmbeddings, but the vectors lie close to a 6-dimensional subspace, as real embeddings keep most of
+    their variance in a few dimensions. On isotropic vectors PCA to half the dimensions discards half of every
+    vector, so even the exact match can score below hundreds of other vectors and miss the reranked candidates.
+    """
+    directions = np.random.default_rng(0).standard_normal((6, 16))
+
+    def embed_documents(self, texts):
+        vectors = []
+        for text in texts:
+            rng = np.random.default_rng(zlib.crc32(text.encode()))
+            vectors.append((rng.standard_normal(6) @ self.directions + 0.01 * rng.standard_normal(16)).tolist())
+        return vectors
+
+
+def chunks(track_id, count):
+    return [Document(page_content=f"{track_id} chunk {i}", metadata={"track_id": track_id, "chunk": i})
+            for i in range(count)]
+
+
+class TestFaissVectorStore(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.embeddings = HashEmbeddings()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def open(self, index_type, **kwargs):
+        return FaissVectorStore("test_text_collection", self.embeddings, self.directory.name, index_type=index_type, **kwargs)
+
+    def fill(self, store, tracks=50):
+        documents = [document for t in range(tracks) for document in chunks(f"t{t}", 3)]
+        store.add_documents(documents, ids=[f"{d.metadata['track_id']}:{d.metadata['chunk']}" for d in documents])
+        return documents
+
+    def test_exact_match_is_nearest(self):
+        for index_type in ("flat", "ivf", "hnsw"):
+            store = self.open(index_type, nlist=2)
+            documents = self.fill(store)
+            query = self.embeddings.embed_documents([documents[7].page_content])[0]
+            document, distance = store.similarity_search_by_vector_with_relevance_scores(query, k=3)[0]
+            self.assertEqual(document.page_content, documents[7].page_content, index_type)
+            self.assertAlmostEqual(distance, 0.0, places=4)
+            self.directory.cleanup()
+            self.directory = tempfile.TemporaryDirectory()
+
+    def test_filter_and_delete(self):
+        for index_type in ("flat", "hnsw"):
+            store = self.open(index_type)
+            documents = self.fill(store)
+            query = self.embeddings.embed_documents([documents[0].page_content])[0]
+            hits = store.similarity_search_by_vector_with_relevance_scores(query, k=10, filter={"track_id": {"$in": ["t3", "t4"]}})
+            self.assertEqual({document.metadata["track_id"] for document, _ in hits}, {"t3", "t4"})
+
+            store.delete(where={"track_id": {"$in": ["t0"]}})
+            hits = store.similarity_search_by_vector_with_relevance_scores(query, k=5)
+            self.assertNotIn("t0", {document.metadata["track_id"] for document, _ in hits})
+            self.assertEqual(store.get(where={"track_id": "t0"})["ids"], [])
+            self.directory.cleanup()
+            self.directory = tempfile.TemporaryDirectory()
+
+    def test_get_many_ids_and_unsupported_filters(self):
+        store = self.open("flat")
+        self.fill(store)
+        # More IDs than SQLite accepts parameters in a single statement
+        ids = [f"t{t}:{c}" for t in range(50) for c in range(3)] + [f"missing:{i}" for i in range(40000)]
+        self.assertEqual(len(store.get(ids=ids)["ids"]), 150)
+        self.assertEqual(sorted(store.get(ids=ids, where={"track_id": {"$in": ["t1"]}})["ids"]), ["t1:0", "t1:1", "t1:2"])
+        with self.assertRaises(ValueError):
+            store.get(where={"chunk": 0})
+
+    def test_batch_search_matches_single_searches(self):
+        for index_type in ("flat", "hnsw"):
+            store = self.open(index_type)
+            documents = self.fill(store)
+            queries = self.embeddings.embed_documents([documents[i].page_content for i in (0, 40, 99)])
+            batched = store.similarity_search_by_vectors_with_relevance_scores(queries, k=5)
+            for query, hits in zip(queries, batched):
+                single = store.similarity_search_by_vector_with_relevance_scores(query, k=5)
+                self.assertEqual([document.page_content for document, _ in hits],
+                                 [document.page_content for document, _ in single], index_type)
+            self.directory.cleanup()
+            self.directory = tempfile.TemporaryDirectory()
+
+    def test_reopen_catches_up_with_unsaved_changes(self):
+        store = self.open("flat")
+        documents = self.fill(store, tracks=10)
+        store.persist()
+        store.add_documents(chunks("late", 1), ids=["late:0"])
+        store.delete(ids=["t1:0"])
+
+        reopened = self.open("flat")
+        self.assertEqual(reopened.index.ntotal, 30)
+        query = self.embeddings.embed_documents(["late chunk 0"])[0]
+        self.assertEqual(reopened.similarity_search_by_vector_with_relevance_scores(query, k=1)[0][0].metadata["track_id"], "late")
+        self.assertEqual(sorted(reopened.get(ids=["t1:0", "t1:1"])["ids"]), ["t1:1"])
+
+    def test_compressed_index_reranks_with_stored_vectors(self):
+        self.embeddings = LowRankEmbeddings()
+        for index_type, compression in (("flat", "sq8"), ("hnsw", "sq8"), ("flat", "pq")):
+            options = dict(compression=compression, pca_dimension=8, pq_m=8)
+            store = self.open(index_type, **options)
+            tracks = 3400 if compression == "pq" else 400
+            documents = self.fill(store, tracks=tracks)
+            self.assertTrue(store.compressed, (index_type, compression))
+            store.persist()
+
+            reopened = self.open(index_type, **options)
+            self.assertTrue(reopened.compressed)
+            self.assertEqual(reopened.vector_dtype, np.float16)
+            expected = documents[::97]
+            queries = self.embeddings.embed_documents([document.page_content for document in expected])
+            for document, hits in zip(expected, reopened.similarity_search_by_vectors_with_relevance_scores(queries, k=3)):
+                self.assertEqual(hits[0][0].page_content, document.page_content, (index_type, compression))
+                self.assertAlmostEqual(hits[0][1], 0.0, places=2)
+            self.directory.cleanup()
+            self.directory = tempfile.TemporaryDirectory()
+
+    def test_enabling_compression_rebuilds_saved_index(self):
+        store = self.open("flat")
+        self.fill(store, tracks=400)
+        store.persist()
+        self.assertFalse(store.compressed)
+
+        reopened = self.open("flat", compression="sq8")
+        self.assertTrue(reopened.compressed)
+        self.assertEqual(reopened.index.ntotal, 1200)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,73 @@
+import tempfile
+import unittest
+from app.managers.feature_matrix import FeatureMatrixStore, mood_profile
+
+
+def features(energy, acousticness, valence=0.5, tempo=120.0):
+    return {
+        "danceability": 0.5, "energy": energy, "valence": valence, "acousticness": acousticness,
+        "instrumentalness": 0.0, "speechiness": 0.05, "liveness": 0.1, "tempo": tempo, "loudness": -8.0,
+    }
+
+
+class TestFeatureMatrix(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.store = FeatureMatrixStore(self.directory.name)
+        self.store.build("test_user", [
+            ("calm", features(energy=0.1, acousticness=0.95, tempo=70.0)),
+            ("loud", features(energy=0.95, acousticness=0.05, tempo=175.0)),
+            ("middle", features(energy=0.5, acousticness=0.5)),
+            ("no_features", {"name": "Local file"}),
+        ])
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_tracks_without_features_are_skipped(self):
+        matrix = self.store.load("test_user")
+        self.assertEqual(matrix.track_ids, ["calm", "loud", "middle"])
+        self.assertEqual(matrix.matrix.shape, (3, 9))
+
+    def test_nearest_to_mood(self):
+        matrix = self.store.load("test_user")
+        calm = matrix.nearest(mood_profile(["calm", "acoustic"]), k=2)
+        self.assertEqual([track_id for track_id, _ in calm], ["calm", "middle"])
+        energetic = matrix.nearest(mood_profile(["high-energy"]), k=1)
+        self.assertEqual(energetic[0][0], "loud")
+
+    def test_similar_excludes_seed(self):
+        matrix = self.store.load("test_user")
+        self.assertEqual([track_id for track_id, _ in matrix.similar("loud", k=5)], ["middle", "calm"])
+        with self.assertRaises(KeyError):
+            matrix.similar("no_features", k=5)
+
+    def test_unknown_mood_is_rejected(self):
+        with self.assertRaises(ValueError):
+            mood_profile(["grumpy"])
+
+    def test_rebuild_replaces_loaded_matrix(self):
+        self.store.load("test_user")
+        self.store.build("test_user", [("loud", features(energy=0.95, acousticness=0.05))])
+        self.assertEqual(self.store.load("test_user").track_ids, ["loud"])
+
+    def test_update_changes_only_the_given_rows(self):
+        self.store.load("test_user")
+        count = self.store.update("test_user", [
+            ("middle", features(energy=0.9, acousticness=0.1)),
+            ("new", features(energy=0.2, acousticness=0.9)),
+            ("calm", {"name": "Features removed"}),
+        ], removed_ids=["loud", "unknown"])
+        matrix = self.store.load("test_user")
+        self.assertEqual(count, 2)
+        self.assertEqual(matrix.track_ids, ["middle", "new"])
+        self.assertAlmostEqual(float(matrix.matrix[matrix.rows["middle"], 1]), 0.9, places=6)
+
+    def test_update_without_a_matrix_is_skipped(self):
+        self.assertIsNone(self.store.update("other_user", [("calm", features(energy=0.1, acousticness=0.95))]))
+        self.assertIsNone(self.store.load("other_user"))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,59 @@
+import os
+import tempfile
+import unittest
+from unittest.mock import MagicMock
+from app.managers.genius_manager import GeniusManager, LyricsCache, normalize_key
+
+
+class TestGeniusManager(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.cache = LyricsCache(os.path.join(self.directory.name, "lyrics.sqlite3"))
+        self.genius = MagicMock()
+        self.manager = GeniusManager(self.genius, self.cache, max_workers=4)
+
+    def tearDown(self):
+        self.cache.connection.close()
+        self.directory.cleanup()
+
+    def test_normalize_key(self):
+        self.assertEqual(normalize_key("Beyoncé", "Halo [feat. X]"), "beyonce|halo")
+        self.assertEqual(normalize_key("Beyoncé", "Halo (Live) (ft. X)"), "beyonce|halo live")
+        self.assertEqual(normalize_key("The Beatles", "Let It Be - Remastered 2009"), "the beatles|let it be")
+        self.assertEqual(normalize_key("Queen", "Bohemian Rhapsody (2011 Remaster)"), "queen|bohemian rhapsody")
+        self.assertEqual(normalize_key("Artist", "Song - feat. Jay-Z"), "artist|song")
+        self.assertEqual(normalize_key("Artist", "Song - Part 2 - Remastered"), "artist|song part 2")
+
+    def test_normalize_key_keeps_distinct_songs_apart(self):
+        titles = ["Song - Part 1", "Song - Part 2", "Song (Live)", "Song", "Song (Acoustic)", "Song [Interlude]"]
+        keys = [normalize_key("Artist", title) for title in titles]
+        self.assertEqual(len(set(keys)), len(titles))
+
+    def test_get_lyrics_is_cached(self):
+        self.genius.search_song.return_value = MagicMock(lyrics="Some lyrics")
+        self.assertEqual(self.manager.get_lyrics("Artist", "Song"), "Some lyrics")
+        self.assertEqual(self.manager.get_lyrics("artist", "Song (Remastered)"), "Some lyrics")
+        self.genius.search_song.assert_called_once_with("Song", "Artist")
+
+    def test_not_found_is_cached(self):
+        self.genius.search_song.return_value = None
+        self.assertIsNone(self.manager.get_lyrics("Artist", "Song"))
+        self.assertIsNone(self.manager.get_lyrics("Artist", "Song"))
+        self.genius.search_song.assert_called_once()
+
+    def test_errors_are_not_cached(self):
+        self.genius.search_song.side_effect = TimeoutError()
+        self.assertIsNone(self.manager.get_lyrics("Artist", "Song"))
+        self.assertIsNone(self.manager.get_lyrics("Artist", "Song"))
+        self.assertEqual(self.genius.search_song.call_count, 2)
+
+    def test_get_lyrics_many_keeps_order_and_deduplicates(self):
+        self.genius.search_song.side_effect = lambda title, artist: MagicMock(lyrics=f"{title} lyrics")
+        songs = [("A", "One"), ("B", "Two"), ("A", "One")]
+        self.assertEqual(self.manager.get_lyrics_many(songs), ["One lyrics", "Two lyrics", "One lyrics"])
+        self.assertEqual(self.genius.search_song.call_count, 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,335 @@
+import os
+from contextlib import nullcontext
+import tempfile
+import unittest
+from unittest import mock
+from unittest.mock import MagicMock
+from spotipy.exceptions import SpotifyException
+import backend
+from app.managers.checkpoint_manager import CheckpointManager
+from app.managers.feature_matrix import FEATURES, FeatureMatrixStore
+from app.managers.chroma_manager import VectorStore
+from app.managers.membership_manager import MembershipIndex
+
+
+class InMemoryStore(VectorStore):
+    """
+    Vector store keeping documents in a dictionary, without embeddings.
+    """
+    def __init__(self):
+        self.documents = {}
+
+    def add_documents(self, documents, ids=None):
+        self.documents.update(zip(ids, documents))
+        return ids
+
+    def delete(self, ids=None, where=None):
+        for doc_id in ids or []:
+            self.documents.pop(doc_id, None)
+        if where is not None:
+            track_ids = set(where["track_id"]["$in"])
+            for doc_id, document in list(self.documents.items()):
+                if document.metadata["track_id"] in track_ids:
+                    del self.documents[doc_id]
+
+    def get(self, ids=None, where=None, include=("documents", "metadatas")):
+        found = [doc_id for doc_id in (ids if ids is not None else self.documents) if doc_id in self.documents]
+        return {"ids": found, "metadatas": [self.documents[doc_id].metadata for doc_id in found]}
+
+    def similarity_search_by_vector_with_relevance_scores(self, embedding, k=4, filter=None):
+        return []
+
+    def count(self):
+        return len(self.documents)
+
+
+def saved_track(number):
+    return {
+        "added_at": f"2024-01-01T{number // 60:02d}:{number % 60:02d}:00Z",
+        "track": {
+            "id": f"t{number}",
+            "name": f"Song {number}",
+            "artists": [{"name": "Artist"}],
+            "album": {"name": "Album"},
+            "external_urls": {"spotify": f"https://open.spotify.com/track/t{number}"},
+        },
+    }
+
+
+class FakeSpotify():
+    """
+    Spotify client serving a library of saved tracks newest first, at most `page_size` per page like the real API's
+    cap. Requesting the page at `fail_at` raises a rate-limit error.
+    """
+    def __init__(self, count, page_size=3):
+        self.library = [saved_track(number) for number in reversed(range(count))]
+        self.next_number = count
+        self.page_size = page_size
+        self.fail_at = None
+        self.offsets = []
+
+    def like(self):
+        self.library.insert(0, saved_track(self.next_number))
+        self.next_number += 1
+        return self.library[0]["track"]["id"]
+
+    def unlike(self, track_id):
+        self.library = [item for item in self.library if item["track"]["id"] != track_id]
+
+    def current_user_saved_tracks(self, limit=20, offset=0):
+        self.offsets.append(offset)
+        if offset == self.fail_at:
+            raise SpotifyException(429, -1, "Rate limited")
+        items = self.library[offset:offset + min(limit, self.page_size)]
+        has_next = offset + len(items) < len(self.library)
+        return {"items": items, "total": len(self.library), "next": "next" if has_next else None}
+
+    def audio_features(self, track_ids):
+        return [dict.fromkeys(FEATURES, 0.5) for _ in track_ids]
+
+
+class FakeGenius():
+
+    def __init__(self):
+        self.titles = []
+
+    def get_lyrics_many(self, songs):
+        self.titles += [title for _, title in songs]
+        return [f"[Verse 1]\n{title} lyrics" for _, title in songs]
+
+
+class IngestTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.sp = FakeSpotify(7)
+        self.genius = FakeGenius()
+        self.text_store = InMemoryStore()
+        self.audio_store = InMemoryStore()
+        self.checkpoints = CheckpointManager(self.directory.name)
+        self.feature_matrices = FeatureMatrixStore(os.path.join(self.directory.name, "features"))
+        patches = [
+            mock.patch.object(backend, "get_checkpoint_manager", return_value=self.checkpoints),
+            mock.patch.object(backend, "get_feature_matrix_store", return_value=self.feature_matrices),
+            mock.patch.object(backend, "get_genius_manager", return_value=self.genius),
+            mock.patch.object(backend, "get_sparse_index", return_value=MagicMock()),
+        ]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def ingest_full(self, **kwargs):
+        self.sp.offsets = []
+        return backend.ingest_full(self.sp, "user", self.text_store, self.audio_store, **kwargs)
+
+    def stored_track_ids(self):
+        return sorted(self.audio_store.documents)
+
+
+class TestTrackDocuments(IngestTestCase):
+
+    def test_every_lyric_chunk_is_a_document(self):
+        self.genius.get_lyrics_many = lambda songs: ["Song Lyrics[Verse 1]\nfirst verse\n\n[Chorus]\nchorus", ""]
+        with mock.patch.object(backend.config, "LYRIC_CHUNK_MAX_CHARS", 12):
+            text_documents, text_ids, audio_documents, ids = backend.build_track_documents(self.sp, self.sp.library[:2])
+        self.assertEqual(ids, ["t6", "t5"])
+        self.assertEqual(text_ids, ["t6:0", "t6:1", "t5:0"])
+        self.assertEqual([document.metadata["chunk"] for document in text_documents], [0, 1, 0])
+        self.assertEqual([document.metadata["track_id"] for document in text_documents], ["t6", "t6", "t5"])
+        self.assertTrue(text_documents[0].page_content.endswith("\nLyrics: first verse"))
+        self.assertTrue(text_documents[1].page_content.endswith("\nLyrics: chorus"))
+        # A track without lyrics is still found by its title, artist and album
+        self.assertEqual(text_documents[2].page_content, "Song 5 by ['Artist'] from Album")
+        self.assertEqual(audio_documents[0].metadata["lyrics"], "Song Lyrics[Verse 1]\nfirst verse\n\n[Chorus]\nchorus")
+
+    def test_reingested_tracks_drop_their_old_chunks(self):
+        self.genius.get_lyrics_many = lambda songs: ["a\n\nb\n\nc" for _ in songs]
+        with mock.patch.object(backend.config, "LYRIC_CHUNK_MAX_CHARS", 2):
+            backend.commit_page(self.sp, "user", self.sp.library[:1], self.text_store, self.audio_store)
+        self.assertEqual(sorted(self.text_store.documents), ["t6:0", "t6:1", "t6:2"])
+        self.genius.get_lyrics_many = lambda songs: ["a" for _ in songs]
+        backend.commit_page(self.sp, "user", self.sp.library[:1], self.text_store, self.audio_store)
+        self.assertEqual(sorted(self.text_store.documents), ["t6:0"])
+
+
+class TestFullIngest(IngestTestCase):
+
+    def test_every_page_is_stored(self):
+        result = self.ingest_full()
+        self.assertEqual(self.sp.offsets, [0, 3, 6])
+        self.assertEqual((result["embedded"], result["offset"], result["total"], result["completed"]), (7, 7, 7, True))
+        self.assertEqual(self.stored_track_ids(), sorted(f"t{number}" for number in range(7)))
+        self.assertEqual(sorted(self.text_store.documents), sorted(f"t{number}:0" for number in range(7)))
+
+    def test_interrupted_ingest_resumes_from_its_checkpoint(self):
+        self.sp.fail_at = 6
+        with self.assertRaises(SpotifyException):
+            self.ingest_full()
+        # The pages committed before the failure are stored and the cursor points past them
+        self.assertEqual(len(self.stored_track_ids()), 6)
+        checkpoint = self.checkpoints.load("user")
+        self.assertEqual((checkpoint["offset"], checkpoint["total"], checkpoint["completed"]), (6, 7, False))
+
+        self.sp.fail_at = None
+        self.genius.titles = []
+        result = self.ingest_full()
+        self.assertEqual(self.sp.offsets, [6])
+        self.assertEqual(self.genius.titles, ["Song 0"])
+        self.assertEqual((result["embedded"], result["completed"]), (1, True))
+        self.assertEqual(len(self.stored_track_ids()), 7)
+
+        # A finished ingest, or a restart, starts over from the first page
+        self.ingest_full()
+        self.assertEqual(self.sp.offsets, [0, 3, 6])
+
+    def test_limit_stops_mid_page_and_resumes_there(self):
+        result = self.ingest_full(limit=4)
+        self.assertEqual((result["embedded"], result["offset"], result["completed"]), (4, 4, False))
+        self.assertEqual(self.stored_track_ids(), ["t3", "t4", "t5", "t6"])
+
+        self.ingest_full(limit=4)
+        self.assertEqual(self.sp.offsets, [4])
+        self.assertEqual(len(self.stored_track_ids()), 7)
+
+        self.ingest_full(restart=True, limit=2)
+        self.assertEqual(self.sp.offsets, [0])
+
+
+class TestDeltaIngest(IngestTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.ingest_full()
+        self.genius.titles = []
+
+    def ingest_delta(self):
+        self.sp.offsets = []
+        return backend.ingest_delta(self.sp, "user", self.text_store, self.audio_store)
+
+    def test_full_ingest_saves_the_newest_like_as_watermark(self):
+        self.assertEqual(self.checkpoints.load("user")["last_added_at"], saved_track(6)["added_at"])
+
+    def test_unchanged_library_stops_after_the_first_page(self):
+        result = self.ingest_delta()
+        self.assertEqual(self.sp.offsets, [0])
+        self.assertEqual((result["embedded"], result["removed"]), (0, 0))
+        self.assertEqual(self.genius.titles, [])
+
+    def test_new_likes_are_embedded_and_move_the_watermark(self):
+        new_ids = [self.sp.like(), self.sp.like()]
+        result = self.ingest_delta()
+        # The first page reaches the watermark and 7 stored plus 2 new tracks make up the library
+        self.assertEqual(self.sp.offsets, [0])
+        self.assertEqual((result["embedded"], result["removed"], result["total"]), (2, 0, 9))
+        self.assertEqual(self.genius.titles, ["Song 8", "Song 7"])
+        self.assertTrue(set(new_ids) <= set(self.stored_track_ids()))
+        self.assertEqual(self.checkpoints.load("user")["last_added_at"], saved_track(8)["added_at"])
+
+    def test_unliked_tracks_are_removed(self):
+        self.sp.unlike("t1")
+        new_id = self.sp.like()
+        result = self.ingest_delta()
+        # One like and one un-like keep the library's size, so the counts do not add up and the whole library is listed
+        self.assertEqual(self.sp.offsets, [0, 3, 6])
+        self.assertEqual((result["embedded"], result["removed"]), (1, 1))
+        self.assertEqual(self.genius.titles, ["Song 7"])
+        self.assertNotIn("t1", self.stored_track_ids())
+        self.assertIn(new_id, self.stored_track_ids())
+        self.assertNotIn("t1:0", self.text_store.documents)
+
+        self.assertEqual(self.ingest_delta()["removed"], 0)
+        self.assertEqual(self.sp.offsets, [0])
+
+    def test_empty_library_is_synced(self):
+        for item in list(self.sp.library):
+            self.sp.unlike(item["track"]["id"])
+        result = self.ingest_delta()
+        self.assertEqual((result["embedded"], result["removed"]), (0, 7))
+        self.assertEqual(self.stored_track_ids(), [])
+
+
+class TestFeatureMatrixUpdates(IngestTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.reads = []
+        get = self.audio_store.get
+
+        def recording_get(ids=None, where=None, include=("documents", "metadatas")):
+            self.reads.append((len(ids) if ids is not None else None, tuple(include)))
+            return get(ids=ids, where=where, include=include)
+
+        self.audio_store.get = recording_get
+
+    def matrix_track_ids(self):
+        return sorted(self.feature_matrices.load("user").track_ids)
+
+    def test_first_ingest_builds_the_matrix_in_batches(self):
+        with mock.patch.object(backend, "FEATURE_MATRIX_BATCH_SIZE", 3), \
+                mock.patch.object(backend, "get_embedding_function", return_value=None), \
+                mock.patch.object(backend, "pinned_vector_store", side_effect=[nullcontext(self.text_store), nullcontext(self.audio_store)]):
+            backend.run_ingest(self.sp, "user")
+        self.assertEqual(self.matrix_track_ids(), self.stored_track_ids())
+        # Every read of audio metadata asks for a batch of IDs, never the whole collection
+        self.assertEqual([size for size, include in self.reads if "metadatas" in include], [3, 3, 1])
+
+    def test_ingests_update_only_the_changed_rows(self):
+        self.ingest_full()
+        backend.build_feature_matrix("user", self.audio_store)
+        self.reads = []
+
+        self.sp.unlike("t1")
+        new_id = self.sp.like()
+        backend.ingest_delta(self.sp, "user", self.text_store, self.audio_store)
+        self.assertEqual(self.matrix_track_ids(), self.stored_track_ids())
+        self.assertIn(new_id, self.matrix_track_ids())
+        self.assertNotIn("t1", self.matrix_track_ids())
+        self.assertNotIn((None, ("metadatas",)), self.reads)
+
+
+class TestCatalogIngest(IngestTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.membership_index = MembershipIndex(os.path.join(self.directory.name, "membership.sqlite3"))
+        for patch in (mock.patch.object(backend, "CATALOG_MODE", True),
+                      mock.patch.object(backend, "get_membership_index", return_value=self.membership_index)):
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    def tearDown(self):
+        self.membership_index.connection.close()
+        super().tearDown()
+
+    def test_only_tracks_missing_from_the_catalog_are_embedded(self):
+        backend.ingest_full(self.sp, "first_user", self.text_store, self.audio_store)
+        self.genius.titles = []
+
+        # The second user's library holds the first user's 7 tracks and 2 more
+        result = backend.ingest_full(FakeSpotify(9), "second_user", self.text_store, self.audio_store)
+        self.assertEqual(result["embedded"], 9)
+        self.assertEqual(self.genius.titles, ["Song 8", "Song 7"])
+        self.assertEqual(len(self.stored_track_ids()), 9)
+        self.assertEqual(len(self.membership_index.get_track_ids("first_user")), 7)
+        self.assertEqual(len(self.membership_index.get_track_ids("second_user")), 9)
+        self.assertEqual(self.membership_index.get_track_ids("second_user"), set(self.stored_track_ids()))
+
+    def test_unliked_tracks_only_leave_the_membership(self):
+        backend.ingest_full(self.sp, "first_user", self.text_store, self.audio_store)
+        backend.ingest_full(FakeSpotify(7), "second_user", self.text_store, self.audio_store)
+
+        self.sp.unlike("t1")
+        result = backend.ingest_delta(self.sp, "first_user", self.text_store, self.audio_store)
+        self.assertEqual(result["removed"], 1)
+        self.assertNotIn("t1", self.membership_index.get_track_ids("first_user"))
+        # The other user still has the track, whose documents stay in the catalog
+        self.assertIn("t1", self.membership_index.get_track_ids("second_user"))
+        self.assertIn("t1", self.stored_track_ids())
+        self.assertIn("t1:0", self.text_store.documents)
+
+
+if __name__ == '__main__':
+    unittest.main()
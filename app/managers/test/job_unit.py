@@ -0,0 +1,70 @@
+import threading
+import time
+import unittest
+from app.managers.job_manager import JobManager
+
+
+class TestJobManager(unittest.TestCase):
+
+    def setUp(self):
+        self.manager = JobManager(max_workers=2, max_finished_jobs=1)
+
+    def tearDown(self):
+        self.manager.executor.shutdown(wait=True)
+
+    def test_completed_job_reports_progress(self):
+        def target(job, total):
+            job.update(total, total, total, total - 1)
+            return {"embedded": total - 1}
+
+        job = self.manager.submit("test_user", "full", target, 10)
+        self.manager.executor.shutdown(wait=True)
+        status = self.manager.get(job.id).to_dict()
+        self.assertEqual(status["status"], "completed")
+        self.assertEqual(status["processed"], 10)
+        self.assertEqual(status["embedded"], 9)
+        self.assertEqual(status["result"], {"embedded": 9})
+        self.assertIsNone(status["eta"])
+
+    def test_failed_job_records_error(self):
+        def target(job):
+            raise RuntimeError("Rate limit exceeded")
+
+        job = self.manager.submit("test_user", "delta", target)
+        self.manager.executor.shutdown(wait=True)
+        status = job.to_dict()
+        self.assertEqual(status["status"], "failed")
+        self.assertEqual(status["errors"], ["Rate limit exceeded"])
+
+    def test_wait_returns_once_the_job_finished(self):
+        error = RuntimeError("Rate limit exceeded")
+
+        def target(job):
+            time.sleep(0.05)
+            raise error
+
+        job = self.manager.submit("test_user", "full", target)
+        self.assertTrue(job.wait(timeout=5))
+        self.assertFalse(job.active)
+        self.assertIs(job.exception, error)
+
+    def test_active_job_is_reused_per_user(self):
+        release = threading.Event()
+        first = self.manager.submit("test_user", "full", lambda job: release.wait())
+        second = self.manager.submit("test_user", "full", lambda job: None)
+        other = self.manager.submit("other_user", "full", lambda job: None)
+        release.set()
+        self.assertIs(first, second)
+        self.assertIsNot(first, other)
+
+    def test_finished_jobs_are_evicted(self):
+        first = self.manager.submit("first_user", "full", lambda job: None)
+        second = self.manager.submit("second_user", "full", lambda job: None)
+        while first.active or second.active:
+            time.sleep(0.01)
+        self.manager.submit("third_user", "full", lambda job: None)
+        self.assertIsNone(self.manager.get(first.id))
+        self.assertIs(self.manager.get(second.id), second)
+
+if __name__ == '__main__':
+    unittest.main()
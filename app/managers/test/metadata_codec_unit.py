@@ -0,0 +1,49 @@
+import json
+import unittest
+from app.utils.metadata_codec import decode_list, decode_metadata, encode_list, encode_metadata
+
+
+class TestMetadataCodec(unittest.TestCase):
+
+    def setUp(self):
+        self.metadata = {
+            "id": "t1",
+            "name": "1999",
+            "album": "[Untitled]",
+            "artists": ["Prince", "The Revolution"],
+            "url": "https://open.spotify.com/track/t1",
+            "lyrics": "",
+            "energy": 0.8,
+            "key": 5,
+        }
+
+    def test_round_trip_is_lossless(self):
+        encoded = encode_metadata(self.metadata)
+        self.assertIsInstance(encoded["artists"], str)
+        self.assertEqual(decode_metadata(encoded), self.metadata)
+
+    def test_only_list_fields_are_decoded(self):
+        decoded = decode_metadata(encode_metadata(self.metadata))
+        self.assertEqual(decoded["name"], "1999")
+        self.assertEqual(decoded["album"], "[Untitled]")
+
+    def test_scalar_fields_are_coerced_to_the_schema(self):
+        encoded = encode_metadata(dict(self.metadata, tempo=120, key=5.0, name=1999, danceability="0.5", extra=7))
+        self.assertEqual([type(encoded[field]) for field in ("tempo", "key", "name", "danceability", "extra")],
+                         [float, int, str, float, int])
+        self.assertEqual(decode_metadata(encoded)["tempo"], 120.0)
+        with self.assertRaises(ValueError):
+            encode_metadata(dict(self.metadata, energy="loud"))
+
+    def test_list_edge_cases(self):
+        for values in ([], [""], ["a"], ["", "b"], ["a\x1fb"], [1, 2]):
+            self.assertEqual(decode_list(encode_list(values)), values)
+
+    def test_legacy_json_lists_are_decoded(self):
+        legacy = dict(self.metadata, artists=json.dumps(["Prince", "The Revolution"]))
+        self.assertEqual(decode_metadata(legacy), self.metadata)
+        self.assertEqual(decode_list("Prince"), ["Prince"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,34 @@
+import unittest
+import numpy as np
+from app.utils.ranking import maximal_marginal_relevance
+
+
+class TestMaximalMarginalRelevance(unittest.TestCase):
+
+    def setUp(self):
+        # Candidates 0 and 1 are near duplicates, 2 is different but slightly less relevant
+        self.relevance = [0.9, 0.89, 0.8, 0.1]
+        self.similarity = np.array([
+            [1.0, 0.95, 0.1, 0.0],
+            [0.95, 1.0, 0.1, 0.0],
+            [0.1, 0.1, 1.0, 0.0],
+            [0.0, 0.0, 0.0, 1.0],
+        ])
+
+    def test_relevance_only_keeps_the_ranking(self):
+        self.assertEqual(maximal_marginal_relevance(self.relevance, self.similarity, 3, lambda_mult=1.0), [0, 1, 2])
+
+    def test_near_duplicates_are_skipped(self):
+        self.assertEqual(maximal_marginal_relevance(self.relevance, self.similarity, 2, lambda_mult=0.5), [0, 2])
+
+    def test_selects_each_candidate_once(self):
+        rng = np.random.default_rng(0)
+        embeddings = rng.standard_normal((500, 32))
+        embeddings /= np.linalg.norm(embeddings, axis=1, keepdims=True)
+        selected = maximal_marginal_relevance(rng.random(500), embeddings @ embeddings.T, 500, lambda_mult=0.3)
+        self.assertEqual(sorted(selected), list(range(500)))
+        self.assertEqual(maximal_marginal_relevance([], np.empty((0, 0)), 5), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
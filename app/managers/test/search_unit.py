@@ -0,0 +1,285 @@
+import tempfile
+import unittest
+from unittest import mock
+from unittest.mock import MagicMock
+import numpy as np
+from fastapi.testclient import TestClient
+from langchain_core.documents import Document
+import backend
+from app import config
+from app.managers.faiss_store import FaissVectorStore
+
+
+class ChunkStoreTestCase(unittest.TestCase):
+
+    def setUp(self):
+        # 300 tracks of 6 lyric chunks each, the chunks of a track lying close together, so the nearest chunks of
+        # a query come in groups of a track's chunks
+        self.directory = tempfile.TemporaryDirectory()
+        rng = np.random.default_rng(0)
+        tracks = rng.standard_normal((300, 16))
+        self.store = FaissVectorStore("test_text_collection", None, self.directory.name)
+        documents = [
+            Document(page_content=f"t{t} chunk {c}", metadata={"track_id": f"t{t}", "chunk": c})
+            for t in range(300) for c in range(6)
+        ]
+        vectors = np.repeat(tracks, 6, axis=0) + 0.01 * rng.standard_normal((1800, 16))
+        vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+        self.store.add_embeddings(documents, vectors, ids=[f"{d.metadata['track_id']}:{d.metadata['chunk']}" for d in documents])
+        self.query = rng.standard_normal(16).tolist()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+
+class TestSearchTracks(ChunkStoreTestCase):
+
+    def test_multi_chunk_tracks_fill_k_results(self):
+        with mock.patch.object(backend, "embed_query", return_value=self.query):
+            for k in (5, 50, 100, 200):
+                results = backend.search_tracks(self.store, "query", k)
+                self.assertEqual(len(results), k)
+                self.assertEqual(len({document.metadata["track_id"] for document, _ in results}), k)
+            # A library smaller than k returns every track
+            self.assertEqual(len(backend.search_tracks(self.store, "query", 400)), 300)
+
+    def test_batch_search_fills_k_results(self):
+        with mock.patch.object(backend, "embed_queries", return_value=[self.query, self.query]):
+            with mock.patch.object(backend, "embed_query", return_value=self.query):
+                batched = backend.search_tracks_batch(self.store, [("query", 100), ("other query", 5)])
+                self.assertEqual([len(results) for results in batched], [100, 5])
+                single = backend.search_tracks(self.store, "query", 100)
+                self.assertEqual([(d.metadata["track_id"], score) for d, score in batched[0]],
+                                 [(d.metadata["track_id"], score) for d, score in single])
+
+
+class GroupedChunkStore():
+    """
+    Text store whose nearest chunks to any query are all the chunks of t0, then all of t1, and so on.
+    """
+    def __init__(self, tracks, chunks_per_track):
+        self.hits = [
+            (Document(page_content=f"t{i // chunks_per_track}:{i % chunks_per_track}",
+                      metadata={"track_id": f"t{i // chunks_per_track}", "chunk": i % chunks_per_track}), i / 1000)
+            for i in range(tracks * chunks_per_track)
+        ]
+        self.requested_ks = []
+
+    def similarity_search_by_vectors_with_relevance_scores(self, embeddings, k=4, filter=None):
+        self.requested_ks.append(k)
+        return [self.hits[:k] for _ in embeddings]
+
+
+class TestChunkHits(unittest.TestCase):
+
+    def setUp(self):
+        patch = mock.patch.multiple(config, MAX_LYRIC_CHUNKS=12, SEARCH_CHUNK_OVERFETCH=4, SEARCH_MAX_CHUNK_CANDIDATES=200)
+        patch.start()
+        self.addCleanup(patch.stop)
+
+    def fetch(self, store, ks):
+        return backend.fetch_chunk_hits(store, [[1.0]] * len(ks), ks)
+
+    def test_search_deepens_until_k_tracks_are_covered(self):
+        store = GroupedChunkStore(tracks=50, chunks_per_track=12)
+        hits = self.fetch(store, [5])[0]
+        # 20 chunks cover 2 tracks and 40 cover 4; the depth is capped at 5 * 12 chunks, which cover 5
+        self.assertEqual(store.requested_ks, [20, 40, 60])
+        self.assertEqual(len({document.metadata["track_id"] for document, _ in hits}), 5)
+
+    def test_search_stops_when_the_store_runs_out(self):
+        store = GroupedChunkStore(tracks=3, chunks_per_track=12)
+        self.assertEqual(len(self.fetch(store, [5])[0]), 36)
+        self.assertEqual(store.requested_ks, [20, 40])
+
+    def test_search_stops_at_max_lyric_chunks_per_track(self):
+        # Tracks with more chunks than MAX_LYRIC_CHUNKS, e.g. ingested with a larger setting
+        store = GroupedChunkStore(tracks=50, chunks_per_track=30)
+        self.fetch(store, [5])
+        self.assertEqual(store.requested_ks, [20, 40, 60])
+
+    def test_batched_queries_keep_their_own_depth(self):
+        store = GroupedChunkStore(tracks=50, chunks_per_track=12)
+        hits = self.fetch(store, [5, 1, 0])
+        self.assertEqual(store.requested_ks, [20, 40, 60])
+        self.assertEqual([len(query_hits) for query_hits in hits], [60, 4, 0])
+
+    def test_chunk_hits_collapse_into_tracks(self):
+        def hit(track_id, chunk, distance):
+            return Document(page_content=f"{track_id}:{chunk}", metadata={"track_id": track_id, "chunk": chunk}), distance
+
+        hits = [hit("a", 0, 0.2), hit("b", 0, 0.4), hit("b", 1, 0.5), hit("a", 1, 1.0), hit("c", 0, 1.2)]
+        ranked = backend.rank_chunk_hits(hits, 2)
+        # Distances are squared L2 distances between unit vectors: the similarity is 1 - d / 2
+        self.assertEqual([(document.page_content, round(score, 6)) for document, score in ranked], [("a:0", 0.9), ("b:0", 0.8)])
+        summed = backend.rank_chunk_hits(hits, 3, pooling="sum")
+        self.assertEqual([document.page_content for document, _ in summed], ["b:0", "a:0", "c:0"])
+        self.assertAlmostEqual(summed[0][1], 0.8 + 0.75, places=6)
+        self.assertEqual(backend.rank_chunk_hits([], 3), [])
+
+
+class TestHybridSearch(unittest.TestCase):
+
+    def documents(self, track_ids, source):
+        return [Document(page_content=f"{source} {track_id}", metadata={"track_id": track_id}) for track_id in track_ids]
+
+    def hybrid_search(self, dense_ids, sparse_ids, k, rrf_k=60, search_scope=None):
+        sparse_index = MagicMock()
+        sparse_index.count.return_value = 1
+        sparse_index.search.return_value = [
+            (document.page_content, document.metadata, 1.0) for document in self.documents(sparse_ids, "sparse")
+        ]
+        dense_results = [(document, 0.5) for document in self.documents(dense_ids, "dense")]
+        with mock.patch.object(backend, "get_sparse_index", return_value=sparse_index), \
+                mock.patch.object(config, "RRF_K", rrf_k):
+            results = backend.hybrid_search_tracks(None, "scope", "query", k, search_scope=search_scope, dense_results=dense_results)
+        return [(document.page_content, score) for document, score in results]
+
+    def test_rankings_are_fused_by_reciprocal_rank(self):
+        results = self.hybrid_search(["a", "b", "c", "d"], ["d", "e", "b"], 5)
+        # d and b are found by both sides; a dense-only hit keeps its dense chunk, a sparse-only hit gets its BM25 one
+        self.assertEqual([content for content, _ in results], ["dense d", "dense b", "dense a", "sparse e", "dense c"])
+        expected = {"d": 1 / 64 + 1 / 61, "b": 1 / 62 + 1 / 63, "a": 1 / 61, "e": 1 / 62, "c": 1 / 63}
+        for (content, score), track_id in zip(results, "dbaec"):
+            self.assertAlmostEqual(score, expected[track_id])
+        self.assertEqual(len(self.hybrid_search(["a", "b", "c", "d"], ["d", "e", "b"], 2)), 2)
+
+    def test_one_sided_hits(self):
+        self.assertEqual([content for content, _ in self.hybrid_search([], ["a", "b"], 5)], ["sparse a", "sparse b"])
+        self.assertEqual([content for content, _ in self.hybrid_search(["a", "b"], [], 5)], ["dense a", "dense b"])
+
+    def test_constant_trades_top_ranks_for_agreement(self):
+        # y is ranked fourth by both sides, x and r first by one side each
+        dense_ids, sparse_ids = ["x", "p", "q", "y"], ["r", "s", "t", "y"]
+        self.assertEqual(self.hybrid_search(dense_ids, sparse_ids, 3, rrf_k=60)[0][0], "dense y")
+        flat = [content for content, _ in self.hybrid_search(dense_ids, sparse_ids, 3, rrf_k=1)]
+        self.assertEqual((set(flat[:2]), flat[2]), ({"dense x", "sparse r"}, "dense y"))
+
+    def test_sparse_hits_outside_the_scope_are_dropped(self):
+        results = self.hybrid_search(["a"], ["e", "b"], 5, search_scope=backend.SearchScope({"a", "b"}, 10))
+        self.assertCountEqual([content for content, _ in results], ["dense a", "sparse b"])
+
+
+class TestSearchScope(ChunkStoreTestCase):
+
+    def nearest_chunks(self, track_ids, k):
+        hits = self.store.similarity_search_by_vector_with_relevance_scores(self.query, k=1800)
+        return [document.page_content for document, _ in hits if document.metadata["track_id"] in track_ids][:k]
+
+    def test_every_strategy_returns_the_nearest_chunks_in_scope(self):
+        # Every other track: 150 of 300 tracks, 900 chunks
+        track_ids = {f"t{t}" for t in range(0, 300, 2)}
+        for max_ids, min_share, postfilter, clauses in ((200, 0.2, False, 1), (40, 1.0, False, 4), (40, 0.2, True, 0)):
+            with mock.patch.object(config, "SEARCH_FILTER_MAX_IDS", max_ids), \
+                    mock.patch.object(config, "SEARCH_POSTFILTER_MIN_SHARE", min_share):
+                scope = backend.SearchScope(track_ids, 300)
+            self.assertEqual((scope.postfilter, len(scope.filters)), (postfilter, clauses))
+            self.assertTrue(all(len(where["track_id"]["$in"]) <= max_ids for where in scope.filters))
+            for k in (10, 600, 1000):
+                hits = scope.search(self.store, [self.query], k)[0]
+                self.assertEqual([document.page_content for document, _ in hits], self.nearest_chunks(track_ids, k))
+
+    def test_empty_scope_finds_nothing(self):
+        self.assertEqual(backend.SearchScope(set(), 300).search(self.store, [self.query], 10), [[]])
+
+    def test_catalog_scope_is_cached_until_the_library_changes(self):
+        membership_index = MagicMock()
+        membership_index.get_track_ids.return_value = {"t1", "t2"}
+        with mock.patch.object(backend, "CATALOG_MODE", True), \
+                mock.patch.object(backend, "get_membership_index", return_value=membership_index):
+            scope = backend.get_search_scope("scoped_user", self.store)
+            self.assertEqual(scope.track_ids, {"t1", "t2"})
+            self.assertIs(backend.get_search_scope("scoped_user", self.store), scope)
+            membership_index.get_track_ids.assert_called_once()
+
+            backend.search_result_cache.invalidate("scoped_user")
+            self.assertIsNot(backend.get_search_scope("scoped_user", self.store), scope)
+            self.assertEqual(membership_index.get_track_ids.call_count, 2)
+
+
+class TestDiversifyResults(unittest.TestCase):
+
+    def setUp(self):
+        # b's best chunk is a near duplicate of a's, c's is unrelated, d shares a's artist and album
+        self.directory = tempfile.TemporaryDirectory()
+        self.store = FaissVectorStore("test_text_collection", None, self.directory.name)
+        vectors = {"a": [1, 0, 0, 0], "b": [1, 0.01, 0, 0], "c": [0, 1, 0, 0], "d": [0, 0, 1, 0]}
+        self.store.add_embeddings(
+            [Document(page_content=track_id, metadata={"track_id": track_id, "chunk": 0}) for track_id in vectors],
+            list(vectors.values())
+        )
+        albums = {"a": ("X", "One"), "b": ("Y", "Two"), "c": ("Z", "Three"), "d": ("X", "One")}
+        self.results = [
+            {"text": track_id, "metadata": {"track_id": track_id, "chunk": 0}, "score": score,
+             "audio": {"artists": [albums[track_id][0]], "album": albums[track_id][1]}}
+            for track_id, score in (("a", 0.9), ("b", 0.89), ("d", 0.85), ("c", 0.8))
+        ]
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def diversify(self, k, lambda_mult):
+        with mock.patch.object(backend, "get_text_collection", return_value=self.store):
+            return [result["metadata"]["track_id"] for result in backend.diversify_results("user", self.results, k, lambda_mult)]
+
+    def test_near_duplicates_and_same_album_tracks_are_skipped(self):
+        self.assertEqual(self.diversify(2, 1.0), ["a", "b"])
+        self.assertEqual(self.diversify(2, 0.5), ["a", "c"])
+        # d is as similar to a as a duplicate, so it comes after b even though it shares no lyrics with a
+        self.assertEqual(self.diversify(3, 0.5), ["a", "c", "b"])
+        # With no more candidates than k there is nothing to pick
+        self.assertEqual(self.diversify(4, 0.5), ["a", "b", "d", "c"])
+
+    def test_playlist_searches_once_with_mmr(self):
+        ctx = MagicMock(user_id="user")
+        ctx.sp.user_playlist_create.return_value = {"id": "playlist"}
+        ctx.sp.recommendations.return_value = {"tracks": [{"id": "r", "name": "R", "artists": []}]}
+        ctx.sp.current_user_saved_tracks.return_value = {"items": []}
+        with mock.patch.object(backend, "search_user_tracks", return_value=self.results) as search_user_tracks, \
+                mock.patch.object(backend, "get_text_collection", return_value=self.store):
+            events = list(backend.iter_playlist_events(ctx, "query", 2, mmr_lambda=0.5))
+        search_user_tracks.assert_called_once_with("user", "query", 10)
+        self.assertEqual([event["uri"] for event in events if event["type"] == "track"],
+                         ["spotify:track:a", "spotify:track:c", "spotify:track:r"])
+        # The recommendations are seeded with the plain top k, not the diversified picks
+        self.assertEqual(ctx.sp.recommendations.call_args.kwargs["seed_tracks"], ["a", "b"])
+
+
+class TestFeatureRanges(unittest.TestCase):
+
+    def test_bounds_may_be_open(self):
+        ranges = backend.parse_feature_ranges(" energy:0.6:1, tempo:120:,loudness::-5,")
+        self.assertEqual(ranges, {"energy": (0.6, 1.0), "tempo": (120.0, None), "loudness": (None, -5.0)})
+        self.assertEqual(backend.parse_feature_ranges(""), {})
+
+    def test_invalid_filters_are_rejected(self):
+        for ranges in ("mood:0:1", "energy:0.5", "energy:low:1", "energy:0.8:0.2"):
+            with self.assertRaises(ValueError):
+                backend.parse_feature_ranges(ranges)
+
+    def test_bounds_become_one_where_clause(self):
+        audio_store = MagicMock()
+        audio_store.get.return_value = {"ids": ["t1", "t2"]}
+        ranges = backend.parse_feature_ranges("tempo:100:130,energy:0.6:")
+        self.assertEqual(backend.get_feature_filter_ids(audio_store, ranges), {"t1", "t2"})
+        audio_store.get.assert_called_once_with(where={"$and": [
+            {"energy": {"$gte": 0.6}}, {"tempo": {"$gte": 100.0}}, {"tempo": {"$lte": 130.0}},
+        ]}, include=[])
+
+        audio_store.get.reset_mock()
+        backend.get_feature_filter_ids(audio_store, {"energy": (None, 0.4)})
+        audio_store.get.assert_called_once_with(where={"energy": {"$lte": 0.4}}, include=[])
+        self.assertIsNone(backend.get_feature_filter_ids(audio_store, {"energy": (None, None)}))
+
+    def test_invalid_range_is_a_bad_request(self):
+        with mock.patch.object(backend, "get_request_context", return_value=MagicMock(user_id="user")), \
+                mock.patch.object(backend, "search_user_tracks") as search_user_tracks:
+            response = TestClient(backend.app).get("/search", params={"query": "rain", "range": "energy:1:0"})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("minimum is above the maximum", response.json()["detail"])
+        search_user_tracks.assert_not_called()
+
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,53 @@
+import os
+import tempfile
+import unittest
+from langchain_core.documents import Document
+from app.managers.sparse_index import SparseIndex
+
+
+def chunk(track_id, index, text):
+    return Document(page_content=text, metadata={"track_id": track_id, "chunk": index})
+
+
+class TestSparseIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.index = SparseIndex(os.path.join(self.directory.name, "sparse.sqlite3"), max_document_frequency=0.5)
+        self.index.add_documents("alice_text_collection", [
+            chunk("t1", 0, "Bohemian Rhapsody by Queen\nLyrics: Is this the real life? Is this just fantasy?"),
+            chunk("t1", 1, "Bohemian Rhapsody by Queen\nLyrics: Mama, just killed a man"),
+            chunk("t2", 0, "Yesterday by The Beatles\nLyrics: All my troubles seemed so far away"),
+            chunk("t3", 0, "Café del Mar by Energy 52"),
+        ])
+        self.index.add_documents("bob_text_collection", [
+            chunk("t4", 0, "Fantasy by Mariah Carey\nLyrics: Oh when you walk by every night"),
+        ])
+
+    def tearDown(self):
+        self.index.connection.close()
+        self.directory.cleanup()
+
+    def test_search_is_scoped_and_ranked(self):
+        results = self.index.search("alice_text_collection", "real fantasy")
+        self.assertEqual([metadata["track_id"] for _, metadata, _ in results], ["t1"])
+        self.assertEqual(results[0][1]["chunk"], 0)
+
+    def test_accents_and_punctuation_are_ignored(self):
+        results = self.index.search("alice_text_collection", 'cafe "del" mar!')
+        self.assertEqual(results[0][1]["track_id"], "t3")
+
+    def test_common_words_are_dropped(self):
+        # "by" appears in every chunk
+        self.assertEqual(self.index.search("alice_text_collection", "by"), [])
+
+    def test_reindexing_and_removal(self):
+        self.index.add_documents("alice_text_collection", [chunk("t2", 0, "Yesterday by The Beatles")])
+        self.assertEqual(self.index.search("alice_text_collection", "troubles"), [])
+        self.index.remove_tracks("alice_text_collection", ["t1"])
+        self.assertEqual(self.index.search("alice_text_collection", "mama"), [])
+        self.assertEqual(self.index.count("alice_text_collection"), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,125 @@
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+import numpy as np
+from app.managers import store_registry
+from app.managers.faiss_store import FaissVectorStore
+from app.managers.store_registry import StoreRegistry
+
+
+class TestStoreRegistry(unittest.TestCase):
+
+    def setUp(self):
+        self.built = []
+
+        def factory(key):
+            self.built.append(key)
+            return object()
+
+        self.registry = StoreRegistry(factory, max_entries=2, idle_timeout=60)
+
+    def test_handles_are_reused(self):
+        first = self.registry.get("user_text_collection")
+        second = self.registry.get("user_text_collection")
+        self.assertIs(first, second)
+        self.assertEqual(self.built, ["user_text_collection"])
+        self.assertEqual(self.registry.stats(), {"size": 1, "hits": 1, "misses": 1})
+
+    def test_least_recently_used_handle_is_evicted(self):
+        self.registry.get("a")
+        self.registry.get("b")
+        self.registry.get("a")
+        self.registry.get("c")
+        self.registry.get("a")
+        self.registry.get("b")
+        self.assertEqual(self.built, ["a", "b", "c", "b"])
+
+    def test_idle_handles_are_evicted(self):
+        self.registry.idle_timeout = 0.01
+        self.registry.get("a")
+        time.sleep(0.02)
+        self.registry.get("a")
+        self.assertEqual(self.built, ["a", "a"])
+
+    def test_pinned_handles_are_not_evicted(self):
+        self.registry.idle_timeout = 0.01
+        with self.registry.pinned("a") as pinned:
+            time.sleep(0.02)
+            self.registry.get("b")
+            self.registry.get("c")
+            self.assertIs(self.registry.get("a"), pinned)
+            self.assertEqual(self.built, ["a", "b", "c"])
+        self.assertEqual(self.registry.handles["a"][2], 0)
+        time.sleep(0.02)
+        self.registry.get("b")
+        self.assertNotIn("a", self.registry.handles)
+
+    def test_concurrent_first_use_builds_once(self):
+        def slow_factory(key):
+            time.sleep(0.05)
+            self.built.append(key)
+            return object()
+
+        self.registry.factory = slow_factory
+        handles = []
+        threads = [threading.Thread(target=lambda: handles.append(self.registry.get("a"))) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(self.built, ["a"])
+        self.assertTrue(all(handle is handles[0] for handle in handles))
+
+
+class FakeChromaCollection():
+    """
+    The part of a chromadb collection read by `import_chroma_collection`.
+    """
+    def __init__(self, size):
+        self.name = "user_text_collection"
+        self.ids = [f"t{i}:0" for i in range(size)]
+        self.embeddings = np.random.default_rng(0).standard_normal((size, 8)).tolist()
+
+    def count(self):
+        return len(self.ids)
+
+    def get(self, include, limit, offset):
+        ids = self.ids[offset:offset + limit]
+        return {
+            "ids": ids,
+            "documents": [f"document {doc_id}" for doc_id in ids],
+            "metadatas": [{"track_id": doc_id.split(":")[0], "chunk": 0} for doc_id in ids],
+            "embeddings": self.embeddings[offset:offset + limit],
+        }
+
+
+class TestChromaImport(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.store = FaissVectorStore("user_text_collection", None, self.directory.name)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_existing_chroma_collection_is_imported(self):
+        client = mock.Mock()
+        client.get_collection.return_value = FakeChromaCollection(2500)
+        with mock.patch.object(store_registry, "get_chroma_client", return_value=client):
+            imported = store_registry.import_existing_chroma_collection("user_text_collection", self.store)
+        self.assertEqual(imported, 2500)
+        self.assertEqual(self.store.count(), 2500)
+        self.assertEqual(self.store.get(ids=["t2499:0"])["metadatas"], [{"track_id": "t2499", "chunk": 0}])
+
+    def test_missing_chroma_collection_is_skipped(self):
+        client = mock.Mock()
+        client.get_collection.side_effect = ValueError("Collection user_text_collection does not exist.")
+        with mock.patch.object(store_registry, "get_chroma_client", return_value=client):
+            self.assertEqual(store_registry.import_existing_chroma_collection("user_text_collection", self.store), 0)
+        self.assertEqual(self.store.count(), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,15 +1,157 @@
 
-from langchain_community.embeddings import HuggingFaceBgeEmbeddings 
+from langchain_core.embeddings import Embeddings
+
+from app import config
+from app.models.embedding_cache import CachedEmbeddings, EmbeddingCache
+from app.utils.lazy import lazy
+
+
+class BucketedEmbeddings(Embeddings):
+    """
+    Wraps a sentence-transformers based embedding function (such as HuggingFaceBgeEmbeddings) and embeds documents
+    in length-bucketed batches. Inputs are sorted by token length and grouped so that each batch stays under a
+    padded-token budget: short "title by artist" texts are embedded in large batches, full lyrics in small ones,
+    and almost no CPU time is spent on padding. Embeddings are returned in the original input order.
+    """
+    def __init__(self, base, max_batch_tokens=16384, max_batch_size=128, num_threads=None):
+        self.base = base
+        self.client = base.client
+        self.max_batch_tokens = max_batch_tokens
+        self.max_batch_size = max_batch_size
+        # batch_size is decided per bucket, every other encode option is kept from the wrapped function
+        self.encode_kwargs = {k: v for k, v in base.encode_kwargs.items() if k != "batch_size"}
+
+        if num_threads:
+            import torch
+            torch.set_num_threads(num_threads)
+
+    def token_lengths(self, texts):
+        """
+        Returns the number of tokens (including special tokens, after truncation) of each text.
+        """
+        encoded = self.client.tokenizer(
+            texts, add_special_tokens=True, truncation=True, max_length=self.client.max_seq_length
+        )
+        return [len(input_ids) for input_ids in encoded["input_ids"]]
+
+    def make_batches(self, lengths):
+        """
+        Groups input indices into batches of similar token length.
+
+        Args:
+            lengths (list): Token length of each input.
+
+        Returns:
+            list: Batches of input indices. The padded size of a batch (its longest input times its size) never
+            exceeds `max_batch_tokens` unless a single input is longer than the budget.
+        """
+        order = sorted(range(len(lengths)), key=lengths.__getitem__, reverse=True)
+        batches = []
+        batch = []
+        for index in order:
+            # Inputs are visited longest first, so the first input of a batch sets its padded length
+            if batch and (lengths[batch[0]] * (len(batch) + 1) > self.max_batch_tokens or len(batch) >= self.max_batch_size):
+                batches.append(batch)
+                batch = []
+            batch.append(index)
+        if batch:
+            batches.append(batch)
+        return batches
+
+    def embed_documents(self, texts):
+        # Same preprocessing as HuggingFaceBgeEmbeddings.embed_documents
+        texts = [text.replace("\n", " ") for text in texts]
+        embeddings = [None] * len(texts)
+        for batch in self.make_batches(self.token_lengths(texts)):
+            vectors = self.client.encode([texts[i] for i in batch], batch_size=len(batch), **self.encode_kwargs)
+            for i, vector in zip(batch, vectors):
+                embeddings[i] = vector.tolist()
+        return embeddings
+
+    def embed_query(self, text):
+        return self.base.embed_query(text)
+
+    def embed_queries(self, texts):
+        """
+        Embeds several queries in length-bucketed batches, with the same query instruction as `embed_query`.
+        """
+        return self.embed_documents([self.base.query_instruction + text for text in texts])
+
+
+def build_model_embedding_function(num_threads=None):
+    """
+    Loads the embedding model in the current process, using the backend selected in `app.config`.
+
+    Args:
+        num_threads (int): Number of CPU threads the model may use. Defaults to EMBEDDING_THREADS.
+
+    Returns:
+        Embeddings: The in-process embedding function.
+    """
+    num_threads = num_threads or config.EMBEDDING_THREADS
+    if config.EMBEDDING_BACKEND == "onnx-int8":
+        from app.models.onnx_embedding import OnnxEmbeddings
+        return OnnxEmbeddings(
+            config.EMBEDDING_MODEL_NAME,
+            config.ONNX_MODEL_DIRECTORY,
+            quantize=True,
+            num_threads=num_threads
+        )
+
+    from langchain_community.embeddings import HuggingFaceBgeEmbeddings
+    return BucketedEmbeddings(
+        HuggingFaceBgeEmbeddings(model_name=config.EMBEDDING_MODEL_NAME),
+        max_batch_tokens=config.EMBEDDING_MAX_BATCH_TOKENS,
+        num_threads=num_threads
+    )
+
+
+def build_embedding_function():
+    """
+    Builds the embedding function used by the vector stores from the settings in `app.config`. With
+    EMBEDDING_WORKERS set, the model runs in a pool of worker processes instead of the web process.
+
+    Returns:
+        Embeddings: The configured embedding function.
+    """
+    if config.EMBEDDING_WORKERS > 0:
+        from app.models.embedding_service import EmbeddingService, RemoteEmbeddings
+        embedding_function = RemoteEmbeddings(EmbeddingService(
+            config.EMBEDDING_WORKERS,
+            threads_per_worker=config.EMBEDDING_THREADS,
+            max_batch_size=config.EMBEDDING_MICRO_BATCH_SIZE,
+            max_wait=config.EMBEDDING_MICRO_BATCH_WAIT_MS / 1000
+        ))
+    else:
+        embedding_function = build_model_embedding_function()
+    if config.EMBEDDING_CACHE_PATH:
+        embedding_function = CachedEmbeddings(
+            embedding_function,
+            EmbeddingCache(config.EMBEDDING_CACHE_PATH, max_entries=config.EMBEDDING_CACHE_MAX_ENTRIES),
+            # Quantized vectors differ slightly from full-precision ones, so each backend gets its own entries
+            model_name=f"{config.EMBEDDING_MODEL_NAME}:{config.EMBEDDING_BACKEND}"
+        )
+    return embedding_function
+
+
+@lazy
+def get_embedding_function():
+    """
+    Returns the shared embedding function, loading the model on first use.
+    """
+    return build_embedding_function()
 
 
 class Embedding():
     def __init__(self):
-        self.model = "BAAI/bge-m3"
-        self.embedding_fucntion = HuggingFaceBgeEmbeddings(model_name=self.model)
+        self.model = config.EMBEDDING_MODEL_NAME
+
+    @property
+    def embedding_fucntion(self):
+        return get_embedding_function()
 
     def get_embedding_function(self):
         return self.embedding_fucntion
-    
-    def store_embedding(self, document, collection_name): 
-        pass # check later 
 
+    def store_embedding(self, document, collection_name):
+        pass # check later
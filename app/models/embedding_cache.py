@@ -0,0 +1,133 @@
+import hashlib
+import sqlite3
+import threading
+import time
+from array import array
+
+from langchain_core.embeddings import Embeddings
+
+
+def content_key(model_name, text):
+    """
+    Builds the cache key of a text: a hash of the model name and the whitespace-normalized text, so the same
+    track text maps to the same entry for every user.
+    """
+    normalized = " ".join(text.split())
+    return hashlib.sha256(f"{model_name}\0{normalized}".encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache():
+    """
+    Persistent SQLite store of float32 embeddings keyed by content hash. Once it holds more than `max_entries`
+    vectors, the least recently used ones are evicted.
+    """
+    def __init__(self, path, max_entries=100000):
+        self.max_entries = max_entries
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        with self.lock, self.connection:
+            self.connection.execute("PRAGMA journal_mode=WAL")
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vector BLOB, last_used REAL)"
+            )
+            self.connection.execute("CREATE INDEX IF NOT EXISTS embeddings_last_used ON embeddings (last_used)")
+            self.size = self.connection.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+    def get_many(self, keys):
+        """
+        Looks up several keys at once and marks the found entries as recently used.
+
+        Returns:
+            dict: Mapping of key to embedding for every cached key.
+        """
+        keys = list(set(keys))
+        found = {}
+        with self.lock, self.connection:
+            # Stay well below SQLite's bound-parameter limit
+            for start in range(0, len(keys), 500):
+                batch = keys[start:start + 500]
+                placeholders = ",".join("?" * len(batch))
+                rows = self.connection.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", batch
+                ).fetchall()
+                for key, vector in rows:
+                    found[key] = array("f", vector).tolist()
+                if rows:
+                    self.connection.execute(
+                        f"UPDATE embeddings SET last_used = ? WHERE key IN ({','.join('?' * len(rows))})",
+                        [time.time(), *(key for key, _ in rows)]
+                    )
+        return found
+
+    def put_many(self, items):
+        """
+        Stores (key, embedding) pairs and evicts the least recently used entries beyond `max_entries`.
+        """
+        now = time.time()
+        with self.lock, self.connection:
+            before = self.connection.total_changes
+            self.connection.executemany(
+                "INSERT OR IGNORE INTO embeddings (key, vector, last_used) VALUES (?, ?, ?)",
+                [(key, array("f", vector).tobytes(), now) for key, vector in items]
+            )
+            self.size += self.connection.total_changes - before
+            if self.size > self.max_entries:
+                self.connection.execute(
+                    "DELETE FROM embeddings WHERE key IN (SELECT key FROM embeddings ORDER BY last_used LIMIT ?)",
+                    (self.size - self.max_entries,)
+                )
+                self.size = self.max_entries
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Sits in front of an embedding function and serves document embeddings from an EmbeddingCache, so a track
+    text that appears in many users' libraries is only embedded once. Hits and misses are counted so the effect
+    of the cache on ingest cost can be reported.
+    """
+    def __init__(self, base, cache, model_name):
+        self.base = base
+        self.cache = cache
+        self.model_name = model_name
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def embed_documents(self, texts):
+        keys = [content_key(self.model_name, text) for text in texts]
+        embeddings = self.cache.get_many(keys)
+
+        misses = {}
+        for key, text in zip(keys, texts):
+            if key not in embeddings:
+                misses.setdefault(key, text)
+
+        if misses:
+            vectors = self.base.embed_documents(list(misses.values()))
+            computed = list(zip(misses.keys(), vectors))
+            self.cache.put_many(computed)
+            embeddings.update(computed)
+
+        with self.lock:
+            self.hits += len(texts) - len(misses)
+            self.misses += len(misses)
+
+        return [embeddings[key] for key in keys]
+
+    def embed_query(self, text):
+        return self.base.embed_query(text)
+
+    def embed_queries(self, texts):
+        return self.base.embed_queries(texts)
+
+    def stats(self):
+        """
+        Returns the number of cache hits and misses so far and the resulting hit rate.
+        """
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
@@ -0,0 +1,285 @@
+import atexit
+import itertools
+import logging
+import multiprocessing
+import multiprocessing.connection
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+from langchain_core.embeddings import Embeddings
+
+logger = logging.getLogger(__name__)
+
+
+def _worker_main(index, task_queue, result_queue, num_threads, embedding_factory=None):
+    """
+    Entry point of an embedding worker process: loads its own copy of the model, then embeds micro-batches from
+    its task queue until it receives None.
+    """
+    if embedding_factory is None:
+        from app.models.embedding import build_model_embedding_function
+        embedding_factory = build_model_embedding_function
+
+    try:
+        embedding_function = embedding_factory(num_threads=num_threads)
+    except Exception as e:
+        result_queue.put(("failed", index, repr(e)))
+        return
+    result_queue.put(("ready", index, None))
+
+    while True:
+        task = task_queue.get()
+        if task is None:
+            return
+        batch_id, kind, texts = task
+        try:
+            if kind == "queries":
+                vectors = embedding_function.embed_queries(texts)
+            else:
+                vectors = embedding_function.embed_documents(texts)
+            result_queue.put((batch_id, vectors, None))
+        except Exception as e:
+            result_queue.put((batch_id, None, repr(e)))
+
+
+class _Request():
+    """
+    A caller's embedding request, possibly spread over several micro-batches.
+    """
+    def __init__(self, size):
+        self.future = Future()
+        self.vectors = [None] * size
+        self.remaining = size
+        self.lock = threading.Lock()
+
+    def fill(self, offset, vectors):
+        with self.lock:
+            self.vectors[offset:offset + len(vectors)] = vectors
+            self.remaining -= len(vectors)
+            done = self.remaining == 0
+        if done and not self.future.done():
+            self.future.set_result(self.vectors)
+
+
+class _Worker():
+    """
+    An embedding worker process with its own task queue, so the batches it holds are known if it dies.
+    """
+    def __init__(self, process, task_queue):
+        self.process = process
+        self.task_queue = task_queue
+        self.ready = False
+        self.healthy = True
+        self.batches = set()
+
+
+class EmbeddingService():
+    """
+    Local embedding service: a pool of worker processes, each holding the model and fed over its own
+    multiprocessing queue. Concurrent requests are coalesced into micro-batches of up to `max_batch_size` texts
+    (waiting at most `max_wait` seconds for more requests), and large requests are split so their texts are
+    embedded by several workers at once. Embedding therefore runs outside the web process's GIL and scales with
+    the number of cores.
+
+    Each micro-batch goes to the least busy healthy worker, preferring workers that have loaded their model. A
+    worker that fails to load or exits is taken out of the pool and the requests it was holding fail right away;
+    the service keeps serving as long as one worker is healthy.
+    """
+    def __init__(self, num_workers, threads_per_worker=None, max_batch_size=32, max_wait=0.005,
+                 embedding_factory=None):
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        threads_per_worker = threads_per_worker or max(1, (os.cpu_count() or 1) // num_workers)
+
+        context = multiprocessing.get_context("spawn")
+        self.result_queue = context.Queue()
+        self.workers = []
+        for i in range(num_workers):
+            task_queue = context.Queue()
+            process = context.Process(
+                target=_worker_main,
+                args=(i, task_queue, self.result_queue, threads_per_worker, embedding_factory),
+                name=f"embedding-worker-{i}",
+                daemon=True
+            )
+            self.workers.append(_Worker(process, task_queue))
+        for worker in self.workers:
+            worker.process.start()
+
+        self.pending = queue.Queue()
+        self.carry = None
+        self.inflight = {}
+        self.batch_ids = itertools.count()
+        # Guards the workers' state and the in-flight batches, shared by the dispatcher, collector and monitor
+        self.lock = threading.Lock()
+        self.ready = threading.Condition(self.lock)
+        self.failure = None
+        self.closed = False
+
+        threading.Thread(target=self._dispatch, name="embedding-dispatcher", daemon=True).start()
+        threading.Thread(target=self._collect, name="embedding-collector", daemon=True).start()
+        threading.Thread(target=self._monitor, name="embedding-monitor", daemon=True).start()
+        atexit.register(self.close)
+        logger.info(f"Started {num_workers} embedding workers with {threads_per_worker} threads each")
+
+    def submit(self, kind, texts):
+        """
+        Queues texts for embedding.
+
+        Args:
+            kind (str): "documents" or "queries".
+            texts (list): Texts to embed.
+
+        Returns:
+            Future: Resolves to the list of embeddings, in the order of `texts`.
+        """
+        if not any(worker.healthy for worker in self.workers):
+            raise RuntimeError(f"No healthy embedding worker left: {self.failure}")
+        request = _Request(len(texts))
+        if not texts:
+            request.future.set_result([])
+            return request.future
+        # Split large requests into micro-batch sized parts so several workers share them
+        for offset in range(0, len(texts), self.max_batch_size):
+            self.pending.put((kind, request, offset, texts[offset:offset + self.max_batch_size]))
+        return request.future
+
+    def wait_ready(self, timeout=None):
+        """
+        Blocks until every worker has loaded its model or been taken out of the pool.
+        """
+        with self.ready:
+            return self.ready.wait_for(
+                lambda: all(worker.ready or not worker.healthy for worker in self.workers), timeout=timeout
+            )
+
+    def close(self):
+        """
+        Stops the worker processes.
+        """
+        if self.closed:
+            return
+        self.closed = True
+        for worker in self.workers:
+            worker.task_queue.put(None)
+
+    def _next_part(self, timeout=None):
+        if self.carry is not None:
+            part, self.carry = self.carry, None
+            return part
+        return self.pending.get(timeout=timeout) if timeout is not None else self.pending.get()
+
+    def _dispatch(self):
+        while True:
+            kind, request, offset, texts = self._next_part()
+            parts = [(request, offset, len(texts))]
+            batch = list(texts)
+            deadline = time.monotonic() + self.max_wait
+
+            # Coalesce further requests of the same kind until the micro-batch is full or the wait is over
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    part = self._next_part(timeout=remaining)
+                except queue.Empty:
+                    break
+                if part[0] != kind or len(batch) + len(part[3]) > self.max_batch_size:
+                    self.carry = part
+                    break
+                parts.append((part[1], part[2], len(part[3])))
+                batch.extend(part[3])
+
+            with self.lock:
+                healthy = [worker for worker in self.workers if worker.healthy]
+                worker = min(healthy, key=lambda w: (not w.ready, len(w.batches)), default=None)
+                if worker is not None:
+                    batch_id = next(self.batch_ids)
+                    self.inflight[batch_id] = (worker, parts)
+                    worker.batches.add(batch_id)
+            if worker is None:
+                self._fail_parts(parts, RuntimeError(f"No healthy embedding worker left: {self.failure}"))
+                continue
+            worker.task_queue.put((batch_id, kind, batch))
+
+    def _collect(self):
+        while True:
+            batch_id, vectors, error = self.result_queue.get()
+            if batch_id == "ready":
+                with self.ready:
+                    self.workers[vectors].ready = True
+                    self.ready.notify_all()
+                continue
+            if batch_id == "failed":
+                logger.error(f"Embedding worker {vectors} failed to load the model: {error}")
+                self._remove_worker(self.workers[vectors], f"failed to load the model: {error}")
+                continue
+
+            with self.lock:
+                worker, parts = self.inflight.pop(batch_id, (None, []))
+                if worker is not None:
+                    worker.batches.discard(batch_id)
+            start = 0
+            for request, offset, count in parts:
+                if error is not None:
+                    if not request.future.done():
+                        request.future.set_exception(RuntimeError(f"Embedding worker failed: {error}"))
+                else:
+                    request.fill(offset, vectors[start:start + count])
+                start += count
+
+    def _monitor(self):
+        # Wakes up as soon as a worker process exits, instead of leaving its requests to time out
+        while True:
+            with self.lock:
+                sentinels = {worker.process.sentinel: worker for worker in self.workers if worker.healthy}
+            if not sentinels:
+                return
+            for sentinel in multiprocessing.connection.wait(list(sentinels)):
+                worker = sentinels[sentinel]
+                if not self.closed:
+                    logger.error(f"{worker.process.name} exited with code {worker.process.exitcode}")
+                self._remove_worker(worker, f"{worker.process.name} exited with code {worker.process.exitcode}")
+
+    def _remove_worker(self, worker, reason):
+        """
+        Takes a worker out of the pool and fails the requests of the batches it was holding.
+        """
+        with self.ready:
+            if not worker.healthy:
+                return
+            worker.healthy = False
+            self.failure = reason
+            lost = [self.inflight.pop(batch_id)[1] for batch_id in worker.batches if batch_id in self.inflight]
+            worker.batches.clear()
+            self.ready.notify_all()
+        exception = RuntimeError(f"Embedding worker failed: {reason}")
+        for parts in lost:
+            self._fail_parts(parts, exception)
+
+    def _fail_parts(self, parts, exception):
+        for request, _, _ in parts:
+            if not request.future.done():
+                request.future.set_exception(exception)
+
+
+class RemoteEmbeddings(Embeddings):
+    """
+    Embedding function backed by an EmbeddingService, usable anywhere an in-process embedding function is.
+    """
+    def __init__(self, service, timeout=600):
+        self.service = service
+        self.timeout = timeout
+
+    def embed_documents(self, texts):
+        return self.service.submit("documents", list(texts)).result(timeout=self.timeout)
+
+    def embed_query(self, text):
+        return self.embed_queries([text])[0]
+
+    def embed_queries(self, texts):
+        return self.service.submit("queries", list(texts)).result(timeout=self.timeout)
@@ -0,0 +1,109 @@
+import logging
+import os
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+logger = logging.getLogger(__name__)
+
+# Same instruction HuggingFaceBgeEmbeddings prepends to queries, so both backends share one vector space
+DEFAULT_QUERY_INSTRUCTION = "Represent this question for searching relevant passages: "
+
+
+class OnnxEmbeddings(Embeddings):
+    """
+    CPU-optimized dense embeddings for BGE models: the model is exported to ONNX once, quantized to int8 with
+    dynamic quantization and run through ONNX Runtime. Vectors are the normalized CLS embedding, the same dense
+    representation HuggingFaceBgeEmbeddings produces, so collections embedded with the float model stay searchable.
+
+    Requires the optional `optimum[onnxruntime]` package.
+    """
+    def __init__(self, model_name, export_directory, quantize=True, num_threads=None, batch_size=32,
+                 max_length=8192, query_instruction=DEFAULT_QUERY_INSTRUCTION):
+        try:
+            import onnxruntime
+            from optimum.onnxruntime import ORTModelForFeatureExtraction
+            from transformers import AutoTokenizer
+        except ImportError as e:
+            raise ImportError(
+                "The ONNX embedding backend requires optimum with ONNX Runtime: pip install 'optimum[onnxruntime]'"
+            ) from e
+
+        self.batch_size = batch_size
+        self.max_length = max_length
+        self.query_instruction = query_instruction
+
+        model_directory = export_model(model_name, export_directory, quantize=quantize)
+
+        session_options = onnxruntime.SessionOptions()
+        session_options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if num_threads:
+            session_options.intra_op_num_threads = num_threads
+
+        self.tokenizer = AutoTokenizer.from_pretrained(model_directory)
+        self.model = ORTModelForFeatureExtraction.from_pretrained(
+            model_directory,
+            file_name="model_quantized.onnx" if quantize else "model.onnx",
+            session_options=session_options,
+            provider="CPUExecutionProvider",
+        )
+
+    def _embed(self, texts):
+        inputs = self.tokenizer(
+            texts, padding=True, truncation=True, max_length=self.max_length, return_tensors="np"
+        )
+        outputs = self.model(**inputs)
+        cls = np.asarray(outputs.last_hidden_state)[:, 0]
+        return cls / np.linalg.norm(cls, axis=1, keepdims=True)
+
+    def embed_documents(self, texts):
+        texts = [text.replace("\n", " ") for text in texts]
+        # Embed texts of similar length together to keep padding low
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]), reverse=True)
+        embeddings = [None] * len(texts)
+        for start in range(0, len(order), self.batch_size):
+            batch = order[start:start + self.batch_size]
+            for i, vector in zip(batch, self._embed([texts[i] for i in batch])):
+                embeddings[i] = vector.tolist()
+        return embeddings
+
+    def embed_query(self, text):
+        return self._embed([self.query_instruction + text.replace("\n", " ")])[0].tolist()
+
+    def embed_queries(self, texts):
+        """
+        Embeds several queries in batches, with the same query instruction as `embed_query`.
+        """
+        return self.embed_documents([self.query_instruction + text for text in texts])
+
+
+def export_model(model_name, export_directory, quantize=True):
+    """
+    Exports a Hugging Face model to ONNX (and an int8 dynamically quantized copy) unless that was already done.
+
+    Args:
+        model_name (str): Hugging Face model name.
+        export_directory (str): Directory holding the exported models.
+        quantize (bool): Whether to also produce `model_quantized.onnx`. Defaults to True.
+
+    Returns:
+        str: Directory of the exported model.
+    """
+    from optimum.onnxruntime import ORTModelForFeatureExtraction, ORTQuantizer
+    from optimum.onnxruntime.configuration import AutoQuantizationConfig
+    from transformers import AutoTokenizer
+
+    model_directory = os.path.join(export_directory, model_name.replace("/", "--"))
+
+    if not os.path.exists(os.path.join(model_directory, "model.onnx")):
+        logger.info(f"Exporting {model_name} to ONNX in {model_directory}")
+        ORTModelForFeatureExtraction.from_pretrained(model_name, export=True).save_pretrained(model_directory)
+        AutoTokenizer.from_pretrained(model_name).save_pretrained(model_directory)
+
+    if quantize and not os.path.exists(os.path.join(model_directory, "model_quantized.onnx")):
+        logger.info(f"Quantizing {model_name} to int8")
+        quantizer = ORTQuantizer.from_pretrained(model_directory, file_name="model.onnx")
+        quantization_config = AutoQuantizationConfig.avx2(is_static=False, per_channel=False)
+        quantizer.quantize(save_dir=model_directory, quantization_config=quantization_config)
+
+    return model_directory
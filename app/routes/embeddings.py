@@ -1,11 +1,12 @@
-from backend import APIRouter, Query, HTTPException, Request
+from backend import APIRouter, Query, HTTPException, Request, get_audio_metadata_bulk, iter_saved_tracks, build_track_documents
 from fastapi.responses import RedirectResponse, JSONResponse
 from managers.spotify_manager import SpotifyManager
 from embedding_manager import EmbeddingManager
-from utils import filter_none_metadata, convert_lists_to_strings, convert_strings_to_lists
 from spotipy.exceptions import SpotifyException
-from langchain_core.documents import Document
+from app import config
+from app.managers.checkpoint_manager import CheckpointManager
 import logging
+import time
 
 # Initialize logging
 logger = logging.getLogger(__name__)
@@ -17,6 +18,7 @@ router = APIRouter()
 auth_manager = SpotifyAuthManager()
 spotify_manager = SpotifyManager(auth_manager)
 embedding_manager = EmbeddingManager(model_name="BAAI/bge-m3")
+checkpoint_manager = CheckpointManager(config.INGEST_CHECKPOINT_DIRECTORY)
 
 @router.get("/lyrics")
 async def lyrics(artist: str, title: str):
@@ -31,65 +33,50 @@ async def lyrics(artist: str, title: str):
 
 
 @router.get("/store_embeddings")
-async def store_embeddings(limit: int = Query(default=50)):
+async def store_embeddings(limit: int = Query(default=None), restart: bool = Query(default=False)):
     try:
         sp = auth_manager.get_spotify_client()
         user_id = sp.current_user()['id']
         text_store = embedding_manager.get_text_collection(user_id)
         audio_store = embedding_manager.get_audio_collection(user_id)
-        liked_songs = sp.current_user_saved_tracks(limit=limit)
 
-        text_documents = []
-        audio_documents = []
-        ids = []
+        checkpoint = checkpoint_manager.load(user_id)
+        offset = 0 if restart or checkpoint.get("completed", True) else checkpoint.get("offset", 0)
+        number_of_songs = 0
+        started_at = time.perf_counter()
 
-        for item in liked_songs['items']:
-            track = item['track']
-            track_id = track['id']
-            track_info = {
-                "id": track_id,
-                "name": track['name'],
-                "album": track['album']['name'],
-                "artists": [artist['name'] for artist in track['artists']],
-                "url": track['external_urls']['spotify']
-            }
+        for page_offset, total, items in iter_saved_tracks(sp, offset=offset):
+            if limit is not None:
+                items = items[:limit - number_of_songs]
 
-            track_info = convert_lists_to_strings(track_info)
-            track_info = filter_none_metadata(track_info)
-            song_lyrics = ""
+            text_documents, text_ids, audio_documents, ids = build_track_documents(sp, items)
+            if ids:
+                text_store.add_documents(documents=text_documents, ids=text_ids)
+                audio_store.add_documents(documents=audio_documents, ids=ids)
 
-            text_doc = Document(
-                page_content=f"{track_info['name']} by {json.loads(track_info['artists'])} from {track_info['album']}\nLyrics: {song_lyrics}",
-                metadata={"url": track_info["url"], "track_id": track_id},
-            )
-            text_documents.append(text_doc)
-            ids.append(track_id)
+            number_of_songs += len(ids)
+            offset = page_offset + len(items)
+            checkpoint = checkpoint_manager.save(user_id, offset=offset, total=total, completed=offset >= total)
+            elapsed = time.perf_counter() - started_at
+            logger.info(f"Ingested {offset}/{total} songs for user {user_id} ({number_of_songs / max(elapsed, 1e-6):.1f} tracks/sec)")
 
-            audio_data = sp.audio_features([track_id])[0]
-            audio_data = convert_lists_to_strings(audio_data)
-            audio_data = filter_none_metadata(audio_data)
-            combined_metadata = {**track_info, **audio_data, "lyrics": song_lyrics}
-
-            combined_metadata = filter_none_metadata(combined_metadata)
-
-            audio_doc = Document(
-                page_content="Audio features and analysis data",
-                metadata=combined_metadata,
-            )
-            audio_documents.append(audio_doc)
-
-        text_store.add_documents(documents=text_documents, ids=ids)
-        audio_store.add_documents(documents=audio_documents, ids=ids)
+            if limit is not None and number_of_songs >= limit:
+                break
         
-        logger.info(f"Number of songs embedded for user {user_id}: {len(text_documents)}")
-        return {"message": f"Successfully embedded {len(text_documents)} songs for user {user_id}"}
+        logger.info(f"Number of songs embedded for user {user_id}: {number_of_songs}")
+        return {
+            "message": f"Successfully embedded {number_of_songs} songs for user {user_id}",
+            "offset": checkpoint.get("offset", 0),
+            "total": checkpoint.get("total", 0),
+            "completed": checkpoint.get("completed", True),
+        }
     except HTTPException as e:
         if e.status_code == 307:
             return RedirectResponse(url="/login")
         raise e
     except SpotifyException as e:
         if e.http_status == 429:
-            return JSONResponse(status_code=429, content={"message": "Rate limit exceeded, please try again later."})
+            return JSONResponse(status_code=429, content={"message": "Rate limit exceeded, please try again later. Progress has been saved and the next run will resume."})
         else:
             return JSONResponse(status_code=500, content={"message": "An error occurred while embedding songs."})
 
@@ -101,18 +88,9 @@ async def search(query: str, k: int = Query(default=5)):
         text_store = embedding_manager.get_text_collection(user_id)
         audio_store = embedding_manager.get_audio_collection(user_id)
         text_results = text_store.similarity_search(query, k=k)
-        audio_results = []
-
-        for text_result in text_results:
-            track_id = text_result.metadata['track_id']
-            audio_result = audio_store.get([track_id])
-            if audio_result and isinstance(audio_result, list) and len(audio_result) > 0:
-                audio_metadata = audio_result[0].metadata
-                if audio_metadata:
-                    audio_metadata = convert_strings_to_lists(audio_metadata)
-                audio_results.append(audio_metadata)
-            else:
-                audio_results.append(None)
+        track_ids = [text_result.metadata['track_id'] for text_result in text_results]
+        audio_metadata = get_audio_metadata_bulk(audio_store, track_ids)
+        audio_results = [audio_metadata.get(track_id) for track_id in track_ids]
 
         combined_results = []
         for text_result, audio_result in zip(text_results, audio_results):
@@ -1,6 +1,6 @@
 import os
 import logging
-from backend import FastAPI, HTTPException, Request, Query
+from backend import FastAPI, HTTPException, Request, Query, get_audio_metadata_bulk
 from fastapi.responses import RedirectResponse, JSONResponse
 from spotipy.exceptions import SpotifyException
 from app.managers.spotify_manager import SpotifyManager
@@ -27,25 +27,16 @@ async def search(query: str, k: int = Query(default=5, description="Number of re
         # Perform similarity search in text collection
         text_results = text_store.similarity_search(query, k=k)
 
-        # Retrieve corresponding audio features and analysis based on track IDs
-        audio_results = []
-        for text_result in text_results:
-            track_id = text_result.metadata['track_id']
-            audio_result = audio_store.get([track_id])  # Retrieve audio data by track ID
-
-            # Log the audio_result for debugging purposes
-            logger.info(f"Audio result for track_id {track_id}: {audio_result}")
+        # Retrieve the audio features and analysis of all hits with a single lookup
+        track_ids = [text_result.metadata['track_id'] for text_result in text_results]
+        audio_metadata = get_audio_metadata_bulk(audio_store, track_ids)
+        logger.debug(f"Fetched audio data for {len(audio_metadata)} of {len(track_ids)} search results")
 
-            # Check if audio_result exists and is a non-empty list
-            if audio_result and isinstance(audio_result, list) and len(audio_result) > 0:
-                audio_metadata = audio_result[0].metadata
-                if audio_metadata:
-                    # Convert JSON strings back to lists in audio metadata
-                    audio_metadata = convert_strings_to_lists(audio_metadata)
-                audio_results.append(audio_metadata)
-            else:
+        audio_results = []
+        for track_id in track_ids:
+            if track_id not in audio_metadata:
                 logger.warning(f"No valid audio data found for track_id {track_id}.")
-                audio_results.append(None)
+            audio_results.append(audio_metadata.get(track_id))
 
         # Combine text and audio data for final output
         combined_results = []
@@ -0,0 +1,121 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class LRUCache():
+    """
+    Thread-safe in-memory mapping holding at most `max_entries` items; the least recently used item is dropped
+    when a new one does not fit.
+    """
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries
+        self.items = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, default=None):
+        with self.lock:
+            if key not in self.items:
+                self.misses += 1
+                return default
+            self.hits += 1
+            self.items.move_to_end(key)
+            return self.items[key]
+
+    def put(self, key, value):
+        if self.max_entries <= 0:
+            return
+        with self.lock:
+            self.items[key] = value
+            self.items.move_to_end(key)
+            while len(self.items) > self.max_entries:
+                self.items.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.items.clear()
+
+    def stats(self):
+        """
+        Returns the number of cached items and of hits and misses so far.
+        """
+        with self.lock:
+            return {"size": len(self.items), "hits": self.hits, "misses": self.misses}
+
+
+class UserResultCache():
+    """
+    LRU cache of per-user results that is invalidated user by user. Every user has a generation counter that is
+    part of the cache key; `invalidate` bumps it, so results computed before a change to the user's data are never
+    served again and simply age out of the LRU.
+    """
+    def __init__(self, max_entries=1024):
+        self.cache = LRUCache(max_entries)
+        self.generations = {}
+        self.lock = threading.Lock()
+
+    def generation(self, user_id):
+        with self.lock:
+            return self.generations.get(user_id, 0)
+
+    def get(self, user_id, key):
+        return self.cache.get((user_id, self.generation(user_id), key))
+
+    def put(self, user_id, key, value, generation=None):
+        """
+        Caches a result. Pass the `generation` read before computing the result, so a result computed while the
+        user's data changed is stored under the outdated generation and never served.
+        """
+        if generation is None:
+            generation = self.generation(user_id)
+        self.cache.put((user_id, generation, key), value)
+
+    def invalidate(self, user_id):
+        with self.lock:
+            self.generations[user_id] = self.generations.get(user_id, 0) + 1
+
+    def stats(self):
+        return self.cache.stats()
+
+
+class TTLCache():
+    """
+    Thread-safe in-memory mapping whose items expire `ttl` seconds after they were stored. At most `max_entries`
+    items are kept; the least recently used one is dropped when a new one does not fit.
+    """
+    def __init__(self, ttl, max_entries=1024):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.items = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self.lock:
+            entry = self.items.get(key)
+            if entry is None:
+                return default
+            expires_at, value = entry
+            if expires_at <= time.monotonic():
+                del self.items[key]
+                return default
+            self.items.move_to_end(key)
+            return value
+
+    def put(self, key, value):
+        with self.lock:
+            self.items[key] = (time.monotonic() + self.ttl, value)
+            self.items.move_to_end(key)
+            while len(self.items) > self.max_entries:
+                self.items.popitem(last=False)
+
+    def get_or_create(self, key, factory):
+        """
+        Returns the cached value for a key, calling `factory()` and caching its result if there is none.
+        """
+        value = self.get(key)
+        if value is None:
+            value = factory()
+            self.put(key, value)
+        return value
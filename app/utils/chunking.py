@@ -0,0 +1,59 @@
+import re
+
+# Genius section headers such as "[Chorus]" or "[Verse 2: Artist]"
+SECTION_HEADER = re.compile(r"^\s*\[[^\]]*\]\s*$")
+
+# Genius appends "123Embed" (or "Embed") to the last line of scraped lyrics
+TRAILING_EMBED = re.compile(r"\d*Embed\s*$")
+
+# The first line of Genius lyrics is the "<Title> Lyrics" page heading, sometimes run together with the first
+# section header as in "<Title> Lyrics[Verse 1]"
+PAGE_HEADING = re.compile(r"^.*Lyrics\s*(\[[^\]]*\])?\s*$")
+
+
+def split_lyrics(lyrics, max_chars=500, max_chunks=12):
+    """
+    Splits song lyrics into verse/chorus-sized chunks. Sections are delimited by blank lines or Genius section
+    headers; short consecutive sections are merged and sections longer than `max_chars` are split on line breaks.
+
+    Args:
+        lyrics (str): The song lyrics.
+        max_chars (int): Maximum size of a chunk in characters (a single longer line is kept whole).
+        max_chunks (int): Maximum number of chunks returned, so one song cannot blow up the collection.
+
+    Returns:
+        list: The lyric chunks, in song order.
+    """
+    lyrics = TRAILING_EMBED.sub("", lyrics or "")
+    lines = lyrics.splitlines()
+    if lines and PAGE_HEADING.match(lines[0]):
+        lines = lines[1:]
+
+    sections = []
+    current = []
+    for line in lines:
+        if not line.strip() or SECTION_HEADER.match(line):
+            if current:
+                sections.append(current)
+                current = []
+            continue
+        current.append(line.strip())
+    if current:
+        sections.append(current)
+
+    chunks = []
+    chunk = ""
+    for section in sections:
+        for line in section:
+            if chunk and len(chunk) + len(line) + 1 > max_chars:
+                chunks.append(chunk)
+                chunk = ""
+            chunk = f"{chunk}\n{line}" if chunk else line
+        # End a chunk at a section boundary once it has a reasonable size
+        if len(chunk) >= max_chars // 2:
+            chunks.append(chunk)
+            chunk = ""
+    if chunk:
+        chunks.append(chunk)
+
+    return chunks[:max_chunks]
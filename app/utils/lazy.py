@@ -0,0 +1,28 @@
+import functools
+import threading
+
+
+def lazy(factory):
+    """
+    Turns a zero-argument factory into a thread-safe accessor that builds its resource on the first call and
+    returns the same instance afterwards. Used to keep model loading and network clients out of import time.
+
+    Args:
+        factory (callable): Function building the resource.
+
+    Returns:
+        callable: The accessor. `accessor.loaded()` tells whether the resource has been built yet.
+    """
+    lock = threading.Lock()
+    instance = []
+
+    @functools.wraps(factory)
+    def accessor():
+        if not instance:
+            with lock:
+                if not instance:
+                    instance.append(factory())
+        return instance[0]
+
+    accessor.loaded = lambda: bool(instance)
+    return accessor
@@ -0,0 +1,156 @@
+import json
+
+# Chroma metadata values must be scalars, so list fields are stored as strings: the items joined by the ASCII unit
+# separator, prefixed with it so a one-item list is told apart from a plain string. Lists that cannot be written
+# this way (non-string items, items containing the separator) fall back to JSON, which the decoder also reads, as
+# it does the JSON strings written by earlier versions
+LIST_SEPARATOR = "\x1f"
+
+# Fields of the track metadata stored with each audio document
+TRACK_FIELDS = {
+    "id": str,
+    "name": str,
+    "album": str,
+    "artists": list,
+    "url": str,
+    "lyrics": str,
+}
+
+# Fields of the Spotify audio features merged into the same metadata
+AUDIO_FEATURE_FIELDS = {
+    "danceability": float,
+    "energy": float,
+    "key": int,
+    "loudness": float,
+    "mode": int,
+    "speechiness": float,
+    "acousticness": float,
+    "instrumentalness": float,
+    "liveness": float,
+    "valence": float,
+    "tempo": float,
+    "type": str,
+    "uri": str,
+    "track_href": str,
+    "analysis_url": str,
+    "duration_ms": int,
+    "time_signature": int,
+}
+
+# Type of every known field. Scalar fields are converted to their type when metadata is encoded, so e.g. a tempo
+# Spotify reports as an int is stored as a float like every other tempo; unknown fields are stored as they are
+METADATA_SCHEMA = {**TRACK_FIELDS, **AUDIO_FEATURE_FIELDS}
+LIST_FIELDS = frozenset(field for field, field_type in METADATA_SCHEMA.items() if field_type is list)
+
+
+def encode_list(values):
+    """
+    Encodes a list as a metadata string, see `LIST_SEPARATOR`.
+
+    Args:
+        values (list): The list to encode.
+
+    Returns:
+        str: The encoded list; an empty list is encoded as an empty string.
+    """
+    if not values:
+        return ""
+    if all(isinstance(value, str) and LIST_SEPARATOR not in value for value in values):
+        return LIST_SEPARATOR + LIST_SEPARATOR.join(values)
+    return json.dumps(list(values))
+
+
+def decode_list(value):
+    """
+    Decodes a list written by `encode_list`, or by the JSON encoding of earlier versions.
+
+    Args:
+        value (str): The stored value. Lists are returned as they are.
+
+    Returns:
+        list: The decoded list. A string in neither encoding is returned as a one-item list.
+    """
+    if isinstance(value, list):
+        return value
+    if not value:
+        return []
+    if value[0] == LIST_SEPARATOR:
+        return value[1:].split(LIST_SEPARATOR)
+    if value[0] == "[":
+        try:
+            decoded = json.loads(value)
+            if isinstance(decoded, list):
+                return decoded
+        except json.JSONDecodeError:
+            pass
+    return [value]
+
+
+def coerce_field(field, value):
+    """
+    Converts a scalar value to the type `METADATA_SCHEMA` declares for its field.
+
+    Args:
+        field (str): The field name.
+        value: The value; values of unknown or list fields are returned as they are.
+
+    Returns:
+        The converted value.
+
+    Raises:
+        ValueError: If the value cannot be converted, e.g. a non-numeric string for a numeric field.
+    """
+    field_type = METADATA_SCHEMA.get(field)
+    if field_type is None or field_type is list or type(value) is field_type:
+        return value
+    try:
+        return field_type(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"Metadata field '{field}' expects {field_type.__name__}, got {value!r}") from None
+
+
+def encode_metadata(metadata):
+    """
+    Prepares a metadata dictionary for the vector store: lists are encoded with `encode_list`, scalar fields of
+    the schema are converted to their type with `coerce_field` and None values are replaced by empty strings.
+    Nested dictionaries are encoded recursively.
+
+    Args:
+        metadata (dict): The metadata to encode.
+
+    Returns:
+        dict: A new dictionary with the encoded values.
+
+    Raises:
+        ValueError: If a field's value does not fit its type in the schema.
+    """
+    encoded = {}
+    for key, value in metadata.items():
+        if value is None:
+            encoded[key] = ""
+        elif isinstance(value, (list, tuple)):
+            encoded[key] = encode_list(value)
+        elif isinstance(value, dict):
+            encoded[key] = encode_metadata(value)
+        else:
+            encoded[key] = coerce_field(key, value)
+    return encoded
+
+
+def decode_metadata(metadata, list_fields=LIST_FIELDS):
+    """
+    Decodes metadata read from the vector store. Only the fields the schema declares as lists are decoded; every
+    other value is returned as stored, so strings such as a track named "1999" keep their type.
+
+    Args:
+        metadata (dict): The stored metadata.
+        list_fields (frozenset): Fields holding encoded lists. Defaults to the list fields of `METADATA_SCHEMA`.
+
+    Returns:
+        dict: A new dictionary with the list fields decoded.
+    """
+    decoded = dict(metadata)
+    for field in list_fields:
+        if field in decoded:
+            decoded[field] = decode_list(decoded[field])
+    return decoded
@@ -0,0 +1,100 @@
+import numpy as np
+
+
+def aggregate_chunk_scores(track_ids, scores, k, pooling="max"):
+    """
+    Aggregates chunk-level similarity scores into a ranking of tracks in a few vectorized NumPy operations.
+
+    Args:
+        track_ids (list): Track ID of each chunk hit.
+        scores (list): Similarity of each chunk hit (higher is better).
+        k (int): Number of tracks to return.
+        pooling (str): "max" scores a track by its best chunk, "sum" by the sum of its chunk scores,
+            which favours tracks matching the query in several places. Defaults to "max".
+
+    Returns:
+        list: Up to k (track_id, score, best_chunk_index) tuples, best track first, where `best_chunk_index`
+        is the position in the input of the track's highest-scoring chunk.
+    """
+    if not len(track_ids):
+        return []
+    scores = np.asarray(scores, dtype=np.float32)
+    unique_ids, groups = np.unique(np.asarray(track_ids), return_inverse=True)
+
+    if pooling == "sum":
+        track_scores = np.bincount(groups, weights=scores, minlength=len(unique_ids))
+    else:
+        track_scores = np.full(len(unique_ids), -np.inf, dtype=np.float32)
+        np.maximum.at(track_scores, groups, scores)
+
+    # Sort hits by track, then by descending score: the first hit of each track is its best chunk
+    order = np.lexsort((-scores, groups))
+    first = np.ones(len(order), dtype=bool)
+    first[1:] = groups[order][1:] != groups[order][:-1]
+    best_chunk = np.empty(len(unique_ids), dtype=np.int64)
+    best_chunk[groups[order][first]] = order[first]
+
+    top = np.argsort(-track_scores, kind="stable")[:k]
+    return [(unique_ids[i].item(), float(track_scores[i]), int(best_chunk[i])) for i in top]
+
+
+def reciprocal_rank_fusion(rankings, k=60, limit=None):
+    """
+    Merges several rankings of the same kind of items with reciprocal rank fusion: every item scores
+    sum(1 / (k + rank)) over the rankings it appears in, so items ranked well by several retrievers come first
+    without having to calibrate their scores against each other.
+
+    Args:
+        rankings (list): Lists of item keys, each ordered best first.
+        k (int): Damping constant; larger values flatten the difference between top and lower ranks. Defaults to 60.
+        limit (int): Maximum number of items returned. Defaults to all of them.
+
+    Returns:
+        list: (key, score) tuples, best first.
+    """
+    scores = {}
+    for ranking in rankings:
+        for rank, key in enumerate(ranking, start=1):
+            scores[key] = scores.get(key, 0.0) + 1.0 / (k + rank)
+    fused = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+    return fused[:limit] if limit is not None else fused
+
+
+def maximal_marginal_relevance(relevance, similarity, k, lambda_mult=0.5):
+    """
+    Selects a diverse subset of candidates with maximal marginal relevance: each step picks the candidate
+    maximizing `lambda_mult * relevance - (1 - lambda_mult) * (similarity to the closest candidate already
+    picked)`. The closest-pick similarities are kept as one vector updated with a row of the similarity matrix per
+    step, so selecting k of n candidates costs O(n * k) vectorized work and no per-pair Python loop.
+
+    Args:
+        relevance (list): Relevance of each candidate to the query (higher is better). Scores are rescaled to
+            [0, 1], so `lambda_mult` weighs them the same way whatever scale the retriever uses.
+        similarity (numpy.ndarray): Symmetric n x n matrix of pairwise candidate similarities in [0, 1].
+        k (int): Number of candidates to select.
+        lambda_mult (float): 1 ranks by relevance alone, 0 by diversity alone. Defaults to 0.5.
+
+    Returns:
+        list: Indices of the selected candidates, in selection order.
+    """
+    relevance = np.asarray(relevance, dtype=np.float32)
+    n = len(relevance)
+    k = min(k, n)
+    if k <= 0:
+        return []
+    spread = relevance.max() - relevance.min()
+    relevance = (relevance - relevance.min()) / spread if spread > 0 else np.ones(n, dtype=np.float32)
+    similarity = np.asarray(similarity, dtype=np.float32)
+
+    selected = []
+    # Similarity of each candidate to its closest pick; nothing is picked yet, so the first pick is the most relevant
+    closest = np.zeros(n, dtype=np.float32)
+    available = np.ones(n, dtype=bool)
+    for _ in range(k):
+        scores = np.where(available, lambda_mult * relevance - (1.0 - lambda_mult) * closest, -np.inf)
+        pick = int(np.argmax(scores))
+        selected.append(pick)
+        available[pick] = False
+        # Negative similarities (e.g. opposite embeddings) earn no bonus over unrelated candidates
+        np.maximum(closest, similarity[pick], out=closest)
+    return selected
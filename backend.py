@@ -1,20 +1,40 @@
 import os
 import logging
 from fastapi import FastAPI, HTTPException, Request, Query  # Corrected import
-from fastapi.responses import RedirectResponse, JSONResponse
+from fastapi.responses import RedirectResponse, JSONResponse, StreamingResponse
+from pydantic import BaseModel
+from typing import Optional
 import spotipy
 from spotipy.oauth2 import SpotifyOAuth
 from dotenv import load_dotenv
 from spotipy.exceptions import SpotifyException
 from langchain_core.documents import Document
-from langchain_chroma import Chroma
 import nest_asyncio
 import uvicorn
-import lyricsgenius
 import json
 import nest_asyncio
 import uvicorn
 import subprocess
+import threading
+import math
+import time
+
+import numpy as np
+
+from app import config
+from app.managers.checkpoint_manager import CheckpointManager
+from app.managers.feature_matrix import FEATURES, FeatureMatrixStore, mood_profile
+from app.managers.genius_manager import GeniusManager, LyricsCache
+from app.managers.job_manager import JobManager
+from app.managers.membership_manager import MembershipIndex
+from app.managers.sparse_index import SparseIndex
+from app.managers.store_registry import get_vector_store, pinned_vector_store
+from app.models.embedding import get_embedding_function
+from app.utils.cache import LRUCache, TTLCache, UserResultCache
+from app.utils.chunking import split_lyrics
+from app.utils.lazy import lazy
+from app.utils.metadata_codec import decode_metadata, encode_metadata
+from app.utils.ranking import aggregate_chunk_scores, maximal_marginal_relevance, reciprocal_rank_fusion
 
 
 import logging
@@ -33,17 +53,56 @@ logger = logging.getLogger(__name__)
 # Initialize FastAPI app
 app = FastAPI()
 
-# Spotify OAuth configuration
-sp_oauth = SpotifyOAuth(
-    client_id=os.getenv("SPOTIFY_CLIENT_ID"),
-    client_secret=os.getenv("SPOTIFY_CLIENT_SECRET"),
-    redirect_uri="http://localhost:8235/callback",
-    scope="user-top-read user-library-read playlist-read-private playlist-modify-public playlist-modify-private"
-)
+# Endpoints that block (query embedding, vector store lookups, Spotify and Genius calls) are plain functions, which
+# FastAPI runs in its threadpool; as coroutines they would hold the event loop and serve requests one at a time
 
+# Heavy resources (the embedding model, API clients, on-disk indexes) are created on first use, so importing
+# this module stays fast and free of network and model work
 
-# Initialize Genius API
-genius = lyricsgenius.Genius(os.getenv("GENIUS_API_TOKEN"))
+@lazy
+def get_sp_oauth():
+    """
+    Returns the Spotify OAuth configuration.
+    """
+    return SpotifyOAuth(
+        client_id=os.getenv("SPOTIFY_CLIENT_ID"),
+        client_secret=os.getenv("SPOTIFY_CLIENT_SECRET"),
+        redirect_uri="http://localhost:8235/callback",
+        scope="user-top-read user-library-read playlist-read-private playlist-modify-public playlist-modify-private"
+    )
+
+@lazy
+def get_genius_manager():
+    """
+    Returns the lyrics manager, which serves lyrics from a local cache first and fetches misses concurrently
+    from the Genius API.
+    """
+    import lyricsgenius
+
+    return GeniusManager(
+        lyricsgenius.Genius(os.getenv("GENIUS_API_TOKEN")),
+        LyricsCache(config.LYRICS_CACHE_PATH, not_found_ttl=config.LYRICS_NOT_FOUND_TTL),
+        max_workers=config.LYRICS_FETCH_WORKERS
+    )
+
+@lazy
+def get_checkpoint_manager():
+    """
+    Returns the store of per-user ingestion cursors used to resume interrupted ingests.
+    """
+    return CheckpointManager(config.INGEST_CHECKPOINT_DIRECTORY)
+
+# Background worker pool running ingest jobs off the event loop
+job_manager = JobManager(max_workers=config.INGEST_WORKERS)
+
+@app.on_event("startup")
+def preload_embedding_model():
+    """
+    Loads the embedding model in a background thread once the server has started, so startup is not held up by
+    the model load and the first search usually finds the model ready.
+    """
+    if config.PRELOAD_EMBEDDING_MODEL:
+        threading.Thread(target=get_embedding_function, name="preload-embedding-model", daemon=True).start()
 
 
 
@@ -57,61 +116,334 @@ def get_spotify_client():
     Raises:
         HTTPException: Redirects to Spotify login if no token is found.
     """
-    token_info = sp_oauth.get_cached_token()
+    return get_request_context().sp
+
+# Spotify clients and user profiles by access token, so repeated requests skip client setup and identity lookups
+spotify_client_cache = TTLCache(config.USER_PROFILE_TTL, max_entries=256)
+user_profile_cache = TTLCache(config.USER_PROFILE_TTL, max_entries=256)
+
+class RequestContext():
+    """
+    The Spotify client and user of a single request. The user profile is resolved at most once per request and is
+    shared between requests made with the same access token for `USER_PROFILE_TTL` seconds, so nested searches and
+    recommendations do not repeat the `current_user` round-trip.
+    """
+    def __init__(self, access_token):
+        self.access_token = access_token
+        self.sp = spotify_client_cache.get_or_create(access_token, lambda: spotipy.Spotify(auth=access_token))
+        self._user = None
+
+    @property
+    def user(self):
+        if self._user is None:
+            self._user = user_profile_cache.get_or_create(self.access_token, self.sp.current_user)
+        return self._user
+
+    @property
+    def user_id(self):
+        return self.user['id']
+
+def get_request_context():
+    """
+    Builds the context of a request from the cached Spotify token. If no valid token is cached, raises an HTTP 307
+    exception to redirect the user for authentication.
+    
+    Returns:
+        RequestContext: The request's Spotify client and lazily resolved user.
+    
+    Raises:
+        HTTPException: Redirects to Spotify login if no token is found.
+    """
+    token_info = get_sp_oauth().get_cached_token()
 
     if not token_info:
         raise HTTPException(status_code=307, detail="Redirecting to Spotify authorization", headers={"Location": "/login"})
 
-    access_token = token_info['access_token']
-    sp = spotipy.Spotify(auth=access_token)
-    return sp
+    return RequestContext(token_info['access_token'])
+
+# Name of the BGEM3FlagModel generating the embeddings (loaded lazily by get_embedding_function)
+model_name = config.EMBEDDING_MODEL_NAME
+
+# In catalog mode every track is stored once and users only hold a membership set of track IDs
+CATALOG_MODE = config.STORAGE_MODE == "catalog"
 
-from langchain_community.embeddings import HuggingFaceBgeEmbeddings 
+@lazy
+def get_membership_index():
+    """
+    Returns the per-user membership index of the shared track catalog.
+    """
+    return MembershipIndex(config.MEMBERSHIP_INDEX_PATH)
+
+@lazy
+def get_sparse_index():
+    """
+    Returns the BM25 index of lyric chunks used by hybrid search.
+    """
+    return SparseIndex(config.SPARSE_INDEX_PATH, max_document_frequency=config.SPARSE_MAX_DOCUMENT_FREQUENCY)
 
-# Initialize the BGEM3FlagModel for generating real embeddings
-model_name = "BAAI/bge-m3"
+@lazy
+def get_feature_matrix_store():
+    """
+    Returns the on-disk store of per-user audio feature matrices.
+    """
+    return FeatureMatrixStore(config.FEATURE_MATRIX_DIRECTORY)
 
-embedding_function = HuggingFaceBgeEmbeddings(model_name=model_name)
+def text_collection_name(user_id: str):
+    """
+    Returns the name of the text collection holding a user's tracks (the shared catalog's in catalog mode).
+    """
+    return "track_catalog_text_collection" if CATALOG_MODE else f"{user_id}_text_collection"
 
 def get_text_collection(user_id: str):
     """
-    Initializes a Chroma vector store for textual data using the provided user ID to create a unique collection name.
+    Returns the vector store for textual data using the provided user ID to create a unique collection name.
+    In catalog storage mode the shared track catalog's text collection is returned instead. Handles are kept open
+    in the store registry, so repeated requests for the same user reuse them.
     
     Args:
         user_id (str): The unique identifier for the user.
     
     Returns:
-        vector_store (Chroma): Chroma vector store instance for storing and querying text data.
+        vector_store (VectorStore): Vector store instance for storing and querying text data.
+    """
+    return get_vector_store(text_collection_name(user_id), config.VECTOR_STORE_BACKEND)
+
+def audio_collection_name(user_id: str):
+    """
+    Returns the name of the audio collection holding a user's tracks (the shared catalog's in catalog mode).
     """
-    collection_name = f"{user_id}_text_collection"
+    return "track_catalog_audio_collection" if CATALOG_MODE else f"{user_id}_audio_collection"
+
+def get_audio_collection(user_id: str):
+    """
+    Returns the Chroma vector store for audio data using the provided user ID to create a unique collection name.
+    In catalog storage mode the shared track catalog's audio collection is returned instead. Handles are kept open
+    in the store registry, so repeated requests for the same user reuse them.
     
-    vector_store = Chroma(
-        collection_name=collection_name,
-        embedding_function=embedding_function,
-        persist_directory="./chroma_langchain_db"
-    )
+    Args:
+        user_id (str): The unique identifier for the user.
     
-    return vector_store
+    Returns:
+        vector_store (VectorStore): Vector store instance for storing and querying audio data.
+    """
+    return get_vector_store(audio_collection_name(user_id))
 
-def get_audio_collection(user_id: str):
+# Query embeddings by normalized query text, shared by every user since they do not depend on the library
+query_embedding_cache = LRUCache(config.QUERY_EMBEDDING_CACHE_SIZE)
+
+# Search results per user, invalidated whenever an ingest changes the user's tracks
+search_result_cache = UserResultCache(config.SEARCH_RESULT_CACHE_SIZE)
+
+def normalize_query(query):
+    """
+    Normalizes a search query for use as a cache key, so queries differing only in case or spacing share entries.
+    """
+    return " ".join(query.lower().split())
+
+def embed_query(query):
+    """
+    Returns the embedding of a search query, computing it only the first time the query is seen.
+    """
+    key = normalize_query(query)
+    embedding = query_embedding_cache.get(key)
+    if embedding is None:
+        embedding = get_embedding_function().embed_query(query)
+        query_embedding_cache.put(key, embedding)
+    return embedding
+
+def embed_queries(queries):
     """
-    Initializes a Chroma vector store for audio data using the provided user ID to create a unique collection name.
+    Returns the embeddings of several search queries, computing the ones not seen before in a single batched
+    forward pass.
+    """
+    keys = [normalize_query(query) for query in queries]
+    embeddings = {}
+    missing = {}
+    for query, key in zip(queries, keys):
+        embedding = query_embedding_cache.get(key)
+        if embedding is None:
+            missing.setdefault(key, query)
+        else:
+            embeddings[key] = embedding
+    if missing:
+        for key, embedding in zip(missing, get_embedding_function().embed_queries(list(missing.values()))):
+            query_embedding_cache.put(key, embedding)
+            embeddings[key] = embedding
+    return [embeddings[key] for key in keys]
+
+def get_user_track_ids(user_id, audio_store):
+    """
+    Returns the IDs of the tracks stored for a user.
     
     Args:
         user_id (str): The unique identifier for the user.
+        audio_store (Chroma): The user's audio collection, which holds exactly one document per track.
     
     Returns:
-        vector_store (Chroma): Chroma vector store instance for storing and querying audio data.
+        set: Track IDs in the user's membership set (catalog mode) or audio collection (per-user mode).
+    """
+    if CATALOG_MODE:
+        return get_membership_index().get_track_ids(user_id)
+    return set(audio_store.get(include=[])['ids'])
+
+class SearchScope():
     """
-    collection_name = f"{user_id}_audio_collection"
+    The tracks a similarity search may return, e.g. a user's membership set in catalog mode. The set is pushed down
+    into the vector store as `where` clauses of at most `SEARCH_FILTER_MAX_IDS` track IDs each, whose hits are
+    merged, so no query exceeds SQLite's limit on bound parameters. A larger set covering at least
+    `SEARCH_POSTFILTER_MIN_SHARE` of the collection's tracks is not pushed down: the collection is searched
+    unfiltered, 1 / share times deeper, and the hits of other tracks are dropped.
     
-    vector_store = Chroma(
-        collection_name=collection_name,
-        embedding_function=embedding_function,
-        persist_directory="./chroma_langchain_db"
-    )
+    Args:
+        track_ids (iterable): IDs of the tracks in scope.
+        collection_size (int): Number of tracks in the searched collection.
+    """
+    def __init__(self, track_ids, collection_size):
+        self.track_ids = frozenset(track_ids)
+        share = len(self.track_ids) / collection_size if collection_size else 1.0
+        self.postfilter = len(self.track_ids) > config.SEARCH_FILTER_MAX_IDS and share >= config.SEARCH_POSTFILTER_MIN_SHARE
+        self.overfetch = 1.0 / share if self.postfilter else 1.0
+        ordered = [] if self.postfilter else sorted(self.track_ids)
+        self.filters = [
+            {"track_id": {"$in": ordered[start:start + config.SEARCH_FILTER_MAX_IDS]}}
+            for start in range(0, len(ordered), config.SEARCH_FILTER_MAX_IDS)
+        ]
+
+    def search(self, text_store, embeddings, k):
+        """
+        Returns the k nearest chunks of the scope's tracks for each query embedding, as (document, distance) tuples
+        best first. Fewer are returned only if the scope's tracks have no more chunks.
+        """
+        if not self.postfilter:
+            hits = [[] for _ in embeddings]
+            for search_filter in self.filters:
+                found = text_store.similarity_search_by_vectors_with_relevance_scores(embeddings, k=k, filter=search_filter)
+                for query_hits, filter_hits in zip(hits, found):
+                    query_hits.extend(filter_hits)
+            if len(self.filters) > 1:
+                hits = [sorted(query_hits, key=lambda hit: hit[1])[:k] for query_hits in hits]
+            return hits
+
+        fetch_k = math.ceil(k * self.overfetch)
+        while True:
+            found = text_store.similarity_search_by_vectors_with_relevance_scores(embeddings, k=fetch_k)
+            hits = [
+                [hit for hit in query_hits if hit[0].metadata['track_id'] in self.track_ids][:k]
+                for query_hits in found
+            ]
+            # Fetch deeper until every query has k hits in scope or has seen every chunk of the collection
+            if all(len(query_hits) == k or len(all_hits) < fetch_k for query_hits, all_hits in zip(hits, found)):
+                return hits
+            fetch_k *= 2
+
+def get_search_scope(user_id, audio_store):
+    """
+    Returns the scope restricting a similarity search to the user's tracks. In catalog mode the scope is built from
+    the user's membership set once and cached until an ingest changes the user's tracks.
+    
+    Args:
+        user_id (str): The unique identifier for the user.
+        audio_store (VectorStore): The user's audio collection, which holds exactly one document per track.
+    
+    Returns:
+        SearchScope: The scope, or None in per-user mode where the collections only hold the user's tracks.
+    """
+    if not CATALOG_MODE:
+        return None
+    generation = search_result_cache.generation(user_id)
+    scope = search_result_cache.get(user_id, "search_scope")
+    if scope is None:
+        scope = SearchScope(get_membership_index().get_track_ids(user_id), audio_store.count())
+        search_result_cache.put(user_id, "search_scope", scope, generation=generation)
+    return scope
+
+def parse_feature_ranges(ranges):
+    """
+    Parses audio feature range filters such as "energy:0.6:1,tempo:100:130". Either bound may be left empty
+    ("tempo:120:" means at least 120 BPM). Values use Spotify's raw scale for each feature.
+    
+    Args:
+        ranges (str): Comma separated `feature:min:max` filters.
+    
+    Returns:
+        dict: Mapping of feature name to its (min, max) bounds, None for an open bound.
+    
+    Raises:
+        ValueError: If a filter is malformed, names an unknown feature or has a minimum above its maximum.
+    """
+    feature_ranges = {}
+    for part in filter(None, (part.strip() for part in ranges.split(","))):
+        fields = part.split(":")
+        if len(fields) != 3:
+            raise ValueError(f"Invalid range filter '{part}', expected feature:min:max")
+        feature, low, high = (field.strip() for field in fields)
+        if feature not in FEATURES:
+            raise ValueError(f"Unknown audio feature '{feature}', expected one of {', '.join(FEATURES)}")
+        low, high = (float(low) if low else None, float(high) if high else None)
+        if low is not None and high is not None and low > high:
+            raise ValueError(f"Invalid range filter '{part}', the minimum is above the maximum")
+        feature_ranges[feature] = (low, high)
+    return feature_ranges
+
+def get_feature_filter_ids(audio_store, feature_ranges):
+    """
+    Returns the IDs of the tracks whose audio features fall within every range, evaluated by the audio
+    collection's own metadata index rather than by fetching and filtering documents.
+    
+    Args:
+        audio_store (Chroma): The user's audio collection.
+        feature_ranges (dict): Mapping of feature name to (min, max) bounds, as returned by `parse_feature_ranges`.
+    
+    Returns:
+        set: IDs of the eligible tracks, or None if no range has a bound.
+    """
+    clauses = []
+    for feature, (low, high) in sorted(feature_ranges.items()):
+        if low is not None:
+            clauses.append({feature: {"$gte": low}})
+        if high is not None:
+            clauses.append({feature: {"$lte": high}})
+    if not clauses:
+        return None
+    where = clauses[0] if len(clauses) == 1 else {"$and": clauses}
+    return set(audio_store.get(where=where, include=[])['ids'])
+
+def remove_user_tracks(user_id, track_ids, text_store, audio_store):
+    """
+    Removes tracks from a user's library. In catalog mode only the membership is dropped, since other users may
+    still have the tracks; in per-user mode the documents are deleted from both collections.
+    """
+    search_result_cache.invalidate(user_id)
+    update_feature_matrix(user_id, [], removed_ids=track_ids)
+    if CATALOG_MODE:
+        get_membership_index().remove_many(user_id, track_ids)
+    else:
+        # A track has several lyric chunks in the text collection, all tagged with its track ID
+        text_store.delete(where={"track_id": {"$in": track_ids}})
+        audio_store.delete(ids=track_ids)
+        get_sparse_index().remove_tracks(text_collection_name(user_id), track_ids)
+
+# Spotify accepts at most 100 track IDs per audio-features request
+AUDIO_FEATURES_BATCH_SIZE = 100
+
+def get_audio_features_bulk(sp, track_ids):
+    """
+    Retrieves audio features for many Spotify track IDs using as few requests as possible.
+    
+    Args:
+        sp (Spotify): Spotify client instance.
+        track_ids (list): Spotify track IDs.
     
-    return vector_store
+    Returns:
+        dict: Mapping of track ID to its audio features (None if Spotify has no features for the track).
+    """
+    audio_features = {}
+    for start in range(0, len(track_ids), AUDIO_FEATURES_BATCH_SIZE):
+        batch = track_ids[start:start + AUDIO_FEATURES_BATCH_SIZE]
+        # Spotify returns features in request order, with None for unknown tracks
+        for track_id, features in zip(batch, sp.audio_features(batch) or []):
+            audio_features[track_id] = features
+    return audio_features
 
 def get_audio_features_and_analysis(sp, track_id):
     """
@@ -131,6 +463,27 @@ def get_audio_features_and_analysis(sp, track_id):
         "audio_analysis": audio_analysis
     }
 
+def get_audio_features_and_analysis_bulk(sp, track_ids):
+    """
+    Retrieves audio features and analysis for many Spotify track IDs. Audio features are fetched in batches of
+    up to 100 tracks; Spotify has no bulk audio-analysis endpoint, so the analysis is still fetched per track.
+    
+    Args:
+        sp (Spotify): Spotify client instance.
+        track_ids (list): Spotify track IDs.
+    
+    Returns:
+        dict: Mapping of track ID to a dictionary containing audio features and audio analysis data.
+    """
+    audio_features = get_audio_features_bulk(sp, track_ids)
+    return {
+        track_id: {
+            "audio_features": audio_features.get(track_id),
+            "audio_analysis": sp.audio_analysis(track_id)
+        }
+        for track_id in track_ids
+    }
+
 
 def filter_none_metadata(metadata):
     """
@@ -141,9 +494,9 @@ def filter_none_metadata(metadata):
     return metadata
 
 @app.get("/lyrics")
-async def lyrics(artist: str, title: str):
+def lyrics(artist: str, title: str):
     """
-    Fetches song lyrics for the given artist and title using the Genius API.
+    Fetches song lyrics for the given artist and title, from the local lyrics cache if possible and otherwise using the Genius API.
     
     Args:
         artist (str): Name of the artist.
@@ -156,59 +509,34 @@ async def lyrics(artist: str, title: str):
         HTTPException: If the lyrics are not found or another error occurs.
     """
     try:
-        song = genius.search_song(title, artist)
-        if song:
-            return {"lyrics": song.lyrics}
+        song_lyrics = get_genius_manager().get_lyrics(artist, title)
+        if song_lyrics:
+            return {"lyrics": song_lyrics}
         else:
             raise HTTPException(status_code=404, detail="Lyrics not found")
     except HTTPException as e:
         raise e
     
 
-def convert_lists_to_strings(metadata):
-    """
-    Converts lists in the metadata to JSON strings before storing them in ChromaDB. Also converts None values to empty strings.
-    
-    Args:
-        metadata (dict): Metadata dictionary where lists need to be converted to strings.
-    
-    Returns:
-        dict: Modified metadata dictionary with lists converted to strings.
-    """
-    new_metadata = {}
-    for key, value in metadata.items():
-        if value is None:
-            new_metadata[key] = ""  # Convert None to empty string
-        elif isinstance(value, list):
-            new_metadata[key] = json.dumps(value)
-        elif isinstance(value, dict):
-            new_metadata[key] = convert_lists_to_strings(value)  # Recursively handle nested dictionaries
-        else:
-            new_metadata[key] = value
-    return new_metadata
-
-
-
-    
-def convert_strings_to_lists(metadata):
+def get_audio_metadata_bulk(audio_store, track_ids):
     """
-    Converts JSON strings in the metadata back to lists after retrieving them from ChromaDB.
+    Fetches and decodes the audio metadata of many tracks with a single lookup in the audio collection.
     
     Args:
-        metadata (dict): Metadata dictionary where strings need to be converted back to lists.
+        audio_store (Chroma): The user's audio collection.
+        track_ids (list): Track IDs to look up; duplicates are fetched once.
     
     Returns:
-        dict: Modified metadata dictionary with strings converted back to lists.
+        dict: Mapping of track ID to its decoded audio metadata, for every track found in the collection.
     """
-    new_metadata = {}
-    for key, value in metadata.items():
-        try:
-            # Try to convert the string back to a list
-            new_metadata[key] = json.loads(value) if isinstance(value, str) else value
-        except json.JSONDecodeError:
-            # If it's not a valid JSON string, keep the value as is
-            new_metadata[key] = value
-    return new_metadata
+    unique_ids = list(dict.fromkeys(track_ids))
+    if not unique_ids:
+        return {}
+    stored = audio_store.get(ids=unique_ids, include=["metadatas"])
+    return {
+        track_id: decode_metadata(metadata) if metadata else metadata
+        for track_id, metadata in zip(stored['ids'], stored['metadatas'])
+    }
 
 @app.get("/")
 async def read_root():
@@ -228,12 +556,12 @@ async def login():
     Returns:
         RedirectResponse: Redirects to the Spotify authorization URL.
     """
-    auth_url = sp_oauth.get_authorize_url()
+    auth_url = get_sp_oauth().get_authorize_url()
     logger.info(f"Redirecting to Spotify's authorization URL: {auth_url}")
     return RedirectResponse(auth_url)
 
 @app.get("/callback")
-async def callback(request: Request):
+def callback(request: Request):
     """
     Handles the callback from Spotify after user authentication. Exchanges the authorization code for an access token.
     
@@ -250,7 +578,7 @@ async def callback(request: Request):
     if not code:
         raise HTTPException(status_code=400, detail="Missing authorization code")
 
-    token_info = sp_oauth.get_access_token(code)
+    token_info = get_sp_oauth().get_access_token(code)
 
     if token_info:
         logger.info("Access token obtained successfully!")
@@ -260,174 +588,391 @@ async def callback(request: Request):
 
 
 
-@app.get("/search")
-async def search(query: str, k: int = Query(default=5, description="Number of results to fetch")):
-    try:
-        sp = get_spotify_client()
-        user_id = sp.current_user()['id']  # Get the current user's ID
-
-        # Get text collection for this user
-        text_store = get_text_collection(user_id)
-        audio_store = get_audio_collection(user_id)
-
-        # Perform similarity search in text collection
-        text_results = text_store.similarity_search(query, k=k)
-
-        # Retrieve corresponding audio features and analysis based on track IDs
-        audio_results = []
-        for text_result in text_results:
-            track_id = text_result.metadata['track_id']
-            audio_result = audio_store.get([track_id])  # Retrieve audio data by track ID
-
-            # Log the audio_result for debugging purposes
-            logger.info(f"Audio result for track_id {track_id}: {audio_result}")
-
-            # Check if audio_result exists and is a non-empty list
-            if audio_result and isinstance(audio_result, list) and len(audio_result) > 0:
-                audio_metadata = audio_result[0].metadata
-                if audio_metadata:
-                    # Convert JSON strings back to lists in audio metadata
-                    audio_metadata = convert_strings_to_lists(audio_metadata)
-                audio_results.append(audio_metadata)
-            else:
-                logger.warning(f"No valid audio data found for track_id {track_id}.")
-                audio_results.append(None)
-
-        # Combine text and audio data for final output
-        combined_results = []
-        for text_result, audio_result in zip(text_results, audio_results):
-            combined_results.append({
-                "text": text_result.page_content,
-                "metadata": text_result.metadata,
-                "audio": audio_result
-            })
-            # print(f"---------------------------Combined Result: {combined_results}")
-        
-        # response_text = format_response(combined_results)
-        # return {"results": response_text}
-        return {"results": combined_results}
+def search_tracks(text_store, query, k, search_scope=None, pooling="max"):
+    """
+    Searches the text collection for lyric chunks matching a query and aggregates the chunk hits into a ranking
+    of tracks. Chunk hits are fetched as described in `fetch_chunk_hits`.
     
-    except HTTPException as e:
-        if e.status_code == 307:
-            return RedirectResponse(url="/login")
-        raise e
-    except SpotifyException as e:
-        if e.http_status == 429:
-            return JSONResponse(status_code=429, content={"message": "Rate limit exceeded, please try again later."})
-        else:
-            return JSONResponse(status_code=500, content={"message": "An error occurred during the search process."})
-
+    Args:
+        text_store (VectorStore): The user's text collection.
+        query (str): The search query.
+        k (int): Number of tracks to return.
+        search_scope (SearchScope): Optional set of tracks the search is restricted to.
+        pooling (str): How chunk scores are combined per track, "max" or "sum". Defaults to "max".
+    
+    Returns:
+        list: Up to k (document, score) tuples, one per track, where `document` is the track's best-matching chunk.
+    """
+    hits = fetch_chunk_hits(text_store, [embed_query(query)], [k], search_scope=search_scope)[0]
+    return rank_chunk_hits(hits, k, pooling=pooling)
 
-@app.get("/store_embeddings")
-async def store_embeddings(limit: int = Query(default=50, description="Number of liked songs to fetch")):
+def search_tracks_batch(text_store, queries, search_scope=None, pooling="max"):
     """
-    Fetches a specified number of liked songs from the current user's Spotify account, processes their data (including lyrics and audio features),
-    and stores the processed data into vector stores for text and audio data using ChromaDB.
+    Searches the text collection for several queries at once: the queries are embedded in one batched forward pass
+    and looked up in the vector store with a single call, instead of one model pass and one lookup per query.
     
     Args:
-        limit (int): Number of liked songs to fetch. Defaults to 50.
+        text_store (VectorStore): The user's text collection.
+        queries (list): (query, k) tuples.
+        search_scope (SearchScope): Optional set of tracks every search is restricted to.
+        pooling (str): How chunk scores are combined per track, "max" or "sum". Defaults to "max".
     
     Returns:
-        dict: A message indicating the number of songs successfully embedded.
+        list: One ranking per query, in the same order, as returned by `search_tracks`.
+    """
+    if not queries:
+        return []
+    ks = [k for _, k in queries]
+    hits = fetch_chunk_hits(text_store, embed_queries([query for query, _ in queries]), ks, search_scope=search_scope)
+    return [rank_chunk_hits(query_hits, k, pooling=pooling) for query_hits, k in zip(hits, ks)]
+
+def fetch_chunk_hits(text_store, embeddings, ks, search_scope=None):
+    """
+    Fetches the chunk hits of several query embeddings, deep enough for each query to cover k distinct tracks.
+    A query first fetches `SEARCH_CHUNK_OVERFETCH` chunks per requested track, at most `SEARCH_MAX_CHUNK_CANDIDATES`,
+    which usually covers k tracks. When the hits of songs with many chunks cover fewer, the query is searched again
+    with twice as many chunks, until k tracks are covered, the store has no more matching chunks, or
+    k * MAX_LYRIC_CHUNKS chunks were fetched, which always cover k tracks. A restricted search fetches its chunks as
+    described in `SearchScope`.
     
-    Raises:
-        HTTPException: Redirects to Spotify login if authentication is needed or if lyrics are not found.
-        SpotifyException: Handles Spotify-specific exceptions, including rate limits.
+    Args:
+        text_store (VectorStore): The user's text collection.
+        embeddings (list): The query embeddings.
+        ks (list): Number of tracks wanted for each query.
+        search_scope (SearchScope): Optional set of tracks every search is restricted to.
+    
+    Returns:
+        list: The (document, distance) chunk hits of each query, in the same order, best first.
     """
-    try:
-        sp = get_spotify_client()
-                
-        # Get the current user's ID as early as possible
-        user_id = sp.current_user()['id']  # Get the current user's ID
-
-        # Get the text collection
-        text_store = get_text_collection(user_id)
-                        
-        # Get the current number of songs in the collection
-        curr_number_of_songs = text_store._collection.count()
-        
-        # Determine the offset for the Spotify API request
-        if curr_number_of_songs >= limit:
-            offset = curr_number_of_songs + limit
+    fetch_ks = [max(k, min(k * config.SEARCH_CHUNK_OVERFETCH, config.SEARCH_MAX_CHUNK_CANDIDATES)) for k in ks]
+    hits = [[] for _ in ks]
+    pending = [i for i, k in enumerate(ks) if k > 0]
+    while pending:
+        pending_embeddings = [embeddings[i] for i in pending]
+        fetch_k = max(fetch_ks[i] for i in pending)
+        if search_scope is None:
+            found = text_store.similarity_search_by_vectors_with_relevance_scores(pending_embeddings, k=fetch_k)
         else:
-            offset = 0
+            found = search_scope.search(text_store, pending_embeddings, fetch_k)
+        deeper = []
+        for i, query_hits in zip(pending, found):
+            # Every query was fetched as deep as the deepest one; keep what it would have fetched on its own
+            hits[i] = query_hits[:fetch_ks[i]]
+            max_fetch_k = ks[i] * config.MAX_LYRIC_CHUNKS
+            exhausted = len(query_hits) < fetch_ks[i]
+            if not exhausted and fetch_ks[i] < max_fetch_k and len({document.metadata['track_id'] for document, _ in hits[i]}) < ks[i]:
+                fetch_ks[i] = min(fetch_ks[i] * 2, max_fetch_k)
+                deeper.append(i)
+        pending = deeper
+    return hits
+
+def rank_chunk_hits(hits, k, pooling="max"):
+    """
+    Aggregates the (document, distance) chunk hits of a query into a ranking of at most k tracks.
+    """
+    if not hits:
+        return []
 
-        liked_songs = sp.current_user_saved_tracks(limit=limit, offset=offset)
-        
-        user_id = sp.current_user()['id']  # Get the current user's ID
-
-        # Get or create vector stores for text and audio data
-        text_store = get_text_collection(user_id)
-        audio_store = get_audio_collection(user_id)
-
-        text_documents = []
-        audio_documents = []
-        ids = []
-
-        for item in liked_songs['items']:
-            track = item['track']
-            track_id = track['id']
-            track_info = {
-                "id": track_id,
-                "name": track['name'],
-                "album": track['album']['name'],
-                "artists": [artist['name'] for artist in track['artists']],
-                "url": track['external_urls']['spotify']
-            }
-
-            # Convert lists to JSON strings in track_info
-            track_info = convert_lists_to_strings(track_info)
-
-            # Handle potential None values in track_info
-            track_info = filter_none_metadata(track_info)
-
-            song_lyrics = ""
-            artist_name = json.loads(track_info["artists"])[0]  # Get the first artist's name
-            try: 
-                song = genius.search_song(track_info["name"], artist_name)
-            except HTTPException as e:
-                e.__traceback__()
-
-            # if song:
-            #     song_lyrics = song.lyrics or ""
-
-            # Create the document for the text collection
-            text_doc = Document(
-                page_content=f"{track_info['name']} by {json.loads(track_info['artists'])} from {track_info['album']}\nLyrics: {song_lyrics}",
-                metadata={"url": track_info["url"], "track_id": track_id},
-            )
-            text_documents.append(text_doc)
-            ids.append(track_id)  # Use track ID as the document ID for both collections
+    # Chroma returns squared L2 distances; on normalized embeddings the cosine similarity is 1 - d / 2
+    track_ids = [document.metadata['track_id'] for document, _ in hits]
+    scores = [1.0 - distance / 2.0 for _, distance in hits]
+    ranked = aggregate_chunk_scores(track_ids, scores, k, pooling=pooling)
+    return [(hits[best_chunk][0], score) for _, score, best_chunk in ranked]
 
-            # Get audio features and analysis
-            audio_data = sp.audio_features([track_id])[0]  # Fetching audio features for the track
-            
-            # Convert lists to JSON strings in audio_data
-            audio_data = convert_lists_to_strings(audio_data)
 
-            # Handle potential None values in audio_data
-            audio_data = filter_none_metadata(audio_data)
+def backfill_sparse_index(scope, text_store):
+    """
+    Indexes every chunk of a text collection in the BM25 index. Collections ingested before hybrid search existed
+    are backfilled this way on their first hybrid search; later ingests keep the index up to date incrementally.
+    """
+    stored = text_store.get(include=["documents", "metadatas"])
+    documents = [
+        Document(page_content=content, metadata=metadata)
+        for content, metadata in zip(stored['documents'], stored['metadatas'])
+        if metadata and metadata.get('track_id')
+    ]
+    get_sparse_index().add_documents(scope, documents)
+    logger.info(f"Backfilled the BM25 index of {scope} with {len(documents)} chunks")
+
+def hybrid_candidates(k):
+    """
+    Returns the number of tracks each side of a hybrid search ranks before the rankings are fused.
+    """
+    return max(k, min(k * config.SEARCH_CHUNK_OVERFETCH, config.SEARCH_MAX_CHUNK_CANDIDATES))
 
-            # Combine the track_info and audio features into a single metadata dictionary
-            combined_metadata = {**track_info, **audio_data, "lyrics": song_lyrics}
+def hybrid_search_tracks(text_store, scope, query, k, search_scope=None, pooling="max", dense_results=None):
+    """
+    Searches the text collection with both the dense embeddings and the BM25 index and merges the two track
+    rankings with reciprocal rank fusion, so exact titles and rare lyric phrases are found as well as mood queries.
+    
+    Args:
+        text_store (VectorStore): The user's text collection.
+        scope (str): Name of the text collection, which scopes the BM25 index.
+        query (str): The search query.
+        k (int): Number of tracks to return.
+        search_scope (SearchScope): Optional set of tracks the search is restricted to, e.g. the user's tracks.
+        pooling (str): How dense chunk scores are combined per track, "max" or "sum". Defaults to "max".
+        dense_results (list): The dense ranking of `hybrid_candidates(k)` tracks, if already computed (e.g. for a
+            batch of queries); searched here otherwise.
+    
+    Returns:
+        list: Up to k (document, score) tuples, one per track, where `document` is the track's best-matching
+        chunk and `score` its fused score.
+    """
+    candidates = hybrid_candidates(k)
+    if dense_results is None:
+        dense_results = search_tracks(text_store, query, candidates, search_scope=search_scope, pooling=pooling)
+
+    sparse_index = get_sparse_index()
+    if sparse_index.count(scope) == 0:
+        backfill_sparse_index(scope, text_store)
+    allowed_ids = search_scope.track_ids if search_scope is not None else None
+    # In catalog mode the BM25 index covers the whole catalog, so fetch more chunks before keeping the user's
+    sparse_limit = candidates * (config.SEARCH_CHUNK_OVERFETCH if allowed_ids is not None else 1)
+
+    # Chunks come best first, so the first chunk seen of a track is its best one
+    sparse_documents = {}
+    for content, metadata, _ in sparse_index.search(scope, query, limit=sparse_limit):
+        track_id = metadata['track_id']
+        if track_id in sparse_documents or (allowed_ids is not None and track_id not in allowed_ids):
+            continue
+        sparse_documents[track_id] = Document(page_content=content, metadata=metadata)
+
+    dense_documents = {document.metadata['track_id']: document for document, _ in dense_results}
+    fused = reciprocal_rank_fusion([list(dense_documents), list(sparse_documents)], k=config.RRF_K, limit=k)
+    return [
+        (dense_documents.get(track_id) or sparse_documents[track_id], score)
+        for track_id, score in fused
+    ]
+
+def search_user_tracks(user_id, query, k, pooling="max", mode="dense", feature_ranges=None):
+    """
+    Searches a user's tracks and joins the hits to their audio data. Results are cached per user until the next
+    ingest changes the user's tracks, so repeated and nested searches for the same query are served from memory.
+    
+    Args:
+        user_id (str): The unique identifier for the user.
+        query (str): The search query.
+        k (int): Number of tracks to return.
+        pooling (str): How chunk scores are combined per track, "max" or "sum". Defaults to "max".
+        mode (str): "dense" for embedding search only, "hybrid" to fuse it with BM25 keyword search.
+            Defaults to "dense".
+        feature_ranges (dict): Optional audio feature bounds, as returned by `parse_feature_ranges`; only tracks
+            within every range are searched.
+    
+    Returns:
+        list: Up to k results with the best-matching text, its metadata, the score and the track's audio data.
+        The list is shared with the cache and must not be modified.
+    """
+    return search_user_tracks_batch(user_id, [(query, k)], pooling=pooling, mode=mode, feature_ranges=feature_ranges)[0]
 
-            # Handle potential None values in combined_metadata
-            combined_metadata = filter_none_metadata(combined_metadata)
+def search_user_tracks_batch(user_id, queries, pooling="max", mode="dense", feature_ranges=None):
+    """
+    Runs several searches of a user's tracks together. Queries missing from the result cache are embedded in one
+    batched forward pass, looked up in the vector store with a single call, and joined to the audio data of all
+    their hits with a single lookup.
+    
+    Args:
+        user_id (str): The unique identifier for the user.
+        queries (list): (query, k) tuples.
+        pooling (str): How chunk scores are combined per track, "max" or "sum". Defaults to "max".
+        mode (str): "dense" or "hybrid", as for `search_user_tracks`. Defaults to "dense".
+        feature_ranges (dict): Optional audio feature bounds applied to every query.
+    
+    Returns:
+        list: One result list per query, in the same order, as returned by `search_user_tracks`.
+    """
+    cache_keys = [search_cache_key(query, k, pooling, mode, feature_ranges) for query, k in queries]
+    generation = search_result_cache.generation(user_id)
+    cached_results = [search_result_cache.get(user_id, cache_key) for cache_key in cache_keys]
+
+    # Queries repeated within the batch are searched once
+    pending = {}
+    for (query, k), cache_key, cached in zip(queries, cache_keys, cached_results):
+        if cached is None:
+            pending.setdefault(cache_key, (query, k))
+    if not pending:
+        return cached_results
+
+    audio_store, rankings = rank_user_tracks(user_id, list(pending.values()), pooling, mode, feature_ranges)
+    if rankings is None:
+        return [cached if cached is not None else [] for cached in cached_results]
+
+    # Retrieve the audio features and analysis of the hits of every query with a single lookup
+    track_ids = [text_result.metadata['track_id'] for ranked_results in rankings for text_result, _ in ranked_results]
+    audio_metadata = get_audio_metadata_bulk(audio_store, track_ids)
+    logger.debug(f"Fetched audio data for {len(audio_metadata)} of {len(set(track_ids))} search results")
+
+    searched = {}
+    for cache_key, ranked_results in zip(pending, rankings):
+        combined_results = combine_search_results(ranked_results, audio_metadata)
+        search_result_cache.put(user_id, cache_key, combined_results, generation=generation)
+        searched[cache_key] = combined_results
+
+    return [
+        cached if cached is not None else searched[cache_key]
+        for cache_key, cached in zip(cache_keys, cached_results)
+    ]
+
+def iter_user_search_results(user_id, query, k, pooling="max", mode="dense", feature_ranges=None):
+    """
+    Yields the results of `search_user_tracks` one at a time, as soon as each one is joined to its audio data.
+    The hits are joined in batches of 1, 2, 4, ... tracks, so the first result waits for a single lookup
+    whatever k is, while the whole list still takes only a few. The complete list is cached like any search.
+    
+    Args:
+        user_id (str): The unique identifier for the user.
+        query (str): The search query.
+        k (int): Number of tracks to return.
+        pooling (str): How chunk scores are combined per track, "max" or "sum". Defaults to "max".
+        mode (str): "dense" or "hybrid". Defaults to "dense".
+        feature_ranges (dict): Optional audio feature bounds.
+    
+    Yields:
+        dict: One result, as in the list returned by `search_user_tracks`.
+    """
+    cache_key = search_cache_key(query, k, pooling, mode, feature_ranges)
+    generation = search_result_cache.generation(user_id)
+    cached_results = search_result_cache.get(user_id, cache_key)
+    if cached_results is not None:
+        yield from cached_results
+        return
+
+    audio_store, rankings = rank_user_tracks(user_id, [(query, k)], pooling, mode, feature_ranges)
+    if rankings is None:
+        return
+    ranked_results = rankings[0]
+
+    combined_results = []
+    start, size = 0, 1
+    while start < len(ranked_results):
+        batch = ranked_results[start:start + size]
+        audio_metadata = get_audio_metadata_bulk(audio_store, [text_result.metadata['track_id'] for text_result, _ in batch])
+        for result in combine_search_results(batch, audio_metadata):
+            combined_results.append(result)
+            yield result
+        start, size = start + size, size * 2
+    search_result_cache.put(user_id, cache_key, combined_results, generation=generation)
+
+def search_cache_key(query, k, pooling, mode, feature_ranges):
+    """
+    Returns the key of a search in the per-user result cache.
+    """
+    return (normalize_query(query), k, pooling, mode, tuple(sorted((feature_ranges or {}).items())))
 
-            # Create the document for the audio collection
-            audio_doc = Document(
-                page_content="Audio features and analysis data",
-                metadata=combined_metadata,
+def rank_user_tracks(user_id, queries, pooling="max", mode="dense", feature_ranges=None):
+    """
+    Ranks a user's tracks for several queries, without joining them to their audio data.
+    
+    Args:
+        user_id (str): The unique identifier for the user.
+        queries (list): (query, k) tuples.
+        pooling (str): How chunk scores are combined per track, "max" or "sum". Defaults to "max".
+        mode (str): "dense" or "hybrid". Defaults to "dense".
+        feature_ranges (dict): Optional audio feature bounds applied to every query.
+    
+    Returns:
+        tuple: The user's audio collection and one list of (document, score) tuples per query, or None instead
+        of the lists when no track can match (e.g. no track is within the feature ranges).
+    """
+    # Get text collection for this user
+    text_store = get_text_collection(user_id)
+    audio_store = get_audio_collection(user_id)
+
+    # Perform similarity search in text collection
+    # In catalog mode the search is restricted to the user's membership set
+    search_scope = get_search_scope(user_id, audio_store)
+
+    # Push audio feature ranges down into the query as a set of eligible track IDs, so the vector store only
+    # scores eligible chunks and still returns k tracks
+    eligible_ids = get_feature_filter_ids(audio_store, feature_ranges) if feature_ranges else None
+    if eligible_ids is not None:
+        if search_scope is not None:
+            eligible_ids &= search_scope.track_ids
+        search_scope = SearchScope(eligible_ids, audio_store.count())
+
+    if search_scope is not None and not search_scope.track_ids:
+        return audio_store, None
+    # Lyric chunks are ranked individually and aggregated back to one result per track
+    if mode == "hybrid":
+        dense_rankings = search_tracks_batch(
+            text_store, [(query, hybrid_candidates(k)) for query, k in queries],
+            search_scope=search_scope, pooling=pooling
+        )
+        rankings = [
+            hybrid_search_tracks(
+                text_store, text_collection_name(user_id), query, k, search_scope=search_scope, pooling=pooling,
+                dense_results=dense_results
             )
-            audio_documents.append(audio_doc)
+            for (query, k), dense_results in zip(queries, dense_rankings)
+        ]
+    else:
+        rankings = search_tracks_batch(text_store, queries, search_scope=search_scope, pooling=pooling)
+    return audio_store, rankings
 
-        # Store the documents in the respective vector stores
-        text_store.add_documents(documents=text_documents, ids=ids)
-        audio_store.add_documents(documents=audio_documents, ids=ids)
-        
-        logger.info(f"Number of songs embedded for user {user_id}: {len(text_documents)}")
+def combine_search_results(ranked_results, audio_metadata):
+    """
+    Combines ranked text hits with their tracks' audio data into the results returned by the search endpoints.
+    
+    Args:
+        ranked_results (list): (document, score) tuples.
+        audio_metadata (dict): Mapping of track ID to decoded audio metadata, as returned by
+            `get_audio_metadata_bulk`.
+    
+    Returns:
+        list: One result per hit with the best-matching text, its metadata, the score and the audio data.
+    """
+    combined_results = []
+    for text_result, score in ranked_results:
+        track_id = text_result.metadata['track_id']
+        if track_id not in audio_metadata:
+            logger.warning(f"No valid audio data found for track_id {track_id}.")
+        combined_results.append({
+            "text": text_result.page_content,  # The track's best-matching lyric chunk
+            "metadata": text_result.metadata,
+            "score": score,
+            "audio": audio_metadata.get(track_id)
+        })
+    return combined_results
+
+def ndjson_stream(events, error_message):
+    """
+    Serializes events as newline-delimited JSON, one object per line. The response status is sent before the
+    first event, so a Spotify error raised while streaming is reported as a final "error" event instead.
+    
+    Args:
+        events (iterable): Dicts with a "type" key.
+        error_message (str): Message of the error event for Spotify errors other than rate limiting.
+    
+    Yields:
+        str: One JSON line per event.
+    """
+    try:
+        for event in events:
+            yield json.dumps(event) + "\n"
+    except SpotifyException as e:
+        logger.error(f"Spotify error while streaming a response: {e}")
+        if e.http_status == 429:
+            yield json.dumps({"type": "error", "status": 429, "message": "Rate limit exceeded, please try again later."}) + "\n"
+        else:
+            yield json.dumps({"type": "error", "status": 500, "message": error_message}) + "\n"
+
+
+@app.get("/search")
+def search(query: str, k: int = Query(default=5, description="Number of results to fetch"),
+           pooling: str = Query(default="max", pattern="^(max|sum)$", description="How lyric chunk scores are combined per track"),
+           mode: str = Query(default="dense", pattern="^(dense|hybrid)$", description="'hybrid' fuses embedding search with keyword (BM25) search"),
+           feature_range: str = Query(default="", alias="range", description="Audio feature ranges, e.g. 'energy:0.6:1,tempo:100:130'")):
+    try:
+        ctx = get_request_context()
+        try:
+            feature_ranges = parse_feature_ranges(feature_range)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
 
-        return {"message": f"Successfully embedded {len(text_documents)} songs for user {user_id}"}
+        # Repeated searches for the same query are served from the result cache
+        return {"results": search_user_tracks(ctx.user_id, query, k, pooling=pooling, mode=mode, feature_ranges=feature_ranges)}
+    
     except HTTPException as e:
         if e.status_code == 307:
             return RedirectResponse(url="/login")
@@ -436,51 +981,45 @@ async def store_embeddings(limit: int = Query(default=50, description="Number of
         if e.http_status == 429:
             return JSONResponse(status_code=429, content={"message": "Rate limit exceeded, please try again later."})
         else:
-            return JSONResponse(status_code=500, content={"message": "An error occurred while embedding songs."})
-
-
+            return JSONResponse(status_code=500, content={"message": "An error occurred during the search process."})
 
 
-@app.post("/create_playlist")
-async def create_playlist(query: str, k: int = Query(default=5, description="Number of results to fetch")):
+def iter_search_events(user_id, query, k, pooling="max", mode="dense", feature_ranges=None):
+    """
+    Yields a "result" event per search result as soon as it is ready, then a "done" event with the count.
+    """
+    count = 0
+    for result in iter_user_search_results(user_id, query, k, pooling=pooling, mode=mode, feature_ranges=feature_ranges):
+        count += 1
+        yield {"type": "result", "result": result}
+    yield {"type": "done", "count": count}
+
+@app.get("/search/stream")
+def search_stream(query: str, k: int = Query(default=5, description="Number of results to fetch"),
+                  pooling: str = Query(default="max", pattern="^(max|sum)$", description="How lyric chunk scores are combined per track"),
+                  mode: str = Query(default="dense", pattern="^(dense|hybrid)$", description="'hybrid' fuses embedding search with keyword (BM25) search"),
+                  feature_range: str = Query(default="", alias="range", description="Audio feature ranges, e.g. 'energy:0.6:1,tempo:100:130'")):
+    """
+    Streams the results of `/search` as newline-delimited JSON, each one sent as soon as it is joined to its
+    audio data, so the first result arrives without waiting for the rest.
+    
+    Returns:
+        StreamingResponse: A {"type": "result", "result": ...} line per track, then {"type": "done", "count": n}.
+    
+    Raises:
+        HTTPException: If a range filter is invalid, or redirects to Spotify login if authentication is needed.
+    """
     try:
-        sp = get_spotify_client()
-        user_id = sp.current_user()['id']  # Get the current user's ID
-
-        # Create a new playlist with the query as the name
-        playlist_name = query
-        playlist_description = f"Playlist created based on the search query: {query}"
-        new_playlist = sp.user_playlist_create(user_id, name=playlist_name, public=False, description=playlist_description)
-        playlist_id = new_playlist['id']
-        
-        logger.info(f"Created new playlist: {playlist_name} with ID: {playlist_id}")
-
-        # Search for songs and retrieve the results
-        search_results = await search(query, k)
-        recommendations = await get_recommendations(query, k)
-
-        # Extract URIs of tracks from the search results
-        search_uris = [
-            f"spotify:track:{result['metadata']['track_id']}"
-            for result in search_results['results'] if 'track_id' in result['metadata']
-        ]
-
-        # Extract URIs of tracks from the recommendations
-        recommendation_uris = [
-            f"spotify:track:{track['id']}"
-            for track in recommendations['recommendations']
-        ]
-
-        # Combine URIs from both search and recommendations
-        song_uris = search_uris + recommendation_uris
-
+        # Resolve the user before streaming starts, so authentication errors still get their own response
+        ctx = get_request_context()
+        user_id = ctx.user_id
+        try:
+            feature_ranges = parse_feature_ranges(feature_range)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
 
-        # Add songs to the playlist
-        if song_uris:
-            sp.playlist_add_items(playlist_id, song_uris)
-            logger.info(f"Added {len(song_uris)} songs to the playlist: {playlist_name}")
-        logger.info(f"Created new playlist: {playlist_name} with ID: {playlist_id}")
-        return {"message": f"Playlist '{playlist_name}' created and {len(song_uris)} songs added."}
+        events = iter_search_events(user_id, query, k, pooling=pooling, mode=mode, feature_ranges=feature_ranges)
+        return StreamingResponse(ndjson_stream(events, "An error occurred during the search process."), media_type="application/x-ndjson")
     
     except HTTPException as e:
         if e.status_code == 307:
@@ -490,12 +1029,924 @@ async def create_playlist(query: str, k: int = Query(default=5, description="Num
         if e.http_status == 429:
             return JSONResponse(status_code=429, content={"message": "Rate limit exceeded, please try again later."})
         else:
-            return JSONResponse(status_code=500, content={"message": "An error occurred while creating the playlist."})
+            return JSONResponse(status_code=500, content={"message": "An error occurred during the search process."})
 
-@app.get("/get_recommendations")
-async def get_recommendations(query: str, k: int = Query(default=5, description="Number of search results to fetch")):
-    """
-    Retrieves song recommendations based on a search query. The recommendations are filtered to exclude tracks already liked by the user.
+
+class BatchSearchQuery(BaseModel):
+    """
+    One query of a batch search; `k` defaults to the request's `k`.
+    """
+    query: str
+    k: Optional[int] = None
+
+@app.post("/search/batch")
+def search_batch(queries: list[BatchSearchQuery],
+                 k: int = Query(default=5, description="Number of results per query without its own k"),
+                 pooling: str = Query(default="max", pattern="^(max|sum)$", description="How lyric chunk scores are combined per track"),
+                 mode: str = Query(default="dense", pattern="^(dense|hybrid)$", description="'hybrid' fuses embedding search with keyword (BM25) search"),
+                 feature_range: str = Query(default="", alias="range", description="Audio feature ranges applied to every query, e.g. 'energy:0.6:1'")):
+    """
+    Runs many searches in one request, e.g. for bulk playlist generation. The queries are embedded in a single
+    batched forward pass and looked up together, which is much faster than the same number of `/search` calls.
+    
+    Args:
+        queries (list): The queries, each with an optional number of results, as the JSON request body.
+        k (int): Number of results for queries that do not set their own. Defaults to 5.
+        pooling (str): How lyric chunk scores are combined per track, "max" or "sum". Defaults to "max".
+        mode (str): "dense" or "hybrid". Defaults to "dense".
+        feature_range (str): Audio feature ranges applied to every query.
+    
+    Returns:
+        dict: The results of each query, in request order.
+    
+    Raises:
+        HTTPException: If the batch is too large or a range filter is invalid, or redirects to Spotify login if
+        authentication is needed.
+    """
+    try:
+        ctx = get_request_context()
+        if len(queries) > config.SEARCH_BATCH_MAX_QUERIES:
+            raise HTTPException(status_code=400, detail=f"A batch may hold at most {config.SEARCH_BATCH_MAX_QUERIES} queries")
+        try:
+            feature_ranges = parse_feature_ranges(feature_range)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+        searches = [(item.query, item.k if item.k is not None else k) for item in queries]
+        results = search_user_tracks_batch(ctx.user_id, searches, pooling=pooling, mode=mode, feature_ranges=feature_ranges)
+        return {"results": [{"query": query, "results": query_results} for (query, _), query_results in zip(searches, results)]}
+    
+    except HTTPException as e:
+        if e.status_code == 307:
+            return RedirectResponse(url="/login")
+        raise e
+    except SpotifyException as e:
+        if e.http_status == 429:
+            return JSONResponse(status_code=429, content={"message": "Rate limit exceeded, please try again later."})
+        else:
+            return JSONResponse(status_code=500, content={"message": "An error occurred during the search process."})
+
+
+def iter_saved_tracks(sp, offset=0, page_size=config.SAVED_TRACKS_PAGE_SIZE):
+    """
+    Lazily walks the current user's saved tracks one page at a time, so only a single page is ever held in memory.
+    
+    Args:
+        sp (Spotify): Spotify client instance.
+        offset (int): Index of the first saved track to fetch. Defaults to 0.
+        page_size (int): Number of saved tracks requested per page.
+    
+    Yields:
+        tuple: (offset, total, items) where `offset` is the index of the page's first track, `total` is the size of
+        the user's library and `items` are the saved-track items of the page.
+    """
+    while True:
+        page = sp.current_user_saved_tracks(limit=page_size, offset=offset)
+        items = page['items']
+        if not items:
+            return
+        yield offset, page['total'], items
+        offset += len(items)
+        if page['next'] is None:
+            return
+
+
+def build_track_documents(sp, items):
+    """
+    Builds the text and audio documents for a page of saved-track items. Each track gets one audio document and
+    one text document per lyric chunk, so every verse or chorus is embedded on its own instead of the whole song
+    being truncated into a single vector.
+    
+    Args:
+        sp (Spotify): Spotify client instance.
+        items (list): Saved-track items as returned by `current_user_saved_tracks`.
+    
+    Returns:
+        tuple: (text_documents, text_ids, audio_documents, ids) ready to be added to the text and audio collections.
+        Text documents are identified by `<track_id>:<chunk>`, audio documents by the track ID.
+    """
+    text_documents = []
+    text_ids = []
+    audio_documents = []
+    ids = []
+
+    # Local files and unavailable tracks have no Spotify ID and cannot be embedded
+    tracks = [item['track'] for item in items if item['track'] and item['track'].get('id')]
+
+    # Fetch the audio features for the whole page at once instead of one request per track
+    audio_features = get_audio_features_bulk(sp, [track['id'] for track in tracks])
+
+    # Fetch the page's lyrics concurrently, using the first artist of each track
+    page_lyrics = get_genius_manager().get_lyrics_many(
+        [(track['artists'][0]['name'] if track['artists'] else "", track['name']) for track in tracks]
+    )
+
+    for track, song_lyrics in zip(tracks, page_lyrics):
+        track_id = track['id']
+        artists = [artist['name'] for artist in track['artists']]
+        track_info = {
+            "id": track_id,
+            "name": track['name'],
+            "album": track['album']['name'],
+            "artists": artists,
+            "url": track['external_urls']['spotify']
+        }
+
+        # Encode the artist list for the vector store
+        track_info = encode_metadata(track_info)
+
+        # Handle potential None values in track_info
+        track_info = filter_none_metadata(track_info)
+
+        song_lyrics = song_lyrics or ""
+
+        # Create one document per lyric chunk for the text collection; songs without lyrics get a single
+        # document so they can still be found by title, artist and album
+        header = f"{track_info['name']} by {artists} from {track_info['album']}"
+        chunks = split_lyrics(song_lyrics, max_chars=config.LYRIC_CHUNK_MAX_CHARS, max_chunks=config.MAX_LYRIC_CHUNKS)
+        for chunk_index, chunk in enumerate(chunks or [""]):
+            text_doc = Document(
+                page_content=f"{header}\nLyrics: {chunk}" if chunk else header,
+                metadata={"url": track_info["url"], "track_id": track_id, "chunk": chunk_index},
+            )
+            text_documents.append(text_doc)
+            text_ids.append(f"{track_id}:{chunk_index}")
+        ids.append(track_id)  # Use track ID as the document ID for the audio collection
+
+        # Join the page's audio features back to the track
+        audio_data = audio_features.get(track_id) or {}
+        
+        # Encode audio_data for the vector store
+        audio_data = encode_metadata(audio_data)
+
+        # Handle potential None values in audio_data
+        audio_data = filter_none_metadata(audio_data)
+
+        # Combine the track_info and audio features into a single metadata dictionary
+        combined_metadata = {**track_info, **audio_data, "lyrics": song_lyrics}
+
+        # Handle potential None values in combined_metadata
+        combined_metadata = filter_none_metadata(combined_metadata)
+
+        # Create the document for the audio collection
+        audio_doc = Document(
+            page_content="Audio features and analysis data",
+            metadata=combined_metadata,
+        )
+        audio_documents.append(audio_doc)
+
+    return text_documents, text_ids, audio_documents, ids
+
+
+def commit_page(sp, user_id, items, text_store, audio_store):
+    """
+    Builds the documents for a page of saved-track items and adds them to the text and audio collections.
+    In catalog mode only tracks missing from the shared catalog are built and embedded, and every track of the
+    page is added to the user's membership set.
+    
+    Args:
+        sp (Spotify): Spotify client instance.
+        user_id (str): The unique identifier for the user.
+        items (list): Saved-track items as returned by `current_user_saved_tracks`.
+        text_store (VectorStore): The user's text collection.
+        audio_store (Chroma): The user's audio collection.
+    
+    Returns:
+        int: Number of songs stored for the user.
+    """
+    if not CATALOG_MODE:
+        text_documents, text_ids, audio_documents, ids = build_track_documents(sp, items)
+        if ids:
+            # Drop the previous chunks of re-ingested tracks, whose lyrics may now split into fewer chunks
+            text_store.delete(where={"track_id": {"$in": ids}})
+            text_store.add_documents(documents=text_documents, ids=text_ids)
+            audio_store.add_documents(documents=audio_documents, ids=ids)
+            get_sparse_index().add_documents(text_collection_name(user_id), text_documents)
+            update_feature_matrix(user_id, [(track_id, document.metadata) for track_id, document in zip(ids, audio_documents)])
+            search_result_cache.invalidate(user_id)
+        return len(ids)
+
+    items = [item for item in items if item['track'] and item['track'].get('id')]
+    if not items:
+        return 0
+    cataloged = audio_store.get(ids=[item['track']['id'] for item in items], include=["metadatas"])
+    cataloged_ids = set(cataloged['ids'])
+    new_items = [item for item in items if item['track']['id'] not in cataloged_ids]
+
+    text_documents, text_ids, audio_documents, ids = build_track_documents(sp, new_items)
+    if ids:
+        text_store.add_documents(documents=text_documents, ids=text_ids)
+        audio_store.add_documents(documents=audio_documents, ids=ids)
+        get_sparse_index().add_documents(text_collection_name(user_id), text_documents)
+        logger.info(f"Added {len(ids)} new tracks to the catalog ({len(cataloged_ids)} already cataloged)")
+
+    get_membership_index().add_many(user_id, [(item['track']['id'], item['added_at']) for item in items])
+    update_feature_matrix(user_id, list(zip(cataloged['ids'], cataloged['metadatas'])) + [
+        (track_id, document.metadata) for track_id, document in zip(ids, audio_documents)
+    ])
+    search_result_cache.invalidate(user_id)
+    return len(items)
+
+
+def ingest_full(sp, user_id, text_store, audio_store, limit=None, restart=False, progress=None):
+    """
+    Streams the user's liked songs page by page and (re-)embeds every one of them, committing each page as it
+    arrives. After every committed page the user's cursor is persisted, so a crashed or rate-limited run resumes
+    where it stopped on the next call instead of starting over.
+    
+    Args:
+        sp (Spotify): Spotify client instance.
+        user_id (str): The unique identifier for the user.
+        text_store (VectorStore): The user's text collection.
+        audio_store (Chroma): The user's audio collection.
+        limit (int): Maximum number of liked songs to ingest in this run. Defaults to the entire library.
+        restart (bool): Whether to ignore the saved checkpoint and start from the first liked song. Defaults to False.
+        progress (callable): Optional callback invoked after every page as `progress(processed, offset, total, embedded)`.
+    
+    Returns:
+        dict: The number of songs embedded along with the ingestion cursor.
+    """
+    # Resume from the saved cursor unless the previous run finished or a restart was requested
+    checkpoint = get_checkpoint_manager().load(user_id)
+    if restart or checkpoint.get("completed", True):
+        offset = 0
+    else:
+        offset = checkpoint.get("offset", 0)
+        logger.info(f"Resuming ingest for user {user_id} at offset {offset}")
+
+    number_of_songs = 0
+    processed = 0
+    started_at = time.perf_counter()
+
+    for page_offset, total, items in iter_saved_tracks(sp, offset=offset):
+        if limit is not None:
+            items = items[:limit - number_of_songs]
+
+        # Commit the page before advancing the cursor so a failure never skips tracks
+        number_of_songs += commit_page(sp, user_id, items, text_store, audio_store)
+
+        offset = page_offset + len(items)
+        cursor = {"offset": offset, "total": total, "completed": offset >= total}
+        if page_offset == 0 and items:
+            # Saved tracks come newest first, so the first page holds the delta-sync watermark
+            cursor["last_added_at"] = items[0]['added_at']
+        checkpoint = get_checkpoint_manager().save(user_id, **cursor)
+
+        processed += len(items)
+        if progress:
+            progress(processed, offset, total, number_of_songs)
+
+        elapsed = time.perf_counter() - started_at
+        logger.info(f"Ingested {offset}/{total} songs for user {user_id} ({number_of_songs / max(elapsed, 1e-6):.1f} tracks/sec)")
+
+        if limit is not None and number_of_songs >= limit:
+            break
+
+    return {
+        "embedded": number_of_songs,
+        "removed": 0,
+        "offset": checkpoint.get("offset", 0),
+        "total": checkpoint.get("total", 0),
+        "completed": checkpoint.get("completed", True),
+    }
+
+
+def ingest_delta(sp, user_id, text_store, audio_store, progress=None):
+    """
+    Incrementally syncs the user's collections with their liked songs: only tracks that are not stored yet are
+    embedded, and stored tracks the user has un-liked are deleted.
+    
+    In per-user mode, if the user's text collection is empty although tracks are stored, a full ingest runs instead.
+    
+    Saved tracks come newest first, so once a page reaches the `added_at` watermark of the last ingest every
+    remaining track is already stored. If in addition the stored tracks plus the new ones add up to the size of
+    the library, nothing was un-liked and the walk stops early; otherwise the rest of the library is listed
+    (without fetching lyrics, features or embeddings) to find the un-liked tracks.
+    
+    Args:
+        sp (Spotify): Spotify client instance.
+        user_id (str): The unique identifier for the user.
+        text_store (VectorStore): The user's text collection.
+        audio_store (Chroma): The user's audio collection.
+        progress (callable): Optional callback invoked after every page as `progress(processed, offset, total, embedded)`.
+    
+    Returns:
+        dict: The number of songs embedded and removed along with the ingestion cursor.
+    """
+    checkpoint = get_checkpoint_manager().load(user_id)
+    watermark = checkpoint.get("last_added_at", "")
+    can_stop_early = checkpoint.get("completed", False)
+
+    existing_ids = get_user_track_ids(user_id, audio_store)
+    if not CATALOG_MODE and existing_ids and text_store.count() == 0:
+        # Tracks are stored but their text collection is empty, e.g. after switching VECTOR_STORE_BACKEND with no
+        # collection to import from; only embedding new tracks would leave the library unsearchable. (A full ingest
+        # would not help in catalog mode, which only embeds tracks missing from the catalog's audio collection)
+        logger.warning(f"Text collection of user {user_id} is empty, running a full ingest instead of a delta sync")
+        return ingest_full(sp, user_id, text_store, audio_store, restart=True, progress=progress)
+
+    library_ids = set()
+    last_added_at = watermark
+    number_of_songs = 0
+    total = 0
+    walked_library = True
+    started_at = time.perf_counter()
+
+    for page_offset, total, items in iter_saved_tracks(sp):
+        if page_offset == 0:
+            last_added_at = max(last_added_at, items[0]['added_at'])
+
+        library_ids.update(item['track']['id'] for item in items if item['track'] and item['track'].get('id'))
+        new_items = [
+            item for item in items
+            if item['track'] and item['track'].get('id') and item['track']['id'] not in existing_ids
+        ]
+        if new_items:
+            number_of_songs += commit_page(sp, user_id, new_items, text_store, audio_store)
+
+        if progress:
+            progress(page_offset + len(items), page_offset + len(items), total, number_of_songs)
+
+        # ISO 8601 timestamps from Spotify compare correctly as strings
+        reached_watermark = bool(watermark) and items[-1]['added_at'] <= watermark
+        if can_stop_early and reached_watermark and len(existing_ids) + number_of_songs == total:
+            walked_library = False
+            break
+
+    removed_ids = list(existing_ids - library_ids) if walked_library else []
+    if removed_ids:
+        remove_user_tracks(user_id, removed_ids, text_store, audio_store)
+
+    checkpoint = get_checkpoint_manager().save(
+        user_id, offset=total, total=total, completed=True, last_added_at=last_added_at
+    )
+
+    elapsed = time.perf_counter() - started_at
+    logger.info(f"Delta sync for user {user_id}: {number_of_songs} songs embedded, {len(removed_ids)} removed in {elapsed:.1f}s")
+
+    return {
+        "embedded": number_of_songs,
+        "removed": len(removed_ids),
+        "offset": checkpoint["offset"],
+        "total": checkpoint["total"],
+        "completed": True,
+    }
+
+
+# Number of audio documents read at a time when a feature matrix is built from the audio collection
+FEATURE_MATRIX_BATCH_SIZE = 500
+
+def build_feature_matrix(user_id, audio_store):
+    """
+    Builds the user's normalized audio feature matrix from the audio documents of their tracks. The documents,
+    whose metadata includes the lyrics, are read `FEATURE_MATRIX_BATCH_SIZE` at a time and only their features are
+    kept, so memory use does not grow with the library. Ingests keep the matrix up to date page by page (see
+    `update_feature_matrix`); a full build is only needed for libraries without a matrix yet.
+    
+    Args:
+        user_id (str): The unique identifier for the user.
+        audio_store (Chroma): The user's audio collection.
+    
+    Returns:
+        int: Number of tracks in the matrix.
+    """
+    track_ids = sorted(get_user_track_ids(user_id, audio_store))
+
+    def iter_metadatas():
+        for start in range(0, len(track_ids), FEATURE_MATRIX_BATCH_SIZE):
+            stored = audio_store.get(ids=track_ids[start:start + FEATURE_MATRIX_BATCH_SIZE], include=["metadatas"])
+            yield from zip(stored['ids'], stored['metadatas'])
+
+    return get_feature_matrix_store().build(user_id, iter_metadatas())
+
+def update_feature_matrix(user_id, metadatas, removed_ids=()):
+    """
+    Updates the rows of the user's audio feature matrix for tracks an ingest added or removed. Users without a
+    matrix are skipped; theirs is built from the whole collection at the end of the ingest or on first use.
+    
+    Args:
+        user_id (str): The unique identifier for the user.
+        metadatas (list): (track_id, metadata) tuples of the added tracks' audio documents.
+        removed_ids (list): IDs of the removed tracks.
+    """
+    get_feature_matrix_store().update(user_id, metadatas, removed_ids=removed_ids)
+
+def get_feature_matrix(user_id):
+    """
+    Returns the user's audio feature matrix, building it first for libraries ingested before it existed.
+    """
+    store = get_feature_matrix_store()
+    feature_matrix = store.load(user_id)
+    if feature_matrix is None:
+        build_feature_matrix(user_id, get_audio_collection(user_id))
+        feature_matrix = store.load(user_id)
+    return feature_matrix
+
+def feature_results(user_id, neighbours):
+    """
+    Joins (track_id, distance) tuples to the tracks' audio data in the same shape as search results.
+    """
+    audio_metadata = get_audio_metadata_bulk(get_audio_collection(user_id), [track_id for track_id, _ in neighbours])
+    results = []
+    for track_id, distance in neighbours:
+        audio = audio_metadata.get(track_id)
+        results.append({
+            "metadata": {"track_id": track_id, "url": (audio or {}).get("url")},
+            "distance": distance,
+            "audio": audio
+        })
+    return results
+
+def run_ingest(sp, user_id, mode="full", limit=None, restart=False, progress=None):
+    """
+    Ingests the user's liked songs into their text and audio collections using the given mode.
+    
+    Args:
+        sp (Spotify): Spotify client instance.
+        user_id (str): The unique identifier for the user.
+        mode (str): Either "full" or "delta". Defaults to "full".
+        limit (int): Maximum number of liked songs to ingest in "full" mode. Defaults to the entire library.
+        restart (bool): Whether to ignore the saved checkpoint in "full" mode. Defaults to False.
+        progress (callable): Optional callback invoked after every page as `progress(processed, offset, total, embedded)`.
+    
+    Returns:
+        dict: A message indicating the number of songs embedded and removed, along with the ingestion cursor.
+    """
+    # Get or create vector stores for text and audio data, pinned in the store registry so the handles are not
+    # evicted (and reopened from disk by other requests) while a long ingest writes to them
+    with pinned_vector_store(text_collection_name(user_id), config.VECTOR_STORE_BACKEND) as text_store, \
+            pinned_vector_store(audio_collection_name(user_id)) as audio_store:
+        cache_stats = getattr(get_embedding_function(), "stats", None)
+        cache_before = cache_stats() if cache_stats else None
+
+        try:
+            if mode == "delta":
+                result = ingest_delta(sp, user_id, text_store, audio_store, progress=progress)
+            else:
+                result = ingest_full(sp, user_id, text_store, audio_store, limit=limit, restart=restart, progress=progress)
+        finally:
+            # Stores that buffer writes (FAISS) save the pages committed so far, even if the ingest failed
+            text_store.persist()
+
+        # The audio feature matrix used by mood search was updated with every committed page; build it from the
+        # collection if the user has none yet, e.g. after their first ingest
+        if get_feature_matrix_store().load(user_id) is None:
+            build_feature_matrix(user_id, audio_store)
+
+    logger.info(f"Number of songs embedded for user {user_id}: {result['embedded']}")
+
+    if cache_stats:
+        # Report the embedding cache's effect on this ingest (approximate if several ingests run at once)
+        cache_after = cache_stats()
+        hits = cache_after["hits"] - cache_before["hits"]
+        misses = cache_after["misses"] - cache_before["misses"]
+        result["embedding_cache"] = {
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": hits / (hits + misses) if hits + misses else 0.0,
+        }
+        logger.info(f"Embedding cache hit rate for user {user_id}: {result['embedding_cache']['hit_rate']:.1%} ({hits} hits, {misses} misses)")
+
+    message = f"Successfully embedded {result['embedded']} songs for user {user_id}"
+    if result["removed"]:
+        message += f" and removed {result['removed']} un-liked songs"
+    return {"message": message, **result}
+
+
+def run_ingest_request_job(job, sp, user_id, mode, limit, restart):
+    """
+    Job target of a synchronous `/store_embeddings` request, running the ingest with the request's Spotify client.
+    Errors are left on the job for the request to re-raise.
+    """
+    return run_ingest(sp, user_id, mode=mode, limit=limit, restart=restart, progress=job.update)
+
+
+def run_ingest_job(job, user_id, mode, limit, restart):
+    """
+    Background job target running an ingest and reporting its progress on the job.
+    """
+    # Use the OAuth manager directly so the access token is refreshed during long ingests
+    sp = spotipy.Spotify(auth_manager=get_sp_oauth())
+    try:
+        return run_ingest(sp, user_id, mode=mode, limit=limit, restart=restart, progress=job.update)
+    except SpotifyException as e:
+        if e.http_status == 429:
+            raise RuntimeError("Rate limit exceeded, please try again later. Progress has been saved and the next run will resume.") from e
+        raise
+
+
+@app.get("/store_embeddings")
+def store_embeddings(
+    limit: int = Query(default=None, ge=1, description="Maximum number of liked songs to ingest in this run (entire library if omitted)"),
+    restart: bool = Query(default=False, description="Ignore the saved checkpoint and ingest from the first liked song"),
+    mode: str = Query(default="full", pattern="^(full|delta)$", description="'full' re-embeds the library, 'delta' only embeds new liked songs and removes un-liked ones"),
+):
+    """
+    Fetches the current user's liked songs from Spotify, processes their data (including lyrics and audio features),
+    and stores the processed data into vector stores for text and audio data using ChromaDB.
+    
+    In "full" mode the whole library (or `limit` songs of it) is streamed page by page and re-embedded, resuming from
+    the saved checkpoint of an interrupted run. In "delta" mode only liked songs that are not stored yet are embedded
+    and un-liked songs are removed from the collections.
+    
+    This endpoint blocks until the ingest finishes; use `POST /ingest` to run the ingest as a background job instead.
+    The ingest runs on the job manager like background jobs, so it never overlaps another ingest of the same user:
+    if one is already queued or running, this request waits for it and returns its result.
+    
+    Args:
+        limit (int): Maximum number of liked songs to ingest in this run in "full" mode. Defaults to the entire library.
+        restart (bool): Whether to ignore the saved checkpoint and start from the first liked song. Defaults to False.
+        mode (str): Either "full" or "delta". Defaults to "full".
+    
+    Returns:
+        dict: A message indicating the number of songs successfully embedded, along with the ingestion cursor.
+    
+    Raises:
+        HTTPException: Redirects to Spotify login if authentication is needed or if lyrics are not found.
+        SpotifyException: Handles Spotify-specific exceptions, including rate limits.
+    """
+    try:
+        ctx = get_request_context()
+        job = job_manager.submit(ctx.user_id, mode, run_ingest_request_job, ctx.sp, ctx.user_id, mode, limit, restart)
+        job.wait()
+        if job.exception is not None:
+            raise job.exception
+        return job.result
+    except HTTPException as e:
+        if e.status_code == 307:
+            return RedirectResponse(url="/login")
+        raise e
+    except SpotifyException as e:
+        if e.http_status == 429:
+            return JSONResponse(status_code=429, content={"message": "Rate limit exceeded, please try again later. Progress has been saved and the next run will resume."})
+        else:
+            return JSONResponse(status_code=500, content={"message": "An error occurred while embedding songs."})
+
+
+@app.post("/ingest")
+def ingest(
+    limit: int = Query(default=None, ge=1, description="Maximum number of liked songs to ingest in this run (entire library if omitted)"),
+    restart: bool = Query(default=False, description="Ignore the saved checkpoint and ingest from the first liked song"),
+    mode: str = Query(default="full", pattern="^(full|delta)$", description="'full' re-embeds the library, 'delta' only embeds new liked songs and removes un-liked ones"),
+):
+    """
+    Starts ingesting the current user's liked songs as a background job and returns immediately.
+    If the user already has an ingest queued or running, that job is returned instead of starting another one.
+    
+    Args:
+        limit (int): Maximum number of liked songs to ingest in this run in "full" mode. Defaults to the entire library.
+        restart (bool): Whether to ignore the saved checkpoint and start from the first liked song. Defaults to False.
+        mode (str): Either "full" or "delta". Defaults to "full".
+    
+    Returns:
+        dict: The job ID and status, to be polled with `GET /ingest/{job_id}`.
+    
+    Raises:
+        HTTPException: Redirects to Spotify login if authentication is needed.
+    """
+    try:
+        ctx = get_request_context()
+        user_id = ctx.user_id
+
+        job = job_manager.submit(user_id, mode, run_ingest_job, user_id, mode, limit, restart)
+        logger.info(f"Ingest job {job.id} ({job.mode}) is {job.status} for user {user_id}")
+        return {"job_id": job.id, "status": job.status}
+    except HTTPException as e:
+        if e.status_code == 307:
+            return RedirectResponse(url="/login")
+        raise e
+    except SpotifyException as e:
+        if e.http_status == 429:
+            return JSONResponse(status_code=429, content={"message": "Rate limit exceeded, please try again later."})
+        else:
+            return JSONResponse(status_code=500, content={"message": "An error occurred while starting the ingest."})
+
+
+@app.get("/ingest/{job_id}")
+def ingest_status(job_id: str):
+    """
+    Reports the progress of a background ingest job.
+    
+    Args:
+        job_id (str): The job ID returned by `POST /ingest`.
+    
+    Returns:
+        dict: The job status ("queued", "running", "completed" or "failed"), the number of tracks processed and
+        embedded, the processing rate in tracks/sec, the estimated seconds remaining and any errors.
+    
+    Raises:
+        HTTPException: If the job is unknown.
+    """
+    job = job_manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Ingest job not found")
+    return job.to_dict()
+
+
+
+
+@app.post("/create_playlist")
+def create_playlist(query: str, k: int = Query(default=5, description="Number of results to fetch"),
+                    mmr_lambda: float = Query(default=None, ge=0, le=1, description="Diversify the library tracks with maximal marginal relevance: 1 favours relevance, 0 variety")):
+    try:
+        ctx = get_request_context()
+        for event in iter_playlist_events(ctx, query, k, mmr_lambda=mmr_lambda):
+            pass
+        # The last event summarizes the playlist
+        return {"message": event["message"]}
+    
+    except HTTPException as e:
+        if e.status_code == 307:
+            return RedirectResponse(url="/login")
+        raise e
+    except SpotifyException as e:
+        if e.http_status == 429:
+            return JSONResponse(status_code=429, content={"message": "Rate limit exceeded, please try again later."})
+        else:
+            return JSONResponse(status_code=500, content={"message": "An error occurred while creating the playlist."})
+
+@app.post("/create_playlist/stream")
+def create_playlist_stream(query: str, k: int = Query(default=5, description="Number of results to fetch"),
+                           mmr_lambda: float = Query(default=None, ge=0, le=1, description="Diversify the library tracks with maximal marginal relevance: 1 favours relevance, 0 variety")):
+    """
+    Creates a playlist like `/create_playlist` and streams its progress as newline-delimited JSON, so the tracks
+    show up as they are found instead of once the playlist is complete.
+    
+    Returns:
+        StreamingResponse: A "playlist" line, a "track" line per track (search results, then recommendations)
+        and a final "done" line with the summary message.
+    
+    Raises:
+        HTTPException: Redirects to Spotify login if authentication is needed.
+    """
+    try:
+        # Resolve the user before streaming starts, so authentication errors still get their own response
+        ctx = get_request_context()
+        ctx.user_id
+        events = iter_playlist_events(ctx, query, k, mmr_lambda=mmr_lambda)
+        return StreamingResponse(ndjson_stream(events, "An error occurred while creating the playlist."), media_type="application/x-ndjson")
+    
+    except HTTPException as e:
+        if e.status_code == 307:
+            return RedirectResponse(url="/login")
+        raise e
+    except SpotifyException as e:
+        if e.http_status == 429:
+            return JSONResponse(status_code=429, content={"message": "Rate limit exceeded, please try again later."})
+        else:
+            return JSONResponse(status_code=500, content={"message": "An error occurred while creating the playlist."})
+
+def iter_playlist_events(ctx, query, k, mmr_lambda=None):
+    """
+    Creates a playlist from a query's best matches in the user's library and recommendations based on them,
+    yielding its progress along the way. Search results are added to the playlist before recommendations are
+    requested, so they appear first.
+    
+    Args:
+        ctx (RequestContext): The request's Spotify client and user.
+        query (str): The search query, also used as the playlist name.
+        k (int): Number of search results and of recommendations.
+        mmr_lambda (float): If set, the library tracks are picked from a larger pool of matches with maximal
+            marginal relevance, trading relevance (1) for variety (0). Defaults to the plain ranking.
+    
+    Yields:
+        dict: A "playlist" event with the new playlist, a "track" event per track found and a final "done" event
+        with a summary message.
+    """
+    sp = ctx.sp
+    user_id = ctx.user_id  # Get the current user's ID
+
+    # Create a new playlist with the query as the name
+    playlist_name = query
+    playlist_description = f"Playlist created based on the search query: {query}"
+    new_playlist = sp.user_playlist_create(user_id, name=playlist_name, public=False, description=playlist_description)
+    playlist_id = new_playlist['id']
+    logger.info(f"Created new playlist: {playlist_name} with ID: {playlist_id}")
+    yield {"type": "playlist", "id": playlist_id, "name": playlist_name}
+
+    # Search for songs, sharing the request's client and user, and extract the URIs of their tracks
+    if mmr_lambda is None:
+        search_results = iter_user_search_results(user_id, query, k)
+        seed_results = None
+    else:
+        candidates = min(k * config.PLAYLIST_MMR_CANDIDATE_FACTOR, config.PLAYLIST_MMR_MAX_CANDIDATES)
+        candidate_results = search_user_tracks(user_id, query, max(k, candidates))
+        search_results = diversify_results(user_id, candidate_results, k, mmr_lambda)
+        # The candidates are ranked best first, so their top k seed the recommendations without a second search
+        seed_results = candidate_results[:k]
+    search_uris = []
+    for result in search_results:
+        if 'track_id' not in result['metadata']:
+            continue
+        uri = f"spotify:track:{result['metadata']['track_id']}"
+        search_uris.append(uri)
+        audio = result['audio'] or {}
+        yield {"type": "track", "source": "search", "uri": uri, "name": audio.get('name'), "artists": audio.get('artists', [])}
+    if search_uris:
+        sp.playlist_add_items(playlist_id, search_uris)
+
+    # Extract URIs of tracks from the recommendations
+    recommendation_uris = []
+    for track in iter_recommended_tracks(ctx, query, k, search_results=seed_results):
+        uri = f"spotify:track:{track['id']}"
+        recommendation_uris.append(uri)
+        yield {"type": "track", "source": "recommendation", "uri": uri, "name": track.get('name'),
+               "artists": [artist['name'] for artist in track.get('artists', [])]}
+    if recommendation_uris:
+        sp.playlist_add_items(playlist_id, recommendation_uris)
+
+    song_count = len(search_uris) + len(recommendation_uris)
+    logger.info(f"Added {song_count} songs to the playlist: {playlist_name}")
+    yield {"type": "done", "message": f"Playlist '{playlist_name}' created and {song_count} songs added."}
+
+def diversify_results(user_id, results, k, lambda_mult):
+    """
+    Picks k search results with maximal marginal relevance, so a playlist does not fill up with near-identical
+    tracks. Two results are as similar as the embeddings of their best-matching lyric chunks, at least
+    `PLAYLIST_MMR_ARTIST_SIMILARITY` if they share an artist, and duplicates if they also share an album.
+    
+    Args:
+        user_id (str): The unique identifier for the user.
+        results (list): Candidate results, as returned by `search_user_tracks`.
+        k (int): Number of results to pick.
+        lambda_mult (float): 1 picks by relevance alone, 0 by variety alone.
+    
+    Returns:
+        list: The picked results, in order of selection.
+    """
+    if len(results) <= k:
+        return results
+
+    # One lookup for the embeddings of every candidate's best chunk
+    chunk_ids = [f"{result['metadata']['track_id']}:{result['metadata'].get('chunk', 0)}" for result in results]
+    stored = get_text_collection(user_id).get(ids=chunk_ids, include=["embeddings"])
+    stored_embeddings = dict(zip(stored['ids'], stored['embeddings']))
+    dimension = len(next(iter(stored_embeddings.values()))) if stored_embeddings else 0
+    # Candidates without a stored embedding are only compared by artist and album
+    embeddings = np.zeros((len(results), dimension), dtype=np.float32)
+    for i, chunk_id in enumerate(chunk_ids):
+        if chunk_id in stored_embeddings:
+            embeddings[i] = stored_embeddings[chunk_id]
+    norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+    embeddings /= np.where(norms > 0, norms, 1.0)
+    similarity = embeddings @ embeddings.T
+
+    audios = [result['audio'] or {} for result in results]
+    artist_columns = {}
+    rows, columns = [], []
+    for i, audio in enumerate(audios):
+        for artist in audio.get('artists') or []:
+            rows.append(i)
+            columns.append(artist_columns.setdefault(artist, len(artist_columns)))
+    artist_matrix = np.zeros((len(results), len(artist_columns)), dtype=np.float32)
+    artist_matrix[rows, columns] = 1.0
+    shares_artist = (artist_matrix @ artist_matrix.T) > 0
+    similarity = np.where(shares_artist, np.maximum(similarity, config.PLAYLIST_MMR_ARTIST_SIMILARITY), similarity)
+
+    albums = np.asarray([str(audio.get('album') or "") for audio in audios])
+    same_album = (albums[:, None] == albums[None, :]) & (albums[:, None] != "") & shares_artist
+    similarity[same_album] = 1.0
+
+    selected = maximal_marginal_relevance([result['score'] for result in results], similarity, k, lambda_mult=lambda_mult)
+    return [results[i] for i in selected]
+
+def recommend_tracks(ctx, query, k):
+    """
+    Recommends tracks similar to the user's best matches for a query, excluding tracks the user already liked.
+    
+    Args:
+        ctx (RequestContext): The request's Spotify client and user.
+        query (str): The search query used to find relevant tracks or artists.
+        k (int): The number of recommendations to fetch.
+    
+    Returns:
+        list: The recommended Spotify tracks.
+    """
+    return list(iter_recommended_tracks(ctx, query, k))
+
+def iter_recommended_tracks(ctx, query, k, search_results=None):
+    """
+    Yields the tracks of `recommend_tracks` one at a time. The recommendations are seeded with `search_results`
+    if given, e.g. by a caller that already searched the query, and with the query's top k matches otherwise.
+    """
+    sp = ctx.sp
+
+    # Step 1: Perform the search and retrieve results
+    if search_results is None:
+        search_results = search_user_tracks(ctx.user_id, query, k)
+    seed_tracks = []
+    seed_artists = []
+    seed_genres = []
+
+    for result in search_results:
+        metadata = result['metadata']
+        if metadata and 'track_id' in metadata:
+            seed_tracks.append(metadata['track_id'])
+        if metadata and 'artists' in metadata:
+            seed_artists.extend(metadata['artists'])  # Assuming artists' IDs are stored in metadata
+
+    # Use only up to 5 seeds as required by Spotify API
+    seed_tracks = seed_tracks[:5]
+    seed_artists = seed_artists[:5]
+
+    # Step 2: Get recommendations based on seeds
+    recommendations = sp.recommendations(
+        seed_tracks=seed_tracks,
+        seed_artists=seed_artists,
+        seed_genres=seed_genres,
+        limit=k,  # Adjust the limit as needed
+        market="US"  # Adjust the market as needed
+    )
+
+    # Step 3: Filter out tracks already liked by the user
+    liked_songs = sp.current_user_saved_tracks(limit=50)
+    liked_track_ids = {item['track']['id'] for item in liked_songs['items']}
+
+    filtered_recommendations = [track for track in recommendations['tracks'] if track['id'] not in liked_track_ids]
+
+    yield from filtered_recommendations[:k]
+
+@app.get("/mood_search")
+def mood_search(
+    mood: str = Query(default="", description="Space or comma separated moods, e.g. 'calm acoustic'"),
+    features: str = Query(default="", description="Explicit targets on a 0-1 scale, e.g. 'energy:0.8,valence:0.9'"),
+    k: int = Query(default=10, description="Number of results to fetch"),
+):
+    """
+    Finds the user's tracks whose audio features best match a mood, without running the language model.
+    
+    Args:
+        mood (str): Mood names such as "calm", "acoustic", "happy" or "high-energy".
+        features (str): Explicit feature targets as comma separated `feature:value` pairs.
+        k (int): The number of tracks to return. Defaults to 10.
+    
+    Returns:
+        dict: The matching tracks, closest first, with their feature distance and audio data.
+    
+    Raises:
+        HTTPException: If a mood or feature is unknown, or redirects to Spotify login if authentication is needed.
+    """
+    try:
+        ctx = get_request_context()
+        try:
+            targets = {}
+            for pair in filter(None, (part.strip() for part in features.split(","))):
+                feature, value = pair.split(":")
+                targets[feature.strip()] = float(value)
+            profile = mood_profile(mood.replace(",", " ").split(), targets)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        if not profile:
+            raise HTTPException(status_code=400, detail="Provide at least one mood or feature target")
+
+        neighbours = get_feature_matrix(ctx.user_id).nearest(profile, k)
+        return {"profile": profile, "results": feature_results(ctx.user_id, neighbours)}
+    except HTTPException as e:
+        if e.status_code == 307:
+            return RedirectResponse(url="/login")
+        raise e
+    except SpotifyException as e:
+        if e.http_status == 429:
+            return JSONResponse(status_code=429, content={"message": "Rate limit exceeded, please try again later."})
+        else:
+            return JSONResponse(status_code=500, content={"message": "An error occurred during the mood search."})
+
+@app.get("/similar_tracks")
+def similar_tracks(track_id: str, k: int = Query(default=10, description="Number of results to fetch")):
+    """
+    Finds the user's tracks that sound most like a seed track from their library, by audio features alone.
+    
+    Args:
+        track_id (str): Spotify ID of the seed track.
+        k (int): The number of tracks to return. Defaults to 10.
+    
+    Returns:
+        dict: The most similar tracks, closest first, with their feature distance and audio data.
+    
+    Raises:
+        HTTPException: If the seed track has no audio features in the library, or redirects to Spotify login.
+    """
+    try:
+        ctx = get_request_context()
+        try:
+            neighbours = get_feature_matrix(ctx.user_id).similar(track_id, k)
+        except KeyError:
+            raise HTTPException(status_code=404, detail="Track not found in the library or it has no audio features")
+        return {"results": feature_results(ctx.user_id, neighbours)}
+    except HTTPException as e:
+        if e.status_code == 307:
+            return RedirectResponse(url="/login")
+        raise e
+    except SpotifyException as e:
+        if e.http_status == 429:
+            return JSONResponse(status_code=429, content={"message": "Rate limit exceeded, please try again later."})
+        else:
+            return JSONResponse(status_code=500, content={"message": "An error occurred while finding similar tracks."})
+
+@app.get("/get_recommendations")
+def get_recommendations(query: str, k: int = Query(default=5, description="Number of search results to fetch")):
+    """
+    Retrieves song recommendations based on a search query. The recommendations are filtered to exclude tracks already liked by the user.
 
     Args:
         query (str): The search query used to find relevant tracks or artists.
@@ -509,43 +1960,8 @@ async def get_recommendations(query: str, k: int = Query(default=5, description=
         SpotifyException: Handles Spotify-specific exceptions, including rate limits.
     """
     try:
-        sp = get_spotify_client()
-        user_id = sp.current_user()['id']  # Get the current user's ID
- 
-        # Step 1: Perform the search and retrieve results
-        search_results = await search(query, k)
-        seed_tracks = []
-        seed_artists = []
-        seed_genres = []
- 
-        for result in search_results['results']:
-            metadata = result['metadata']
-            if metadata and 'track_id' in metadata:
-                seed_tracks.append(metadata['track_id'])
-            if metadata and 'artists' in metadata:
-                seed_artists.extend(metadata['artists'])  # Assuming artists' IDs are stored in metadata
- 
-        # Use only up to 5 seeds as required by Spotify API
-        seed_tracks = seed_tracks[:5]
-        seed_artists = seed_artists[:5]
- 
-        # Step 2: Get recommendations based on seeds
-        recommendations = sp.recommendations(
-            seed_tracks=seed_tracks,
-            seed_artists=seed_artists,
-            seed_genres=seed_genres,
-            limit=k,  # Adjust the limit as needed
-            market="US"  # Adjust the market as needed
-        )
- 
-        # Step 3: Filter out tracks already liked by the user
-        liked_songs = sp.current_user_saved_tracks(limit=50)
-        liked_track_ids = {item['track']['id'] for item in liked_songs['items']}
- 
-        filtered_recommendations = [track for track in recommendations['tracks'] if track['id'] not in liked_track_ids]
-
-        final_recommendations = filtered_recommendations[:k]
-        return {"recommendations": final_recommendations}
+        ctx = get_request_context()
+        return {"recommendations": recommend_tracks(ctx, query, k)}
         
     except HTTPException as e:
         if e.status_code == 307:
@@ -557,6 +1973,44 @@ async def get_recommendations(query: str, k: int = Query(default=5, description=
         else:
             return JSONResponse(status_code=500, content={"message": "An error occurred while fetching recommendations."})
 
+def iter_recommendation_events(ctx, query, k):
+    """
+    Yields a "recommendation" event per recommended track, then a "done" event with the count.
+    """
+    count = 0
+    for track in iter_recommended_tracks(ctx, query, k):
+        count += 1
+        yield {"type": "recommendation", "track": track}
+    yield {"type": "done", "count": count}
+
+@app.get("/get_recommendations/stream")
+def get_recommendations_stream(query: str, k: int = Query(default=5, description="Number of search results to fetch")):
+    """
+    Streams the recommendations of `/get_recommendations` as newline-delimited JSON.
+    
+    Returns:
+        StreamingResponse: A {"type": "recommendation", "track": ...} line per track, then
+        {"type": "done", "count": n}.
+    
+    Raises:
+        HTTPException: Redirects to Spotify login if authentication is needed.
+    """
+    try:
+        # Resolve the user before streaming starts, so authentication errors still get their own response
+        ctx = get_request_context()
+        ctx.user_id
+        events = iter_recommendation_events(ctx, query, k)
+        return StreamingResponse(ndjson_stream(events, "An error occurred while fetching recommendations."), media_type="application/x-ndjson")
+        
+    except HTTPException as e:
+        if e.status_code == 307:
+            return RedirectResponse(url="/login")
+        raise e
+    except SpotifyException as e:
+        if e.http_status == 429:
+            return JSONResponse(status_code=429, content={"message": "Rate limit exceeded, please try again later."})
+        else:
+            return JSONResponse(status_code=500, content={"message": "An error occurred while fetching recommendations."})
 
 
 if __name__ == "__main__":
@@ -0,0 +1,57 @@
+"""
+Measures search throughput (queries/sec) of one `search_tracks` call per query, the path behind sequential `/search`
+requests, against `search_tracks_batch`, the path behind `POST /search/batch`, on an existing text collection. The
+query embedding cache is cleared before each run so every query pays for its forward pass.
+
+Usage:
+    python -m benchmarks.batch_search --collection track_catalog_text_collection --queries 64 --k 10
+"""
+import argparse
+import random
+import time
+
+from app import config
+from app.managers.store_registry import get_vector_store
+from backend import query_embedding_cache, search_tracks, search_tracks_batch
+
+WORDS = "love night heart dance fire rain city dream light time baby away feel never tonight forever".split()
+MOODS = "calm sad happy upbeat melancholic chill angry romantic nostalgic dreamy".split()
+
+
+def make_queries(count, seed=0):
+    """
+    Builds distinct queries shaped like real ones: a mood followed by a few lyric words.
+    """
+    rng = random.Random(seed)
+    return [f"{rng.choice(MOODS)} songs about {' '.join(rng.choices(WORDS, k=rng.randint(1, 4)))} {i}" for i in range(count)]
+
+
+def measure(run, queries):
+    query_embedding_cache.clear()
+    started_at = time.perf_counter()
+    run(queries)
+    return len(queries) / (time.perf_counter() - started_at)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--collection", required=True, help="Text collection to search")
+    parser.add_argument("--backend", choices=["chroma", "faiss"], default=config.VECTOR_STORE_BACKEND)
+    parser.add_argument("--queries", type=int, default=64, help="Number of queries per run")
+    parser.add_argument("--k", type=int, default=10, help="Tracks returned per query")
+    args = parser.parse_args()
+
+    text_store = get_vector_store(args.collection, args.backend)
+    queries = make_queries(args.queries)
+
+    # Warm up both paths so model loading and first-call overhead are not measured
+    search_tracks_batch(text_store, [(query, args.k) for query in make_queries(4, seed=1)])
+
+    sequential = measure(lambda qs: [search_tracks(text_store, query, args.k) for query in qs], queries)
+    batched = measure(lambda qs: search_tracks_batch(text_store, [(query, args.k) for query in qs]), queries)
+    print(f"One search per query: {sequential:.1f} queries/sec")
+    print(f"Batched search:       {batched:.1f} queries/sec ({batched / sequential:.2f}x)")
+
+
+if __name__ == "__main__":
+    main()
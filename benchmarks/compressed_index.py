@@ -0,0 +1,138 @@
+"""
+Measures what compressing the FAISS vector store costs in recall and saves in memory and disk. Every variant is
+built from the same vectors and searched through the store (including the rerank with the float16 copies of the
+vectors), and compared with exact search over the uncompressed vectors.
+
+Variants are written as an optional PCA step and a codec: "none", "sq8", "pq64", "pca256+sq8", "pca256+pq32", ...
+For each one the report shows recall@k without the rerank (a rerank factor of 1) and with it, the mean query
+latency, and the bytes per vector of the index (what is held in memory) and of the document store on disk.
+
+The vectors come from an existing Chroma collection (--collection) or are synthetic (--synthetic N): random
+combinations of a few hundred directions plus noise, which, like real embeddings, leaves most of the variance in a
+small number of dimensions.
+
+Usage:
+    python -m benchmarks.compressed_index --collection track_catalog_text_collection --k 10
+    python -m benchmarks.compressed_index --synthetic 50000 --variants none sq8 pca256+sq8 pq64 pca256+pq32
+"""
+import argparse
+import os
+import re
+import tempfile
+import time
+
+import numpy as np
+from langchain_core.documents import Document
+
+from app import config
+from app.managers.faiss_store import FaissVectorStore
+
+VARIANT = re.compile(r"^(?:pca(\d+)\+)?(none|sq8|pq(\d+))$")
+
+
+def load_vectors(args):
+    if args.synthetic:
+        rng = np.random.default_rng(0)
+        directions = rng.standard_normal((256, args.dimension), dtype=np.float32)
+        weights = rng.standard_normal((args.synthetic, 256), dtype=np.float32)
+        vectors = weights @ directions + 0.5 * rng.standard_normal((args.synthetic, args.dimension), dtype=np.float32)
+        ids = [f"t{i}:0" for i in range(args.synthetic)]
+    else:
+        import chromadb
+
+        client = chromadb.PersistentClient(path=config.CHROMA_PERSIST_DIRECTORY)
+        stored = client.get_collection(args.collection).get(include=["embeddings"])
+        vectors = np.asarray(stored["embeddings"], dtype=np.float32)
+        ids = stored["ids"]
+    return ids, vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def make_queries(vectors, count, noise=0.3):
+    rng = np.random.default_rng(1)
+    queries = vectors[rng.choice(len(vectors), size=count, replace=False)]
+    queries = queries + noise * rng.standard_normal(queries.shape, dtype=np.float32) / np.sqrt(queries.shape[1])
+    return queries / np.linalg.norm(queries, axis=1, keepdims=True)
+
+
+def parse_variant(variant):
+    match = VARIANT.match(variant)
+    if not match:
+        raise argparse.ArgumentTypeError(f"invalid variant '{variant}', expected e.g. none, sq8, pq64 or pca256+sq8")
+    pca_dimension, codec, pq_m = match.groups()
+    return {
+        "compression": "pq" if pq_m else codec,
+        "pca_dimension": int(pca_dimension or 0),
+        "pq_m": int(pq_m or config.FAISS_PQ_M),
+    }
+
+
+def file_size(path):
+    return sum(os.path.getsize(p) for p in (path, f"{path}-wal") if os.path.exists(p))
+
+
+def build(ids, vectors, directory, options):
+    store = FaissVectorStore("benchmark", None, directory, **options)
+    for start in range(0, len(ids), 5000):
+        documents = [
+            Document(page_content=doc_id, metadata={"track_id": doc_id.split(":")[0]})
+            for doc_id in ids[start:start + 5000]
+        ]
+        store.add_embeddings(documents, vectors[start:start + 5000], ids=ids[start:start + 5000])
+    store.persist()
+    return store
+
+
+def measure(store, queries, expected, k, positions):
+    latencies = []
+    recalls = []
+    for query, truth in zip(queries, expected):
+        started_at = time.perf_counter()
+        hits = store.similarity_search_by_vector_with_relevance_scores(query.tolist(), k=k)
+        latencies.append((time.perf_counter() - started_at) * 1000)
+        recalls.append(len({positions[document.page_content] for document, _ in hits} & truth) / k)
+    return np.mean(recalls), np.mean(latencies)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--collection", help="Chroma collection whose embeddings are indexed")
+    parser.add_argument("--synthetic", type=int, help="Index this many synthetic vectors instead of a collection")
+    parser.add_argument("--dimension", type=int, default=1024, help="Dimension of the synthetic vectors")
+    parser.add_argument("--variants", nargs="+", default=["none", "sq8", "pca256+sq8", "pq64", "pca256+pq32"])
+    parser.add_argument("--index-type", choices=["flat", "ivf", "hnsw"], default=config.FAISS_INDEX_TYPE)
+    parser.add_argument("--rerank-factor", type=int, default=config.FAISS_RERANK_FACTOR)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    args = parser.parse_args()
+    if not args.collection and not args.synthetic:
+        parser.error("either --collection or --synthetic is required")
+    variants = {variant: parse_variant(variant) for variant in args.variants}
+
+    ids, vectors = load_vectors(args)
+    positions = {doc_id: i for i, doc_id in enumerate(ids)}
+    queries = make_queries(vectors, min(args.queries, len(ids)))
+    expected = [set(np.argsort(-(vectors @ query))[:args.k].tolist()) for query in queries]
+    print(f"{len(ids)} vectors of dimension {vectors.shape[1]}, {len(queries)} queries, k={args.k}, "
+          f"{args.index_type} index, rerank factor {args.rerank_factor}")
+    print(f"{'variant':<14} {'raw recall':>10} {'recall':>7} {'mean ms':>8} {'index B/vec':>11} {'store B/vec':>11}")
+
+    for variant, options in variants.items():
+        with tempfile.TemporaryDirectory() as directory:
+            options = dict(options, index_type=args.index_type, nlist=config.FAISS_NLIST, nprobe=config.FAISS_NPROBE,
+                           hnsw_m=config.FAISS_HNSW_M, ef_search=config.FAISS_HNSW_EF_SEARCH)
+            store = build(ids, vectors, directory, options)
+            # Fold the write-ahead log into the database so the file sizes are comparable
+            store.connection.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            index_bytes = os.path.getsize(store.index_path) / len(ids)
+            store_bytes = file_size(os.path.join(directory, "benchmark.sqlite3")) / len(ids)
+
+            store.rerank_factor = 1
+            raw_recall, _ = measure(store, queries, expected, args.k, positions)
+            store.rerank_factor = args.rerank_factor
+            recall, mean_latency = measure(store, queries, expected, args.k, positions)
+            print(f"{variant:<14} {raw_recall:10.3f} {recall:7.3f} {mean_latency:8.2f} "
+                  f"{index_bytes:11.0f} {store_bytes:11.0f}")
+
+
+if __name__ == "__main__":
+    main()
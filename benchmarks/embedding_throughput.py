@@ -0,0 +1,66 @@
+"""
+Measures document embedding throughput (docs/sec) of the plain HuggingFaceBgeEmbeddings function against the
+length-bucketed BucketedEmbeddings engine on a mix of short "title by artist" texts and full lyrics, the same
+shape of input the ingest pipeline produces.
+
+Usage:
+    python -m benchmarks.embedding_throughput --docs 512 --threads 8
+"""
+import argparse
+import random
+import time
+
+from langchain_community.embeddings import HuggingFaceBgeEmbeddings
+
+from app import config
+from app.models.embedding import BucketedEmbeddings
+
+WORDS = "love night heart dance fire rain city dream light time baby away feel never tonight forever".split()
+
+
+def make_documents(count, lyrics_ratio, seed=0):
+    """
+    Builds synthetic track texts: a share of `lyrics_ratio` of them carry a few hundred words of lyrics,
+    the rest only a title, artist and album.
+    """
+    rng = random.Random(seed)
+    documents = []
+    for i in range(count):
+        title = " ".join(rng.choices(WORDS, k=rng.randint(1, 4)))
+        text = f"{title} by ['Artist {i}'] from Album {i}\nLyrics: "
+        if rng.random() < lyrics_ratio:
+            text += " ".join(rng.choices(WORDS, k=rng.randint(150, 600)))
+        documents.append(text)
+    return documents
+
+
+def measure(embedding_function, documents):
+    started_at = time.perf_counter()
+    embedding_function.embed_documents(documents)
+    return len(documents) / (time.perf_counter() - started_at)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--docs", type=int, default=512, help="Number of documents to embed")
+    parser.add_argument("--lyrics-ratio", type=float, default=0.5, help="Share of documents that carry lyrics")
+    parser.add_argument("--threads", type=int, default=config.EMBEDDING_THREADS, help="CPU threads used by PyTorch")
+    parser.add_argument("--max-batch-tokens", type=int, default=config.EMBEDDING_MAX_BATCH_TOKENS)
+    args = parser.parse_args()
+
+    documents = make_documents(args.docs, args.lyrics_ratio)
+    base = HuggingFaceBgeEmbeddings(model_name=config.EMBEDDING_MODEL_NAME)
+    bucketed = BucketedEmbeddings(base, max_batch_tokens=args.max_batch_tokens, num_threads=args.threads)
+
+    # Warm up both paths so model loading and first-call overhead are not measured
+    base.embed_documents(documents[:8])
+    bucketed.embed_documents(documents[:8])
+
+    baseline = measure(base, documents)
+    optimized = measure(bucketed, documents)
+    print(f"HuggingFaceBgeEmbeddings: {baseline:.1f} docs/sec")
+    print(f"BucketedEmbeddings:       {optimized:.1f} docs/sec ({optimized / baseline:.2f}x)")
+
+
+if __name__ == "__main__":
+    main()
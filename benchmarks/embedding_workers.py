@@ -0,0 +1,66 @@
+"""
+Measures how embedding throughput scales with the number of EmbeddingService worker processes. Several client
+threads issue concurrent document and query requests, the way ingest jobs and /search do, and the aggregate
+docs/sec is compared against a single worker. The clients call the service directly, so this is the pool's own
+scaling; `benchmarks.search_api` measures what concurrent /search requests get out of it through the API.
+
+Usage:
+    python -m benchmarks.embedding_workers --workers 1 2 4 8 --clients 16
+"""
+import argparse
+import threading
+import time
+
+from app import config
+from app.models.embedding_service import EmbeddingService, RemoteEmbeddings
+from benchmarks.embedding_throughput import make_documents
+
+
+def run_clients(embedding_function, documents, clients, requests_per_client, batch_size):
+    def client(index):
+        for i in range(requests_per_client):
+            start = (index * requests_per_client + i) * batch_size % len(documents)
+            embedding_function.embed_documents(documents[start:start + batch_size])
+            embedding_function.embed_query(documents[start][:60])
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(clients)]
+    started_at = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started_at
+    return clients * requests_per_client * (batch_size + 1) / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--clients", type=int, default=16, help="Concurrent client threads")
+    parser.add_argument("--requests", type=int, default=8, help="Requests per client thread")
+    parser.add_argument("--batch-size", type=int, default=16, help="Documents per request")
+    parser.add_argument("--threads-per-worker", type=int, default=config.EMBEDDING_THREADS)
+    args = parser.parse_args()
+
+    documents = make_documents(1024, lyrics_ratio=0.3)
+    baseline = None
+    for num_workers in args.workers:
+        service = EmbeddingService(
+            num_workers,
+            threads_per_worker=args.threads_per_worker or 1,
+            max_batch_size=config.EMBEDDING_MICRO_BATCH_SIZE,
+            max_wait=config.EMBEDDING_MICRO_BATCH_WAIT_MS / 1000
+        )
+        service.wait_ready()
+        embedding_function = RemoteEmbeddings(service)
+        embedding_function.embed_documents(documents[:num_workers * 4])
+
+        throughput = run_clients(embedding_function, documents, args.clients, args.requests, args.batch_size)
+        baseline = baseline or throughput / num_workers
+        print(f"{num_workers:>3} workers: {throughput:8.1f} texts/sec, "
+              f"{throughput / (baseline * num_workers):.0%} of linear scaling")
+        service.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+Compares the schema-driven metadata codec with the JSON string round-trip it replaced, on synthetic audio-document
+metadata (track fields and Spotify audio features): encode and decode time per record, and how many records the
+old decoder changed, e.g. a track named "1999" coming back as a number.
+
+Usage:
+    python -m benchmarks.metadata_codec --records 10000
+"""
+import argparse
+import json
+import random
+import time
+
+from app.utils.metadata_codec import decode_metadata, encode_metadata
+
+WORDS = "love night heart dance fire rain city dream light time baby away feel never tonight forever".split()
+
+
+def legacy_encode(metadata):
+    return {key: "" if value is None else json.dumps(value) if isinstance(value, list) else value
+            for key, value in metadata.items()}
+
+
+def legacy_decode(metadata):
+    decoded = {}
+    for key, value in metadata.items():
+        try:
+            decoded[key] = json.loads(value) if isinstance(value, str) else value
+        except json.JSONDecodeError:
+            decoded[key] = value
+    return decoded
+
+
+def make_records(count, seed=0):
+    rng = random.Random(seed)
+    records = []
+    for i in range(count):
+        # Some names are numeric-looking, as real titles ("1999", "22") sometimes are
+        name = str(rng.randint(1, 2024)) if rng.random() < 0.05 else " ".join(rng.choices(WORDS, k=rng.randint(1, 4)))
+        records.append({
+            "id": f"t{i}",
+            "name": name,
+            "album": " ".join(rng.choices(WORDS, k=2)),
+            "artists": [" ".join(rng.choices(WORDS, k=2)) for _ in range(rng.randint(1, 3))],
+            "url": f"https://open.spotify.com/track/t{i}",
+            "lyrics": " ".join(rng.choices(WORDS, k=200)),
+            "danceability": rng.random(),
+            "energy": rng.random(),
+            "key": rng.randint(0, 11),
+            "loudness": -60 * rng.random(),
+            "mode": rng.randint(0, 1),
+            "speechiness": rng.random(),
+            "acousticness": rng.random(),
+            "instrumentalness": rng.random(),
+            "liveness": rng.random(),
+            "valence": rng.random(),
+            "tempo": 50 + 150 * rng.random(),
+            "type": "audio_features",
+            "uri": f"spotify:track:t{i}",
+            "track_href": f"https://api.spotify.com/v1/tracks/t{i}",
+            "analysis_url": f"https://api.spotify.com/v1/audio-analysis/t{i}",
+            "duration_ms": rng.randint(60000, 400000),
+            "time_signature": 4,
+        })
+    return records
+
+
+def measure(function, records, repeats):
+    best = float("inf")
+    for _ in range(repeats):
+        started_at = time.perf_counter()
+        results = [function(record) for record in records]
+        best = min(best, time.perf_counter() - started_at)
+    return results, best * 1e6 / len(records)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--records", type=int, default=10000)
+    parser.add_argument("--repeats", type=int, default=5, help="Runs per measurement; the fastest is reported")
+    args = parser.parse_args()
+
+    records = make_records(args.records)
+    print(f"{len(records)} records, best of {args.repeats} runs")
+    print(f"{'codec':<8} {'encode us':>10} {'decode us':>10} {'changed':>8}")
+    for codec, encode, decode in (("json", legacy_encode, legacy_decode), ("schema", encode_metadata, decode_metadata)):
+        encoded, encode_time = measure(encode, records, args.repeats)
+        decoded, decode_time = measure(decode, encoded, args.repeats)
+        changed = sum(original != result for original, result in zip(records, decoded))
+        print(f"{codec:<8} {encode_time:10.2f} {decode_time:10.2f} {changed:8d}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""
+Checks how closely the int8 ONNX embedding backend matches the full-precision bge-m3 model on a stored
+collection, and how much faster it is.
+
+For every query, the top-k tracks are ranked by cosine similarity against the vectors stored in the collection
+(embedded with the float model), once with the float query embedding and once with the int8 one. Recall@k is
+the share of the float top-k the int8 ranking also returns. With --reembed the collection's documents are also
+re-embedded with the int8 model, which measures a collection fully ingested with the quantized backend.
+
+Usage:
+    python -m benchmarks.onnx_recall --collection <user_id>_text_collection --k 10
+"""
+import argparse
+import time
+
+import chromadb
+import numpy as np
+from langchain_community.embeddings import HuggingFaceBgeEmbeddings
+
+from app import config
+from app.models.onnx_embedding import OnnxEmbeddings
+
+DEFAULT_QUERIES = [
+    "calm acoustic songs for a rainy day",
+    "high-energy workout music",
+    "sad breakup songs",
+    "happy summer road trip",
+    "songs about falling in love",
+    "late night chill vibes",
+    "angry rock anthems",
+    "music to focus and study",
+    "nostalgic throwback hits",
+    "dance party bangers",
+]
+
+
+def top_k(query_vectors, document_vectors, k):
+    scores = query_vectors @ document_vectors.T
+    return np.argsort(-scores, axis=1)[:, :k]
+
+
+def normalize(vectors):
+    vectors = np.asarray(vectors, dtype=np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def timed_queries(embedding_function, queries):
+    started_at = time.perf_counter()
+    vectors = [embedding_function.embed_query(query) for query in queries]
+    return normalize(vectors), (time.perf_counter() - started_at) / len(queries) * 1000
+
+
+def recall(expected, actual):
+    return np.mean([len(set(e) & set(a)) / len(e) for e, a in zip(expected, actual)])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--collection", required=True, help="Chroma text collection to evaluate on")
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--queries", help="File with one query per line (defaults to built-in mood queries)")
+    parser.add_argument("--reembed", action="store_true", help="Also re-embed the documents with the int8 model")
+    args = parser.parse_args()
+
+    queries = DEFAULT_QUERIES
+    if args.queries:
+        with open(args.queries) as f:
+            queries = [line.strip() for line in f if line.strip()]
+
+    client = chromadb.PersistentClient(path=config.CHROMA_PERSIST_DIRECTORY)
+    stored = client.get_collection(args.collection).get(include=["embeddings", "documents"])
+    document_vectors = normalize(stored["embeddings"])
+    print(f"Evaluating on {len(stored['ids'])} documents of {args.collection} with {len(queries)} queries")
+
+    float_model = HuggingFaceBgeEmbeddings(model_name=config.EMBEDDING_MODEL_NAME)
+    int8_model = OnnxEmbeddings(config.EMBEDDING_MODEL_NAME, config.ONNX_MODEL_DIRECTORY,
+                                quantize=True, num_threads=config.EMBEDDING_THREADS)
+
+    # Warm up both models so loading is not part of the latency
+    float_model.embed_query(queries[0])
+    int8_model.embed_query(queries[0])
+
+    float_queries, float_latency = timed_queries(float_model, queries)
+    int8_queries, int8_latency = timed_queries(int8_model, queries)
+
+    expected = top_k(float_queries, document_vectors, args.k)
+    print(f"Query latency: float {float_latency:.1f} ms, int8 {int8_latency:.1f} ms ({float_latency / int8_latency:.2f}x)")
+    print(f"Recall@{args.k} (int8 queries, stored float documents): {recall(expected, top_k(int8_queries, document_vectors, args.k)):.3f}")
+
+    if args.reembed:
+        started_at = time.perf_counter()
+        int8_documents = normalize(int8_model.embed_documents(stored["documents"]))
+        elapsed = time.perf_counter() - started_at
+        print(f"Re-embedded documents with int8 at {len(stored['ids']) / elapsed:.1f} docs/sec")
+        print(f"Recall@{args.k} (int8 queries, int8 documents): {recall(expected, top_k(int8_queries, int8_documents, args.k)):.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""
+Measures /search throughput (queries/sec) through the FastAPI app with 1, 4, 16, ... concurrent clients, on an
+ingested user's collections. Requests go through the ASGI app on a single event loop, as uvicorn serves them, so
+concurrent queries only overlap (and reach the embedding worker pool together, to be micro-batched) if the
+endpoint does not block the loop. Every query is distinct, so each one pays for its forward pass.
+
+Run it with EMBEDDING_WORKERS set to compare the worker pool with the in-process model.
+
+Usage:
+    EMBEDDING_WORKERS=4 python -m benchmarks.search_api --user <spotify user id> --clients 1 4 16
+"""
+import argparse
+import asyncio
+import time
+
+import httpx
+
+import backend
+from benchmarks.batch_search import make_queries
+
+
+class BenchmarkContext():
+    """
+    Request context of a fixed user, so the benchmark needs no Spotify login.
+    """
+    def __init__(self, user_id):
+        self.user_id = user_id
+
+
+async def run_clients(queries, clients, k):
+    transport = httpx.ASGITransport(app=backend.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://benchmark") as client:
+        pending = list(queries)
+
+        async def worker():
+            while pending:
+                response = await client.get("/search", params={"query": pending.pop(), "k": k})
+                response.raise_for_status()
+
+        started_at = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(clients)))
+        return len(queries) / (time.perf_counter() - started_at)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--user", required=True, help="Spotify user ID whose ingested collections are searched")
+    parser.add_argument("--clients", type=int, nargs="+", default=[1, 4, 16], help="Concurrent clients per run")
+    parser.add_argument("--queries", type=int, default=64, help="Number of queries per run")
+    parser.add_argument("--k", type=int, default=10, help="Tracks returned per query")
+    args = parser.parse_args()
+
+    context = BenchmarkContext(args.user)
+    backend.get_request_context = lambda: context
+
+    # Warm up so model loading and opening the collections are not measured
+    asyncio.run(run_clients(make_queries(4, seed=-1), 4, args.k))
+
+    baseline = None
+    for seed, clients in enumerate(args.clients):
+        throughput = asyncio.run(run_clients(make_queries(args.queries, seed=seed), clients, args.k))
+        baseline = baseline or throughput
+        print(f"{clients:>3} clients: {throughput:8.1f} queries/sec ({throughput / baseline:.2f}x)")
+
+
+if __name__ == "__main__":
+    main()
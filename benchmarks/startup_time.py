@@ -0,0 +1,59 @@
+"""
+Measures how long the backend takes to start: the cold import time of `backend` in a fresh interpreter and the
+time from launching uvicorn until the first request to `/` is answered. Neither should include loading the
+embedding model, which happens lazily (or in the background with PRELOAD_EMBEDDING_MODEL).
+
+Usage:
+    python -m benchmarks.startup_time --runs 3
+"""
+import argparse
+import os
+import subprocess
+import sys
+import time
+import urllib.request
+
+IMPORT_SNIPPET = "import time; started_at = time.perf_counter(); import backend; print(time.perf_counter() - started_at)"
+
+
+def cold_import_time():
+    output = subprocess.run([sys.executable, "-c", IMPORT_SNIPPET], capture_output=True, text=True, check=True)
+    return float(output.stdout.strip().splitlines()[-1])
+
+
+def time_to_first_request(port, timeout=120):
+    started_at = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "backend:app", "--host", "127.0.0.1", "--port", str(port)],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+        env={**os.environ, "PRELOAD_EMBEDDING_MODEL": "false"},
+    )
+    try:
+        while time.perf_counter() - started_at < timeout:
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}/", timeout=1) as response:
+                    if response.status == 200:
+                        return time.perf_counter() - started_at
+            except OSError:
+                time.sleep(0.05)
+        raise TimeoutError(f"The server did not answer within {timeout}s")
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--port", type=int, default=8299)
+    args = parser.parse_args()
+
+    import_times = [cold_import_time() for _ in range(args.runs)]
+    request_times = [time_to_first_request(args.port) for _ in range(args.runs)]
+    print(f"Cold import of backend: best {min(import_times):.2f}s, mean {sum(import_times) / len(import_times):.2f}s")
+    print(f"Time to first request:  best {min(request_times):.2f}s, mean {sum(request_times) / len(request_times):.2f}s")
+
+
+if __name__ == "__main__":
+    main()
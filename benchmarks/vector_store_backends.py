@@ -0,0 +1,146 @@
+"""
+Compares the FAISS vector store (flat, IVF and HNSW indexes) with Chroma on the same vectors: recall@k against
+exact search, mean and p95 query latency, and for FAISS the build time and the time to reopen the saved index
+(memory-mapped).
+
+The vectors come from an existing Chroma collection (--collection, e.g. the catalog's text collection) or are
+random unit vectors (--synthetic N) for sizes beyond the current catalog. Queries are stored vectors with a little
+noise added, so each has meaningful near neighbours.
+
+Usage:
+    python -m benchmarks.vector_store_backends --collection track_catalog_text_collection --k 10
+    python -m benchmarks.vector_store_backends --synthetic 200000 --dimension 1024 --backends faiss-hnsw faiss-ivf
+"""
+import argparse
+import tempfile
+import time
+
+import numpy as np
+from langchain_core.documents import Document
+
+from app import config
+from app.managers.faiss_store import FaissVectorStore
+
+BACKENDS = ["chroma", "faiss-flat", "faiss-ivf", "faiss-hnsw"]
+
+
+def load_vectors(args):
+    if args.synthetic:
+        rng = np.random.default_rng(0)
+        vectors = rng.standard_normal((args.synthetic, args.dimension), dtype=np.float32)
+        ids = [f"t{i}:0" for i in range(args.synthetic)]
+    else:
+        import chromadb
+
+        client = chromadb.PersistentClient(path=config.CHROMA_PERSIST_DIRECTORY)
+        stored = client.get_collection(args.collection).get(include=["embeddings"])
+        vectors = np.asarray(stored["embeddings"], dtype=np.float32)
+        ids = stored["ids"]
+    return ids, vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def make_queries(vectors, count, noise=0.05):
+    rng = np.random.default_rng(1)
+    queries = vectors[rng.choice(len(vectors), size=count, replace=False)]
+    queries = queries + noise * rng.standard_normal(queries.shape, dtype=np.float32) / np.sqrt(queries.shape[1])
+    return queries / np.linalg.norm(queries, axis=1, keepdims=True)
+
+
+def exact_top_k(vectors, queries, k):
+    return [set(np.argsort(-(vectors @ query))[:k].tolist()) for query in queries]
+
+
+def measure(search, queries, expected, k, positions):
+    latencies = []
+    recalls = []
+    for query, truth in zip(queries, expected):
+        started_at = time.perf_counter()
+        found_ids = search(query, k)
+        latencies.append((time.perf_counter() - started_at) * 1000)
+        recalls.append(len({positions[found_id] for found_id in found_ids} & truth) / k)
+    return np.mean(recalls), np.mean(latencies), np.percentile(latencies, 95)
+
+
+def build_chroma(ids, vectors, directory):
+    import chromadb
+
+    client = chromadb.PersistentClient(path=directory)
+    collection = client.create_collection("benchmark")
+    started_at = time.perf_counter()
+    for start in range(0, len(ids), 5000):
+        collection.add(ids=ids[start:start + 5000], embeddings=vectors[start:start + 5000].tolist())
+    build_time = time.perf_counter() - started_at
+
+    def search(query, k):
+        return collection.query(query_embeddings=[query.tolist()], n_results=k, include=[])["ids"][0]
+
+    return search, build_time, None
+
+
+def build_faiss(index_type, ids, vectors, directory, args):
+    options = dict(index_type=index_type, nlist=args.nlist, nprobe=args.nprobe, hnsw_m=args.hnsw_m,
+                   ef_search=args.ef_search)
+
+    # The vectors are added precomputed, so no embedding function is needed and building measures indexing only
+    store = FaissVectorStore("benchmark", None, directory, **options)
+    started_at = time.perf_counter()
+    for start in range(0, len(ids), 5000):
+        documents = [
+            Document(page_content=f"document {doc_id}", metadata={"track_id": doc_id.split(":")[0]})
+            for doc_id in ids[start:start + 5000]
+        ]
+        store.add_embeddings(documents, vectors[start:start + 5000], ids=ids[start:start + 5000])
+    if index_type == "ivf":
+        # Train on the whole collection, as a finished ingest would have
+        store.rebuild()
+    store.persist()
+    build_time = time.perf_counter() - started_at
+
+    started_at = time.perf_counter()
+    store = FaissVectorStore("benchmark", None, directory, **options)
+    load_time = time.perf_counter() - started_at
+
+    doc_ids = dict(store.connection.execute("SELECT id, doc_id FROM documents"))
+
+    def search(query, k):
+        return [doc_ids[rowid] for _, rowid in store._search_index(query[None, :], k, None)[0]]
+
+    return search, build_time, load_time
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--collection", help="Chroma collection whose embeddings are indexed")
+    parser.add_argument("--synthetic", type=int, help="Index this many random vectors instead of a collection")
+    parser.add_argument("--dimension", type=int, default=1024, help="Dimension of the synthetic vectors")
+    parser.add_argument("--backends", nargs="+", choices=BACKENDS, default=BACKENDS)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--nlist", type=int, default=config.FAISS_NLIST)
+    parser.add_argument("--nprobe", type=int, default=config.FAISS_NPROBE)
+    parser.add_argument("--hnsw-m", type=int, default=config.FAISS_HNSW_M)
+    parser.add_argument("--ef-search", type=int, default=config.FAISS_HNSW_EF_SEARCH)
+    args = parser.parse_args()
+    if not args.collection and not args.synthetic:
+        parser.error("either --collection or --synthetic is required")
+
+    ids, vectors = load_vectors(args)
+    positions = {doc_id: i for i, doc_id in enumerate(ids)}
+    queries = make_queries(vectors, min(args.queries, len(ids)))
+    expected = exact_top_k(vectors, queries, args.k)
+    print(f"{len(ids)} vectors of dimension {vectors.shape[1]}, {len(queries)} queries, k={args.k}")
+    print(f"{'backend':<12} {'recall':>7} {'mean ms':>8} {'p95 ms':>7} {'build s':>8} {'load s':>7}")
+
+    for backend in args.backends:
+        with tempfile.TemporaryDirectory() as directory:
+            if backend == "chroma":
+                search, build_time, load_time = build_chroma(ids, vectors, directory)
+            else:
+                search, build_time, load_time = build_faiss(backend.split("-")[1], ids, vectors, directory, args)
+            recall, mean_latency, p95_latency = measure(search, queries, expected, args.k, positions)
+            load = f"{load_time:7.2f}" if load_time is not None else f"{'-':>7}"
+            print(f"{backend:<12} {recall:7.3f} {mean_latency:8.2f} {p95_latency:7.2f} {build_time:8.1f} {load}")
+
+
+if __name__ == "__main__":
+    main()